@@ -6,6 +6,13 @@ echo "=== Running Comprehensive Test Suite ==="
 # Run Python tests
 if [ -d "tests" ]; then
     echo "Running Python tests..."
+    # Ranked timing summary at the end of the run; set to 0 to disable,
+    # or set VALIDATION_TRACE=trace.json for a Chrome trace.
+    export VALIDATION_PROFILE="${VALIDATION_PROFILE:-1}"
+    # On a CI matrix, VALIDATION_SHARD=i/N checks only that node's share;
+    # see tests/sharding.py for merging the per-shard JSON reports.
+    # On network or overlay mounts, VALIDATION_PREFETCH=16 overlaps reads.
+    python -m tests.yaml_backend 2>/dev/null
     python -m pytest tests/ -v --tb=short 2>/dev/null || python -m unittest discover tests/ -v
 fi
 
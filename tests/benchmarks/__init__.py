@@ -0,0 +1,4 @@
+"""
+Benchmarks for the validation suite.
+Run individual benchmarks with ``python -m tests.benchmarks.<name>``.
+"""
@@ -0,0 +1,123 @@
+"""
+Latency-injection benchmark for overlapped file reads.
+Usage: python -m tests.benchmarks.prefetch [--files N] [--latency MS]
+                                           [--readers 1,4,16] [--json]
+
+A synthetic repository is loaded through ``SlowFileSystem``, which
+sleeps before every stat and read as a network or overlay mount would,
+once one file at a time (a stat and a read per file, like the document
+cache) and once through ``prefetch_documents`` with each reader count.
+Both start from an empty document cache.
+"""
+
+import argparse
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from tests.benchmarks.synthetic_repo import RepoSpec, generate_repo
+from tests.document_cache import DocumentCache
+from tests.file_index import FileIndex
+from tests.prefetch import FileSystem, prefetch_documents
+
+
+class SlowFileSystem(FileSystem):
+    """A FileSystem paying ``latency`` seconds per call, plus transfer
+    time at ``bandwidth`` bytes per second if given."""
+
+    def __init__(self, latency, bandwidth=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.calls = 0
+        self.peak = 0
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def _wait(self, seconds):
+        with self._lock:
+            self.calls += 1
+            self._active += 1
+            self.peak = max(self.peak, self._active)
+        try:
+            time.sleep(seconds)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def stat(self, path):
+        self._wait(self.latency)
+        return super().stat(path)
+
+    def read(self, path):
+        signature, data = super().read(path)
+        self._wait(self.latency + (len(data) / self.bandwidth
+                                   if self.bandwidth else 0))
+        return signature, data
+
+
+def sequential_load(paths, fs, cache):
+    """Load ``paths`` one at a time, a stat then a read each."""
+    for path in paths:
+        signature = fs.stat(path)
+        cache.put(path, signature, fs.read(path)[1])
+
+
+def benchmark(paths, latency, readers=(1, 4, 16), bandwidth=None):
+    """Return ``{mode: {'seconds', 'calls', 'peak'}}`` for loading ``paths``."""
+    results = {}
+
+    def measure(name, load):
+        fs = SlowFileSystem(latency, bandwidth)
+        cache = DocumentCache()
+        start = time.perf_counter()
+        load(fs, cache)
+        results[name] = {'seconds': round(time.perf_counter() - start, 4),
+                         'calls': fs.calls, 'peak': fs.peak,
+                         'files': len(cache)}
+
+    measure('sequential', lambda fs, cache: sequential_load(paths, fs, cache))
+    for count in readers:
+        measure(f'prefetch x{count}', lambda fs, cache: list(
+            prefetch_documents(paths, cache, readers=count, fs=fs)))
+    base = results['sequential']['seconds']
+    for row in results.values():
+        row['speedup'] = round(base / row['seconds'], 1)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=200,
+                        help='files in the synthetic repository')
+    parser.add_argument('--latency', type=float, default=2.0,
+                        help='milliseconds per filesystem call')
+    parser.add_argument('--bandwidth', type=float, default=None,
+                        help='MB per second per read (default: unlimited)')
+    parser.add_argument('--readers', default='1,4,16',
+                        help='comma-separated reader counts')
+    parser.add_argument('--json', action='store_true',
+                        help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_repo(tmp, RepoSpec(files=args.files, ignored_files=0))
+        paths = FileIndex(Path(tmp)).files()
+        results = benchmark(
+            paths, args.latency / 1000,
+            [int(count) for count in args.readers.split(',')],
+            args.bandwidth * 1024 * 1024 if args.bandwidth else None)
+    if args.json:
+        print(json.dumps({'files': len(paths), 'latency_ms': args.latency,
+                          'modes': results}, indent=2))
+        return
+    print(f"{len(paths)} files, {args.latency:g} ms per call")
+    print(f"  {'mode':<14} {'seconds':>8} {'speedup':>8} {'in flight':>10}")
+    for name, row in results.items():
+        print(f"  {name:<14} {row['seconds']:8.3f} {row['speedup']:7.1f}x "
+              f"{row['peak']:10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""
+Validation benchmark suite over a synthetic repository.
+Usage: python -m tests.benchmarks.suite [--files N] [--threshold 0.25]
+
+The end-to-end run and the per-rule timings happen in a fresh child
+process with cold caches, so peak RSS and import costs are those of a
+real ``python -m tests.validate`` invocation. Each run is appended to a
+JSON history file and compared against the median of earlier runs with
+the same shape; a slowdown beyond the threshold exits non-zero.
+
+A second pair of child processes measures an incremental run: the first
+fills a scratch manifest, the second times an unchanged re-run against
+it, which must stay within ``INCREMENTAL_BUDGET_SECONDS``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from tests.benchmarks.synthetic_repo import RepoSpec, generate_repo
+
+
+REPO_ROOT = Path(__file__).parent.parent.parent
+HISTORY_NAME = 'bench_history.json'
+DEFAULT_THRESHOLD = 0.25
+# Number of earlier comparable runs the median is taken over.
+HISTORY_WINDOW = 5
+# Totals compared against history; per-rule timings are informational.
+TRACKED_METRICS = ('wall_seconds', 'walks', 'bytes_read', 'peak_rss_kb',
+                   'incremental_seconds')
+# Validation time of an unchanged re-run in incremental mode, excluding
+# interpreter start-up and imports.
+INCREMENTAL_BUDGET_SECONDS = 0.1
+# Files modified within the manifest's racy window are always rehashed.
+BACKDATE_SECONDS = 3600
+
+
+def history_path():
+    from tests.incremental import cache_dir
+    return cache_dir() / HISTORY_NAME
+
+
+def _peak_rss_kb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _measure(run):
+    """Call ``run`` with cold caches; return its result and counters."""
+    from tests.document_cache import get_document_cache, reset_document_cache
+    from tests.file_index import FileIndex, reset_file_index
+
+    reset_file_index()
+    reset_document_cache()
+    walks = FileIndex.walk_count
+    start = time.perf_counter()
+    result = run()
+    return result, {
+        'seconds': round(time.perf_counter() - start, 6),
+        'walks': FileIndex.walk_count - walks,
+        'bytes_read': get_document_cache().bytes_read,
+    }
+
+
+def measure_repository(root):
+    """Time the whole rule set, then each rule on its own, over ``root``.
+
+    Meant to run in a dedicated process: peak RSS covers everything the
+    process has done, so it is sampled before the per-rule passes.
+    """
+    from tests.validate import RULES, ValidationEngine
+
+    results, totals = _measure(lambda: ValidationEngine(root).run())
+    report = {
+        'walks': totals['walks'],
+        'bytes_read': totals['bytes_read'],
+        'peak_rss_kb': _peak_rss_kb(),
+        'failed_rules': sorted(r.rule.id for r in results
+                               if r.status == 'failed'),
+        'rules': {},
+    }
+    for rule in RULES:
+        result, counters = _measure(
+            lambda: ValidationEngine(root).run_rule(rule))
+        report['rules'][rule.id] = dict(counters, status=result.status)
+    return report
+
+
+def measure_incremental(root):
+    """Time one incremental run over ``root``; see ``run_incremental``."""
+    from tests.validate import ValidationEngine
+
+    results, counters = _measure(lambda: ValidationEngine(root).run())
+    return {
+        'incremental_seconds': counters['seconds'],
+        'incremental_bytes_read': counters['bytes_read'],
+        'incremental_failed_rules': sorted(r.rule.id for r in results
+                                           if r.status == 'failed'),
+    }
+
+
+def _child(flag, root, **env):
+    env = dict(os.environ, VALIDATION_PROFILE='0', **env)
+    env.pop('VALIDATION_TRACE', None)
+    output = subprocess.run(
+        [sys.executable, '-m', 'tests.benchmarks.suite', flag, str(root)],
+        cwd=REPO_ROOT, env=env, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout)
+
+
+def run_incremental(root):
+    """Measure an unchanged incremental re-run of ``root``.
+
+    File times are moved out of the racy window first, so the second
+    run trusts the (mtime, size) signatures like it would on a real
+    checkout. The manifest lives in a scratch cache directory.
+    """
+    past = time.time() - BACKDATE_SECONDS
+    for path in Path(root).rglob('*'):
+        os.utime(path, (past, past))
+    with tempfile.TemporaryDirectory() as cache:
+        for _ in range(2):
+            report = _child('--child-incremental', root,
+                            VALIDATION_INCREMENTAL='1',
+                            VALIDATION_CACHE_DIR=cache)
+    return report
+
+
+def run_child(root):
+    """Measure ``root`` in a fresh interpreter; add its wall time."""
+    start = time.perf_counter()
+    report = _child('--child', root, VALIDATION_INCREMENTAL='0')
+    wall = time.perf_counter() - start
+    report['wall_seconds'] = round(wall, 6)
+    return report
+
+
+def _revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+            check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    path = Path(path)
+    if not path.is_file():
+        return []
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))['runs']
+    except (ValueError, KeyError):
+        return []
+
+
+def save_history(path, runs):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps({'version': 1, 'runs': runs}, indent=2) + '\n',
+                   encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def _comparable(entry, other):
+    return (entry['spec'] == other['spec'] and
+            entry['python'] == other['python'])
+
+
+def check_regression(history, entry, threshold=DEFAULT_THRESHOLD,
+                     window=HISTORY_WINDOW):
+    """Return messages for tracked metrics that regressed.
+
+    Each metric is compared with the median of the last ``window``
+    comparable runs; exceeding it by more than ``threshold`` (a fraction)
+    counts as a regression.
+    """
+    previous = [run for run in history if _comparable(entry, run)][-window:]
+    if not previous:
+        return []
+    regressions = []
+    for metric in TRACKED_METRICS:
+        # Runs recorded before a metric was tracked do not count for it.
+        values = [run[metric] for run in previous if metric in run]
+        if not values or metric not in entry:
+            continue
+        baseline = statistics.median(values)
+        value = entry[metric]
+        if baseline and value > baseline * (1 + threshold):
+            regressions.append(
+                f"{metric}: {value} vs median {baseline} "
+                f"(+{(value / baseline - 1) * 100:.0f}%, "
+                f"threshold {threshold * 100:.0f}%)")
+    return regressions
+
+
+def check_budget(entry, budget=INCREMENTAL_BUDGET_SECONDS):
+    """Return messages for an incremental run that missed its budget."""
+    value = entry.get('incremental_seconds')
+    if value is None or value <= budget:
+        return []
+    return [f"incremental_seconds: {value} over budget {budget}"]
+
+
+def _print_report(entry, regressions, out):
+    print(f"Synthetic repository: {entry['spec']}", file=out)
+    print(f"  wall {entry['wall_seconds']:.3f}s  walks {entry['walks']}  "
+          f"read {entry['bytes_read']} bytes  "
+          f"peak RSS {entry['peak_rss_kb']} KB", file=out)
+    print(f"  incremental re-run {entry['incremental_seconds'] * 1000:.2f} ms"
+          f"  read {entry['incremental_bytes_read']} bytes", file=out)
+    ranked = sorted(entry['rules'].items(),
+                    key=lambda item: item[1]['seconds'], reverse=True)
+    for rule_id, stats in ranked:
+        print(f"  {stats['seconds'] * 1000:9.2f} ms  {stats['walks']} walk(s)"
+              f"  {stats['bytes_read']:>10} B  {rule_id} ({stats['status']})",
+              file=out)
+    for message in regressions:
+        print(f"REGRESSION {message}", file=out)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m tests.benchmarks.suite',
+        description='Benchmark the validators on a synthetic repository.')
+    defaults = RepoSpec()
+    parser.add_argument('--files', type=int, default=defaults.files)
+    parser.add_argument('--depth', type=int, default=defaults.depth)
+    parser.add_argument('--file-size', type=int, default=defaults.file_size)
+    parser.add_argument('--ignored-files', type=int,
+                        default=defaults.ignored_files)
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('--history', type=Path,
+                        help=f'history file (default: '
+                             f'$VALIDATION_CACHE_DIR/{HISTORY_NAME})')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed slowdown as a fraction (default: '
+                             '%(default)s)')
+    parser.add_argument('--no-record', action='store_true',
+                        help='compare against history without appending')
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--child', metavar='ROOT', help=argparse.SUPPRESS)
+    parser.add_argument('--child-incremental', metavar='ROOT',
+                        help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None, out=None):
+    out = out or sys.stdout
+    args = build_parser().parse_args(argv)
+    if args.child:
+        print(json.dumps(measure_repository(Path(args.child))), file=out)
+        return 0
+    if args.child_incremental:
+        print(json.dumps(measure_incremental(Path(args.child_incremental))),
+              file=out)
+        return 0
+
+    spec = RepoSpec(args.files, args.depth, args.file_size,
+                    args.ignored_files, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_repo(tmp, spec)
+        report = run_child(tmp)
+        report.update(run_incremental(tmp))
+    entry = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'revision': _revision(),
+        'python': platform.python_version(),
+        'spec': spec.to_dict(),
+        **report,
+    }
+    path = args.history or history_path()
+    history = load_history(path)
+    regressions = check_regression(history, entry, args.threshold)
+    regressions += check_budget(entry)
+    if not args.no_record:
+        save_history(path, history + [entry])
+    if args.json:
+        print(json.dumps(dict(entry, regressions=regressions), indent=2),
+              file=out)
+    else:
+        _print_report(entry, regressions, out)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
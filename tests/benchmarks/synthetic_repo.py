@@ -0,0 +1,155 @@
+"""
+Synthetic repository generator for validation benchmarks.
+Usage: python -m tests.benchmarks.synthetic_repo DEST [--files N] ...
+"""
+
+import argparse
+import json
+import random
+from pathlib import Path
+
+from tests.benchmarks.yaml_backends import generate_pipeline_yaml
+
+
+# Directories a real checkout accumulates that validation must prune.
+IGNORED_TREES = ('.git/objects', 'build/app/intermediates', '.dart_tool/pub')
+
+EXTENSIONS = ('.yaml', '.yml', '.json', '.xml', '.dart')
+
+
+class RepoSpec:
+    """Shape of a synthetic repository.
+
+    ``files`` validated files are spread over directories ``depth``
+    levels deep, each roughly ``file_size`` bytes. Every ignored tree
+    receives ``ignored_files`` files that a pruned walk never sees.
+    """
+
+    def __init__(self, files=200, depth=4, file_size=2048,
+                 ignored_files=500, seed=0):
+        self.files = files
+        self.depth = depth
+        self.file_size = file_size
+        self.ignored_files = ignored_files
+        self.seed = seed
+
+    def to_dict(self):
+        return {'files': self.files, 'depth': self.depth,
+                'file_size': self.file_size,
+                'ignored_files': self.ignored_files, 'seed': self.seed}
+
+
+def _yaml_body(rng, size):
+    lines = ['name: synthetic', 'settings:']
+    while sum(len(line) + 1 for line in lines) < size:
+        key = f'key_{rng.randrange(10 ** 6)}'
+        lines.append(f'  {key}: value {rng.randrange(10 ** 6)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _json_body(rng, size):
+    data, length = {}, 2
+    while length < size:
+        key = f'key_{rng.randrange(10 ** 6)}'
+        data[key] = [rng.randrange(1000) for _ in range(8)]
+        length += len(key) + 40
+    return json.dumps(data, indent=2) + '\n'
+
+
+def _xml_body(rng, size):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<project>']
+    while sum(len(line) + 1 for line in lines) < size:
+        lines.append(f'  <option name="o{rng.randrange(10 ** 6)}" '
+                     f'value="{rng.randrange(10 ** 6)}" />')
+    lines.append('</project>')
+    return '\n'.join(lines) + '\n'
+
+
+def _dart_body(rng, size):
+    lines = ["import 'package:flutter/material.dart';", '']
+    while sum(len(line) + 1 for line in lines) < size:
+        lines.append(f'const value{rng.randrange(10 ** 6)} = '
+                     f'{rng.randrange(10 ** 6)};')
+    return '\n'.join(lines) + '\n'
+
+
+_BODIES = {'.yaml': _yaml_body, '.yml': _yaml_body, '.json': _json_body,
+           '.xml': _xml_body, '.dart': _dart_body}
+
+
+def _root_files(spec):
+    return {
+        'pubspec.yaml': ('name: synthetic\ndescription: Benchmark repo\n'
+                         'version: 1.0.0\nenvironment:\n'
+                         "  sdk: '>=3.0.0 <4.0.0'\ndependencies:\n"
+                         '  flutter:\n    sdk: flutter\ndev_dependencies:\n'
+                         '  test: ^1.25.0\n  yaml: ^3.1.2\n'),
+        'azure-pipelines.yml': generate_pipeline_yaml(
+            jobs=max(1, spec.file_size // 2048), steps=5).replace(
+            'stages:', "strategy:\n  matrix:\n    linux:\n"
+                       "      imageName: 'ubuntu-22.04'\n    mac:\n"
+                       "      imageName: 'macOS-15'\npool:\n"
+                       "  vmImage: $(imageName)\nsteps:\n"
+                       "  - task: FlutterInstall@0\n"
+                       "  - task: FlutterBuild@0\n    inputs:\n"
+                       "      target: 'web'\nstages:"),
+        'analysis_options.yaml': 'include: package:lints/recommended.yaml\n',
+        'renovate.json': '{\n  "extends": ["config:base"]\n}\n',
+        'run_tests.sh': '#!/bin/bash\npython -m pytest tests/\n',
+        'run_validation_tests.sh': '#!/bin/bash\nflutter test\n',
+        '.whitesource': '{}\n',
+    }
+
+
+def generate_repo(root, spec=None):
+    """Write a synthetic repository described by ``spec`` under ``root``.
+
+    Returns the number of bytes written to validated (non-ignored) files.
+    """
+    spec = spec or RepoSpec()
+    rng = random.Random(spec.seed)
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for name, content in _root_files(spec).items():
+        (root / name).write_text(content, encoding='utf-8')
+        written += len(content)
+
+    for i in range(spec.files):
+        parts = [f'module_{(i >> level) % 4}' for level in
+                 range(1 + i % max(1, spec.depth))]
+        extension = EXTENSIONS[i % len(EXTENSIONS)]
+        directory = root.joinpath(*parts)
+        directory.mkdir(parents=True, exist_ok=True)
+        content = _BODIES[extension](rng, spec.file_size)
+        (directory / f'file_{i}{extension}').write_text(content,
+                                                        encoding='utf-8')
+        written += len(content)
+
+    for tree in IGNORED_TREES:
+        for i in range(spec.ignored_files):
+            directory = root / tree / f'{i % 16:02x}'
+            directory.mkdir(parents=True, exist_ok=True)
+            extension = EXTENSIONS[i % len(EXTENSIONS)]
+            (directory / f'blob_{i}{extension}').write_text(
+                _BODIES[extension](rng, 256), encoding='utf-8')
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('dest')
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--file-size', type=int, default=2048)
+    parser.add_argument('--ignored-files', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    spec = RepoSpec(args.files, args.depth, args.file_size,
+                    args.ignored_files, args.seed)
+    written = generate_repo(args.dest, spec)
+    print(f"Wrote {spec.files} files ({written} bytes) to {args.dest}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Parse-speed benchmark for the available YAML backends.
+Usage: python -m tests.benchmarks.yaml_backends [--files N] [--jobs N]
+"""
+
+import argparse
+import json
+import time
+
+from tests.yaml_backend import available_backends, compare_backends
+
+
+def generate_pipeline_yaml(jobs=50, steps=20, seed=0):
+    """Return a large Azure-style pipeline document as text."""
+    lines = [
+        'trigger:',
+        '  branches:',
+        '    include: [master, "release/*"]',
+        'variables:',
+        '  FLUTTER_CHANNEL: stable',
+        f'  FLUTTER_VERSION: 3.{seed % 40}.{seed % 7}',
+        'parameters:',
+        '  - name: webBuilds',
+        '    type: object',
+        '    default:',
+        '      - type: Debug',
+        '      - type: Release',
+        'stages:',
+        '  - stage: build',
+        '    jobs:',
+    ]
+    for job in range(jobs):
+        lines += [
+            f'      - job: job_{seed}_{job}',
+            f'        displayName: "Build target {job}"',
+            '        pool:',
+            f"          vmImage: '{('ubuntu-22.04', 'macOS-15')[job % 2]}'",
+            '        steps:',
+        ]
+        for step in range(steps):
+            lines += [
+                '          - task: FlutterBuild@0',
+                '            inputs:',
+                f"              target: '{('web', 'apk', 'ios')[step % 3]}'",
+                '              projectDirectory: .',
+                f'              buildNumber: {step}',
+                f'              verbose: {str(step % 2 == 0).lower()}',
+                f'            displayName: "Step {step} of job {job}"',
+            ]
+    return '\n'.join(lines) + '\n'
+
+
+def benchmark(texts, backends, repeat=3):
+    """Return ``{backend: files_per_second}``, best of ``repeat`` runs."""
+    results = {}
+    for backend in backends:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for text in texts:
+                backend.load(text)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[backend.name] = len(texts) / best
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=20,
+                        help='number of generated pipeline files')
+    parser.add_argument('--jobs', type=int, default=50,
+                        help='jobs per generated pipeline')
+    parser.add_argument('--steps', type=int, default=20,
+                        help='steps per job')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true',
+                        help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    texts = [generate_pipeline_yaml(args.jobs, args.steps, seed)
+             for seed in range(args.files)]
+    backends = available_backends()
+    mismatches = compare_backends(texts[:3], backends)
+    if mismatches:
+        raise SystemExit(f"Backends disagree on the corpus: {mismatches}")
+    results = benchmark(texts, backends, args.repeat)
+
+    if args.json:
+        print(json.dumps({'files': len(texts),
+                          'bytes_per_file': len(texts[0]),
+                          'files_per_second': results}, indent=2))
+        return
+    print(f"{len(texts)} files x {len(texts[0]) // 1024} KB")
+    slowest = min(results.values())
+    for name, rate in results.items():
+        print(f"  {name:<8} {rate:10.1f} files/s  ({rate / slowest:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Latency and allocation benchmark: event-stream path queries vs full loads.
+Usage: python -m tests.benchmarks.yaml_query [--jobs N] [--steps N] [--json]
+
+Each query is answered twice on a generated pipeline: by loading the
+whole document with the session YAML backend and resolving the path,
+and by ``query_yaml``. Times are the best of ``--repeat`` runs; peak
+allocations are measured separately with tracemalloc.
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from tests.benchmarks.yaml_backends import generate_pipeline_yaml
+from tests.yaml_backend import load
+from tests.yaml_query import parse_path, query_yaml, resolve
+
+
+# What the structural checks ask. ``main`` adds the last job, a path at
+# the end of the file that bounds the worst case for early exit.
+QUERIES = {
+    'flutter_config': ['variables', 'variables.FLUTTER_VERSION',
+                       'variables.FLUTTER_CHANNEL'],
+    'parameters': ['parameters', 'parameters[name=webBuilds]'],
+    'web_builds_type': ['parameters[name=webBuilds].type'],
+}
+
+
+def _full_load(text, paths):
+    value = load(text)
+    return {path: resolve(value, parse_path(path)) for path in paths}
+
+
+def _best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _peak_bytes(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(text, queries, repeat=5):
+    """Return ``{name: measurements}`` comparing both strategies."""
+    results = {}
+    for name, paths in queries.items():
+        full = _full_load(text, paths)
+        streamed = query_yaml(text, paths)
+        if full != streamed:
+            raise AssertionError(f"{name}: {streamed!r} != {full!r}")
+        load_seconds = _best_time(lambda: _full_load(text, paths), repeat)
+        query_seconds = _best_time(lambda: query_yaml(text, paths), repeat)
+        results[name] = {
+            'paths': paths,
+            'load_ms': round(load_seconds * 1000, 3),
+            'query_ms': round(query_seconds * 1000, 3),
+            'speedup': round(load_seconds / query_seconds, 1),
+            'load_peak_kb': _peak_bytes(
+                lambda: _full_load(text, paths)) // 1024,
+            'query_peak_kb': _peak_bytes(
+                lambda: query_yaml(text, paths)) // 1024,
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--jobs', type=int, default=200,
+                        help='jobs in the generated pipeline')
+    parser.add_argument('--steps', type=int, default=20,
+                        help='steps per job')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true',
+                        help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    text = generate_pipeline_yaml(args.jobs, args.steps)
+    queries = dict(QUERIES, last_job=[f'stages[0].jobs[{args.jobs - 1}]'])
+    results = benchmark(text, queries, args.repeat)
+    if args.json:
+        print(json.dumps({'bytes': len(text), 'queries': results},
+                         indent=2))
+        return
+    print(f"pipeline of {len(text) // 1024} KB "
+          f"({args.jobs} jobs x {args.steps} steps)")
+    print(f"  {'query':<16} {'load ms':>9} {'query ms':>9} {'speedup':>8} "
+          f"{'load KB':>9} {'query KB':>9}")
+    for name, row in results.items():
+        print(f"  {name:<16} {row['load_ms']:9.2f} {row['query_ms']:9.2f} "
+              f"{row['speedup']:7.1f}x {row['load_peak_kb']:9} "
+              f"{row['query_peak_kb']:9}")
+
+
+if __name__ == '__main__':
+    main()
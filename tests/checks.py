@@ -0,0 +1,400 @@
+"""
+Per-file validation checks used by the validation engine.
+Each check takes a cached document and returns its failure messages.
+"""
+
+import hashlib
+import json
+import types
+from pathlib import Path
+
+from tests.document_cache import get_document_cache
+from tests.instrumentation import span
+from tests.line_scanner import scan_document
+from tests.parallel import (
+    configured_readers, configured_workers, run_parallel)
+from tests.secret_scan import scan_document as scan_secrets
+from tests.xml_validation import scan_document as scan_xml
+from tests.yaml_query import MISSING, query_document
+
+
+def _hash_code(digest, code):
+    """Hash ``code`` and, recursively, its nested code objects
+    (comprehensions, lambdas), whose reprs include memory addresses."""
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode('utf-8'))
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _hash_code(digest, const)
+        elif isinstance(const, frozenset):
+            # Set order varies with string hash randomization.
+            digest.update(repr(sorted(const, key=repr)).encode('utf-8'))
+        else:
+            digest.update(repr(const).encode('utf-8'))
+
+
+class FileCheck:
+    """A named per-file check and the fingerprint of its definition.
+
+    ``requires`` names an optional module (e.g. ``'yaml'``) without which
+    the check cannot run. A ``batch`` check takes a list of documents and
+    returns one failure list per document, so it can validate every file
+    of its kind in a single call.
+    """
+
+    def __init__(self, name, func, requires=None, batch=False):
+        self.name = name
+        self.func = func
+        self.requires = requires
+        self.batch = batch
+        digest = hashlib.sha256()
+        _hash_code(digest, func.__code__)
+        self.fingerprint = digest.hexdigest()[:16]
+
+    def __call__(self, document):
+        if self.batch:
+            return self.func([document])[0]
+        return self.func(document)
+
+
+CHECKS = {}
+
+
+def check(name, requires=None, batch=False):
+    """Register the decorated function as the per-file check ``name``."""
+    def register(func):
+        CHECKS[name] = FileCheck(name, func, requires, batch)
+        return func
+    return register
+
+
+def _yaml_errors():
+    from tests.yaml_backend import get_backend
+    return get_backend().errors
+
+
+@check('yaml_valid', requires='yaml')
+def yaml_valid(document):
+    try:
+        data = document.parsed
+    except _yaml_errors() as e:
+        return [f"Invalid YAML in {document.path}: {e}"]
+    except UnicodeDecodeError as e:
+        return [f"Invalid YAML in {document.path}: {e}"]
+    if data is None:
+        return [f"{document.path} should not be an empty YAML document"]
+    return []
+
+
+@check('yaml_not_empty')
+def yaml_not_empty(document):
+    if not document.text.strip():
+        return [f"{document.path} should not be empty"]
+    return []
+
+
+@check('yaml_no_tabs')
+def yaml_no_tabs(document):
+    return scan_document(document).messages('tabs', document.path)
+
+
+@check('yaml_no_trailing_whitespace')
+def yaml_no_trailing_whitespace(document):
+    return scan_document(document).messages('trailing_whitespace',
+                                            document.path)
+
+
+@check('unix_line_endings')
+def unix_line_endings(document):
+    return scan_document(document).messages('crlf', document.path)
+
+
+@check('utf8_encoding')
+def utf8_encoding(document):
+    return scan_document(document).messages('utf8', document.path)
+
+
+@check('reasonable_size')
+def reasonable_size(document):
+    return scan_document(document).messages('size', document.path)
+
+
+@check('json_valid')
+def json_valid(document):
+    try:
+        data = document.parsed
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return [f"Invalid JSON in {document.path}: {e}"]
+    if data is None:
+        return [f"{document.path} should not be null"]
+    return []
+
+
+@check('json_not_empty')
+def json_not_empty(document):
+    data = document.parsed
+    if isinstance(data, dict) and not (len(data) > 0 or data == {}):
+        return [f"{document.path} should have content or be explicitly empty"]
+    return []
+
+
+@check('no_secrets')
+def no_secrets(document):
+    return [f"{document.path}:{f.line}:{f.column}: possible {f.rule} "
+            f"({f.preview}); mark the line 'secret-scan: allow' or "
+            f"accept it with python -m tests.secret_scan --update-baseline"
+            for f in scan_secrets(document)]
+
+
+@check('exists')
+def exists(document):
+    return []
+
+
+@check('not_empty')
+def not_empty(document):
+    if not document.text:
+        return [f"{document.path.name} should not be empty"]
+    return []
+
+
+@check('xml_valid')
+def xml_valid(document):
+    messages = []
+    for issue in scan_xml(document).issues:
+        where = f":{issue.line}:{issue.column}" if issue.line else ''
+        messages.append(f"{document.path.name}{where}: {issue.message}")
+    return messages
+
+
+def _missing_keys(config, keys, message):
+    if not isinstance(config, dict):
+        return [message.format(key=keys[0])]
+    return [message.format(key=key) for key in keys if key not in config]
+
+
+def _schema_failures(documents, schema_name):
+    """Validate ``documents`` against the compiled schema in one call."""
+    from tests.schema import get_validator
+
+    results = [None] * len(documents)
+    pending = []
+    for i, document in enumerate(documents):
+        key = ('schema', schema_name)
+        if key in document.memo:
+            results[i] = document.memo[key]
+            continue
+        try:
+            pending.append((i, document.parsed))
+        except Exception as e:
+            results[i] = [f"{document.path.name} could not be parsed: {e}"]
+    batch = get_validator(schema_name).validate_many(
+        [value for _, value in pending])
+    for (i, _), violations in zip(pending, batch):
+        name = documents[i].path.name
+        results[i] = documents[i].memo[('schema', schema_name)] = [
+            f"{name}: {v.path}: {v.message}" for v in violations]
+    return results
+
+
+@check('renovate_schema', batch=True)
+def renovate_schema(documents):
+    return _schema_failures(documents, 'renovate')
+
+
+@check('pubspec_schema', requires='yaml', batch=True)
+def pubspec_schema(documents):
+    return _schema_failures(documents, 'pubspec')
+
+
+@check('pubspec_test_dependencies', requires='yaml')
+def pubspec_test_dependencies(document):
+    config = document.parsed
+    failures = _missing_keys(config, ['dev_dependencies'],
+                             "pubspec.yaml should have {key}")
+    if failures:
+        return failures
+    return _missing_keys(config['dev_dependencies'] or {}, ['test', 'yaml'],
+                         "{key} package should be in dev_dependencies")
+
+
+@check('analysis_options_structure', requires='yaml')
+def analysis_options_structure(document):
+    # Common analysis options keys
+    valid_keys = ['include', 'analyzer', 'linter']
+    if all(value is MISSING
+           for value in query_document(document, *valid_keys)):
+        return ["analysis_options.yaml should have linter configuration"]
+    return []
+
+
+@check('azure_pipelines_schema', requires='yaml', batch=True)
+def azure_pipelines_schema(documents):
+    return _schema_failures(documents, 'azure_pipelines')
+
+
+@check('azure_pipelines_flutter_config', requires='yaml')
+def azure_pipelines_flutter_config(document):
+    variables, version, channel = query_document(
+        document, 'variables', 'variables.FLUTTER_VERSION',
+        'variables.FLUTTER_CHANNEL')
+    if variables is MISSING:
+        return ["Pipeline should have variables"]
+    failures = []
+    if version is MISSING:
+        failures.append("Should specify Flutter version")
+    if channel is MISSING:
+        failures.append("Should specify Flutter channel")
+    return failures
+
+
+@check('azure_pipelines_parameters', requires='yaml')
+def azure_pipelines_parameters(document):
+    parameters, web_builds = query_document(
+        document, 'parameters', 'parameters[name=webBuilds]')
+    if parameters is MISSING:
+        return ["Pipeline should have parameters section"]
+    if not isinstance(parameters, list):
+        return ["Pipeline parameters should be a list"]
+    if web_builds is MISSING:
+        return ["Should have webBuilds parameter"]
+    if web_builds.get('type') != 'object':
+        return ["webBuilds parameter should have type 'object'"]
+    return []
+
+
+@check('azure_pipelines_multi_platform', requires='yaml')
+def azure_pipelines_multi_platform(document):
+    matrix, = query_document(document, 'strategy.matrix')
+    # Should build for at least 2 platforms
+    if len(matrix or {}) < 2:
+        return ["Should build for multiple platforms"]
+    return []
+
+
+@check('azure_pipelines_flutter_install')
+def azure_pipelines_flutter_install(document):
+    # Should have FlutterInstall task
+    if 'FlutterInstall' not in document.text:
+        return ["Pipeline should install Flutter"]
+    return []
+
+
+@check('azure_pipelines_web_build')
+def azure_pipelines_web_build(document):
+    # Should have web build target
+    if "target: 'web'" not in document.text:
+        return ["Pipeline should build web target"]
+    return []
+
+
+@check('shell_shebang')
+def shell_shebang(document):
+    first_line = document.text.split('\n', 1)[0]
+    failures = []
+    if not first_line.startswith('#!'):
+        failures.append(f"{document.path.name} should have shebang")
+    if 'bash' not in first_line.lower():
+        failures.append(f"{document.path.name} should use bash")
+    return failures
+
+
+@check('shell_has_commands')
+def shell_has_commands(document):
+    # Should have more than just shebang and comments
+    lines = [l for l in document.text.split('\n')
+             if l.strip() and not l.strip().startswith('#')]
+    if not lines:
+        return [f"{document.path.name} should have executable commands"]
+    return []
+
+
+def _evaluate_batch(file_check, paths, documents):
+    with span('check', file_check.name, files=len(paths)):
+        try:
+            return [list(failures) for failures in
+                    file_check.func([documents.get(path) for path in paths])]
+        except Exception as e:
+            return [[f"{file_check.name} failed on {path}: {e!r}"]
+                    for path in paths]
+
+
+def _evaluate(file_check, path, documents):
+    try:
+        with span('check', file_check.name, path=path):
+            return list(file_check(documents.get(path)))
+    except Exception as e:
+        return [f"{file_check.name} failed on {path}: {e!r}"]
+
+
+def _evaluate_prefetched(file_check, paths):
+    """Evaluate ``paths`` in-process as the prefetcher delivers them."""
+    # Imported here: asyncio costs every run start, prefetching or not.
+    from tests.prefetch import prefetch_documents
+
+    cache = get_document_cache()
+    loaded = {}
+    if file_check.batch:
+        for path, document in prefetch_documents(paths, cache):
+            loaded[path] = document
+        return _evaluate_batch(file_check, paths, _Loaded(loaded, cache))
+    for path, document in prefetch_documents(paths, cache):
+        loaded[path] = _evaluate(file_check, path,
+                                 _Loaded({path: document}, cache))
+    return [loaded[path] for path in paths]
+
+
+class _Loaded:
+    """Prefetched documents, falling back to the cache for failed reads."""
+
+    def __init__(self, documents, cache):
+        self.documents = documents
+        self.cache = cache
+
+    def get(self, path):
+        document = self.documents.get(path)
+        return document if document is not None else self.cache.get(path)
+
+
+def _check_worker(task):
+    name, path = task
+    return _evaluate(CHECKS[name], Path(path), get_document_cache())
+
+
+def run_check(name, paths):
+    """Return ``(path, failures)`` pairs for check ``name`` over ``paths``.
+
+    Files are checked on the process pool configured by
+    ``VALIDATION_WORKERS``, or in one in-process call for batch checks;
+    results keep the order of ``paths``. With ``VALIDATION_PREFETCH``
+    in-process checks consume files as overlapped reads complete. With
+    ``VALIDATION_INCREMENTAL=1`` verdicts for unchanged files are taken
+    from the persisted manifest instead of being recomputed.
+    """
+    from tests.incremental import get_manifest
+
+    file_check = CHECKS[name]
+    manifest = get_manifest()
+    paths = [Path(path) for path in paths]
+    results = [None] * len(paths)
+    pending = []
+    for i, path in enumerate(paths):
+        if manifest is not None:
+            results[i] = manifest.verdict(path, file_check)
+        if results[i] is None:
+            pending.append(i)
+    if configured_readers() and pending and (
+            file_check.batch or configured_workers() == 1):
+        computed = _evaluate_prefetched(file_check,
+                                        [paths[i] for i in pending])
+    elif file_check.batch:
+        computed = _evaluate_batch(file_check, [paths[i] for i in pending],
+                                   get_document_cache())
+    else:
+        computed = run_parallel(_check_worker,
+                                [(name, str(paths[i])) for i in pending])
+    for i, failures in zip(pending, computed):
+        results[i] = failures
+        if manifest is not None:
+            manifest.record(paths[i], file_check, failures)
+    return list(zip(paths, results))
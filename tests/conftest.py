@@ -0,0 +1,41 @@
+"""
+pytest hooks that feed per-test timings into the instrumentation layer
+and print its ranked summary when VALIDATION_PROFILE is set. With
+VALIDATION_JUNIT=FILE or VALIDATION_SARIF=FILE the rule results are also
+written as JUnit XML or SARIF.
+"""
+
+import os
+
+import pytest
+
+from tests import instrumentation
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    with instrumentation.span('test', item.nodeid):
+        return (yield)
+
+
+def pytest_terminal_summary(terminalreporter):
+    profiler = instrumentation.get_profiler()
+    if profiler is None:
+        return
+    terminalreporter.write_sep('=', 'validation profile')
+    terminalreporter.write_line(profiler.summary())
+    profiler.reported = True
+
+
+def pytest_sessionfinish(session):
+    from tests import validate
+    from tests.result_store import write_report
+
+    if validate._store is None:
+        return
+    for variable, format in (('VALIDATION_JUNIT', 'junit'),
+                             ('VALIDATION_SARIF', 'sarif')):
+        path = os.environ.get(variable)
+        if path:
+            with open(path, 'w', encoding='utf-8') as out:
+                write_report(validate._store, format, out)
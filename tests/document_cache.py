@@ -0,0 +1,254 @@
+"""
+Parse-once document cache shared by the validation tests.
+Each file is read, decoded and parsed at most once per run.
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+from tests.instrumentation import count, span
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # 64 MB
+
+JSON_EXTENSIONS = ('.json',)
+YAML_EXTENSIONS = ('.yml', '.yaml')
+# pubspec.lock is YAML despite its extension.
+YAML_FILENAMES = ('pubspec.lock',)
+
+
+def parse_format(path):
+    """Return ``'json'``, ``'yaml'`` or None for the file at ``path``."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in JSON_EXTENSIONS:
+        return 'json'
+    if suffix in YAML_EXTENSIONS or path.name in YAML_FILENAMES:
+        return 'yaml'
+    return None
+
+
+class Document:
+    """One file's bytes plus its lazily decoded text and parse tree.
+
+    Nothing is read until ``data`` (or something derived from it) is
+    first needed; ``chunks()`` streams the file without loading it.
+    Parse trees are shared between every test that asks for them and
+    must be treated as read-only.
+    """
+
+    def __init__(self, path, data=None, signature=None, cache=None):
+        self.path = Path(path)
+        self.signature = signature
+        self.memo = {}
+        self._data = data
+        self._cache = cache
+        self._digest = None
+        self._text = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self.path.read_bytes()
+            if self._cache is not None:
+                self._cache.reads += 1
+                self._cache.bytes_read += len(self._data)
+            count('io.reads')
+            count('io.bytes_read', len(self._data))
+        return self._data
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.data).hexdigest()
+            if self._cache is not None:
+                self._cache._add_digest(self._digest)
+        return self._digest
+
+    @property
+    def size(self):
+        if self._data is None and self.signature is not None:
+            return self.signature[1]
+        return len(self.data)
+
+    @property
+    def text(self):
+        """The UTF-8 decoded contents; raises UnicodeDecodeError."""
+        if self._text is None:
+            self._text = self.data.decode('utf-8')
+        return self._text
+
+    def chunks(self, chunk_size=64 * 1024):
+        """Yield the contents in ``chunk_size`` pieces.
+
+        Already loaded bytes are sliced in place; otherwise the file is
+        streamed from disk so memory use stays bounded.
+        """
+        if self._data is not None:
+            view = memoryview(self._data)
+            for start in range(0, len(view), chunk_size):
+                yield view[start:start + chunk_size]
+            return
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                if self._cache is not None:
+                    self._cache.bytes_read += len(chunk)
+                count('io.bytes_read', len(chunk))
+                yield chunk
+
+    @property
+    def _trees(self):
+        return self._cache._trees if self._cache is not None else self.memo
+
+    @property
+    def has_parsed(self):
+        """Whether ``parsed`` is already cached (or its error is)."""
+        return (self.digest, parse_format(self.path)) in self._trees
+
+    @property
+    def parsed(self):
+        """The parsed JSON or YAML tree; parse errors are re-raised."""
+        trees = self._trees
+        key = (self.digest, parse_format(self.path))
+        if key not in trees:
+            count('parse.calls')
+            try:
+                with span('parse', key[1], path=self.path):
+                    trees[key] = (True, self._parse(key[1]))
+            except Exception as error:  # cached and re-raised below
+                trees[key] = (False, error)
+        else:
+            count('parse.cache_hits')
+        ok, value = trees[key]
+        if not ok:
+            raise value
+        return value
+
+    def _parse(self, fmt):
+        if fmt == 'json':
+            return json.loads(self.text)
+        if fmt == 'yaml':
+            from tests.yaml_backend import load
+            return load(self.text)
+        raise ValueError(f"Don't know how to parse {self.path.name}")
+
+
+class DocumentCache:
+    """LRU cache of documents keyed by path and (mtime, size).
+
+    Entries are evicted least recently used first once the total size
+    of the cached files exceeds ``max_bytes``. Parse trees are keyed by
+    content digest, so identical files share a single parse.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.reads = 0
+        self.bytes_read = 0
+        self._entries = OrderedDict()
+        self._trees = {}
+        self._digest_refs = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path):
+        """Return the current document for ``path``, reading it if stale."""
+        path = Path(path)
+        stat = os.stat(path)
+        count('fs.stat')
+        signature = (stat.st_mtime_ns, stat.st_size)
+        document = self._entries.get(path)
+        if document is not None and document.signature == signature:
+            self._entries.move_to_end(path)
+            return document
+        if document is not None:
+            self._discard(path)
+        document = Document(path, signature=signature, cache=self)
+        self._entries[path] = document
+        self.total_bytes += document.size
+        self._evict()
+        return document
+
+    def signature(self, path):
+        """Return the cached (mtime, size) of ``path`` without a stat."""
+        document = self._entries.get(Path(path))
+        return document.signature if document is not None else None
+
+    def put(self, path, signature, data=None):
+        """Return the document for ``path`` given a fresh ``signature``.
+
+        For callers that already did the I/O themselves: the cached
+        entry is reused if ``signature`` still matches, otherwise
+        ``data`` (read when ``signature`` was taken) replaces it.
+        """
+        path = Path(path)
+        document = self._entries.get(path)
+        if document is not None and document.signature == signature:
+            self._entries.move_to_end(path)
+            return document
+        if data is None:
+            return self.get(path)
+        if document is not None:
+            self._discard(path)
+        self.reads += 1
+        self.bytes_read += len(data)
+        count('io.reads')
+        count('io.bytes_read', len(data))
+        document = Document(path, data=data, signature=signature, cache=self)
+        self._entries[path] = document
+        self.total_bytes += document.size
+        self._evict()
+        return document
+
+    def _add_digest(self, digest):
+        self._digest_refs[digest] = self._digest_refs.get(digest, 0) + 1
+
+    def _discard(self, path):
+        document = self._entries.pop(path)
+        self.total_bytes -= document.size
+        digest = document._digest
+        if digest is None:
+            return
+        self._digest_refs[digest] -= 1
+        if not self._digest_refs[digest]:
+            del self._digest_refs[digest]
+            for key in [key for key in self._trees if key[0] == digest]:
+                del self._trees[key]
+
+    def _evict(self):
+        # Always keep the newest entry, even if it alone exceeds the cap.
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._discard(next(iter(self._entries)))
+
+    def clear(self):
+        self._entries.clear()
+        self._trees.clear()
+        self._digest_refs.clear()
+        self.total_bytes = 0
+
+
+_cache = None
+
+
+def get_document_cache():
+    """Return the session-wide cache.
+
+    Its size cap can be set in bytes with ``VALIDATION_CACHE_BYTES``.
+    """
+    global _cache
+    if _cache is None:
+        max_bytes = int(os.environ.get('VALIDATION_CACHE_BYTES',
+                                       DEFAULT_MAX_BYTES))
+        _cache = DocumentCache(max_bytes)
+    return _cache
+
+
+def reset_document_cache():
+    """Drop the session-wide cache so the next run starts cold."""
+    global _cache
+    _cache = None
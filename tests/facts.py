@@ -0,0 +1,556 @@
+"""
+Typed facts extracted from configuration files, and cross-file checks.
+
+The same facts (toolchain versions, SDK constraints, dependency pins,
+CI job names) are repeated in several files and drift apart. Each
+extractor pulls the facts of one kind of file out of its cached parse
+tree, memoized on the document, so building a ``FactsIndex`` costs no
+extra reads or parses. Consistency checks then compare facts across
+files with plain index lookups.
+"""
+
+import os
+import re
+from collections import namedtuple
+from functools import total_ordering
+from pathlib import Path
+
+from tests.file_index import glob_regex
+from tests.instrumentation import count, span
+from tests.lockfile import (
+    DIRECT_DEV, DIRECT_MAIN, DIRECT_OVERRIDDEN, load_lockfile)
+from tests.xml_validation import module_filepaths
+
+
+# Kinds of facts.
+TOOLCHAIN = 'toolchain'          # key: tool, value: version in use
+SDK_CONSTRAINT = 'sdk'           # key: sdk, value: pubspec.yaml constraint
+SDK_LOCKED = 'sdk_locked'        # key: sdk, value: pubspec.lock constraint
+DEPENDENCY = 'dependency'        # key: package, value: hosted constraint
+LOCKED = 'locked'                # key: package, value: resolved version
+DECLARED_KIND = 'declared_kind'  # key: package, value: pubspec section kind
+LOCKED_KIND = 'locked_kind'      # key: package, value: lock dependency kind
+WORKFLOW_JOB = 'workflow_job'    # key: job display name, value: job id
+MODULE_REF = 'module_ref'        # key: module path, value: modules.xml entry
+MODULE_FILE = 'module_file'      # key: module path, value: path as indexed
+
+Fact = namedtuple('Fact', 'kind key value path')
+
+# CI variables and step inputs that pin a toolchain version.
+TOOLCHAIN_VARIABLES = {'FLUTTER_VERSION': 'flutter', 'DART_VERSION': 'dart',
+                       'JAVA_VERSION': 'java'}
+TOOLCHAIN_INPUTS = {'flutter-version': 'flutter', 'sdk': 'dart',
+                    'java-version': 'java'}
+
+
+class FactExtractor:
+    """Pulls the facts of one kind of file out of its document."""
+
+    def __init__(self, name, func, patterns, kinds, requires=None):
+        self.name = name
+        self.func = func
+        self.patterns = tuple(patterns)
+        self.kinds = frozenset(kinds)
+        self.requires = requires
+        self._regexes = [glob_regex(pattern) for pattern in self.patterns]
+
+    def matches(self, rel_path):
+        return any(regex.match(rel_path) for regex in self._regexes)
+
+    def extract(self, document):
+        """Return the memoized ``(facts, error)`` of ``document``.
+
+        A file that cannot be decoded or parsed has no facts and
+        ``error`` is the exception saying why; any other exception is a
+        bug in the extractor and propagates.
+        """
+        key = ('facts', self.name)
+        result = document.memo.get(key)
+        if result is None:
+            try:
+                result = ([Fact(kind, str(k), str(v), document.path)
+                           for kind, k, v in self.func(document)
+                           if v is not None], None)
+            except Exception as error:
+                if not isinstance(error, _parse_errors()):
+                    raise
+                count('facts.errors')
+                result = ([], error)
+            count('facts.extracted', len(result[0]))
+            document.memo[key] = result
+        return result
+
+    def facts(self, document):
+        """Return the memoized facts of ``document``."""
+        return self.extract(document)[0]
+
+
+def _parse_errors():
+    """The exceptions meaning a file could not be decoded or parsed."""
+    from tests.yaml_backend import get_backend
+    try:
+        backend_errors = get_backend().errors
+    except ImportError:
+        backend_errors = ()
+    # UnicodeDecodeError and json.JSONDecodeError are ValueErrors.
+    return (ValueError, *backend_errors)
+
+
+EXTRACTORS = []
+
+
+def extractor(patterns, kinds, requires=None):
+    """Register the decorated generator of ``(kind, key, value)``."""
+    def register(func):
+        EXTRACTORS.append(FactExtractor(func.__name__, func, patterns, kinds,
+                                        requires))
+        return func
+    return register
+
+
+def _literal(value):
+    """Return ``value`` unless it is unset or a CI expression."""
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    value = str(value).strip()
+    if not value or '${{' in value or '$(' in value:
+        return None
+    return value
+
+
+def _mapping(value):
+    return value if isinstance(value, dict) else {}
+
+
+def _sequence(value):
+    return value if isinstance(value, list) else []
+
+
+def _toolchain_variables(variables):
+    # Azure allows a mapping or a list of {name, value} entries.
+    if isinstance(variables, list):
+        variables = {entry.get('name'): entry.get('value')
+                     for entry in variables if isinstance(entry, dict)}
+    for name, value in _mapping(variables).items():
+        if name in TOOLCHAIN_VARIABLES:
+            yield TOOLCHAIN, TOOLCHAIN_VARIABLES[name], _literal(value)
+
+
+def _step_toolchains(steps, inputs_key):
+    for step in _sequence(steps):
+        inputs = _mapping(_mapping(step).get(inputs_key))
+        for name, tool in TOOLCHAIN_INPUTS.items():
+            if name in inputs:
+                yield TOOLCHAIN, tool, _literal(inputs[name])
+
+
+@extractor(['.tool-versions'], [TOOLCHAIN])
+def tool_versions(document):
+    for line in document.text.splitlines():
+        fields = line.split('#', 1)[0].split()
+        if len(fields) >= 2:
+            yield TOOLCHAIN, fields[0], fields[1]
+
+
+@extractor(['azure-pipelines.yml'], [TOOLCHAIN, WORKFLOW_JOB],
+           requires='yaml')
+def azure_pipelines(document):
+    pipeline = _mapping(document.parsed)
+    yield from _toolchain_variables(pipeline.get('variables'))
+    yield from _step_toolchains(pipeline.get('steps'), 'inputs')
+    for step in _sequence(pipeline.get('steps')):
+        task = str(_mapping(step).get('task', ''))
+        if task.startswith('JavaToolInstaller@'):
+            yield TOOLCHAIN, 'java', _literal(
+                _mapping(step.get('inputs')).get('versionSpec'))
+    jobs = list(_sequence(pipeline.get('jobs')))
+    for stage in _sequence(pipeline.get('stages')):
+        jobs.extend(_sequence(_mapping(stage).get('jobs')))
+    for job in jobs:
+        job = _mapping(job)
+        job_id = job.get('job') or job.get('deployment')
+        if job_id:
+            yield from _toolchain_variables(job.get('variables'))
+            yield from _step_toolchains(job.get('steps'), 'inputs')
+            yield WORKFLOW_JOB, job.get('displayName') or job_id, job_id
+
+
+@extractor(['.github/workflows/*.yml', '.github/workflows/*.yaml'],
+           [TOOLCHAIN, WORKFLOW_JOB], requires='yaml')
+def github_workflow(document):
+    workflow = _mapping(document.parsed)
+    yield from _toolchain_variables(workflow.get('env'))
+    for job_id, job in _mapping(workflow.get('jobs')).items():
+        job = _mapping(job)
+        yield from _toolchain_variables(job.get('env'))
+        yield from _step_toolchains(job.get('steps'), 'with')
+        yield WORKFLOW_JOB, job.get('name') or job_id, job_id
+
+
+PUBSPEC_SECTIONS = {'dependencies': DIRECT_MAIN,
+                    'dev_dependencies': DIRECT_DEV}
+
+
+@extractor(['pubspec.yaml'], [SDK_CONSTRAINT, DEPENDENCY, DECLARED_KIND],
+           requires='yaml')
+def pubspec(document):
+    spec = _mapping(document.parsed)
+    for sdk, constraint in _mapping(spec.get('environment')).items():
+        # ``environment: sdk:`` is the Dart SDK constraint.
+        yield SDK_CONSTRAINT, 'dart' if sdk == 'sdk' else sdk, constraint
+    for section, kind in PUBSPEC_SECTIONS.items():
+        for package, source in _mapping(spec.get(section)).items():
+            yield DECLARED_KIND, package, kind
+            # Only hosted packages have a version constraint to compare.
+            if source is None or isinstance(source, str):
+                yield DEPENDENCY, package, source or 'any'
+            elif 'hosted' in source or set(source) == {'version'}:
+                yield DEPENDENCY, package, source.get('version', 'any')
+
+
+@extractor(['pubspec.lock'], [SDK_LOCKED, LOCKED, LOCKED_KIND],
+           requires='yaml')
+def pubspec_lock(document):
+    table = load_lockfile(document)
+    for sdk, constraint in table.sdks.items():
+        yield SDK_LOCKED, sdk, constraint
+    for package in table:
+        yield LOCKED, package.name, package.version
+        yield LOCKED_KIND, package.name, package.kind
+
+
+@extractor(['.idea/modules.xml'], [MODULE_REF])
+def idea_modules(document):
+    # Non-.iml and empty entries are reported by the idea.xml rule.
+    project_dir = str(document.path.parent.parent)
+    for filepath in module_filepaths(document.chunks()):
+        if filepath and filepath.endswith('.iml'):
+            module = filepath.replace('$PROJECT_DIR$', project_dir)
+            yield MODULE_REF, os.path.normpath(module), filepath
+
+
+@extractor(['**/*.iml'], [MODULE_FILE])
+def iml_files(document):
+    # Presence in the validated tree is the fact; the content is unread.
+    yield MODULE_FILE, os.path.normpath(document.path), document.path
+
+
+def extractor_patterns(kinds):
+    """Return the file patterns of every extractor producing ``kinds``."""
+    return [pattern for extractor in EXTRACTORS
+            if extractor.kinds & set(kinds)
+            for pattern in extractor.patterns]
+
+
+class FactsIndex:
+    """Facts by kind and key, built from already-parsed documents."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._facts = {}
+        # (path, message) for files whose facts could not be extracted.
+        self.errors = []
+
+    @classmethod
+    def build(cls, root, documents, paths, kinds=None):
+        """Index the facts of ``paths``; ``documents`` maps path → Document.
+
+        ``kinds`` limits which extractors run.
+        """
+        index = cls(root)
+        with span('facts', 'index', files=len(paths)):
+            for path in paths:
+                rel_path = index.relative(path)
+                for extractor in EXTRACTORS:
+                    if kinds is not None and not extractor.kinds & set(kinds):
+                        continue
+                    if not extractor.matches(rel_path):
+                        continue
+                    facts, error = extractor.extract(documents.get(path))
+                    for fact in facts:
+                        index.add(fact)
+                    if error is not None:
+                        index.errors.append((path, (
+                            f"{rel_path}: cannot extract {extractor.name} "
+                            f"facts: {error}")))
+        return index
+
+    def add(self, fact):
+        self._facts.setdefault(fact.kind, {}).setdefault(
+            fact.key, []).append(fact)
+
+    def relative(self, path):
+        try:
+            return Path(path).relative_to(self.root).as_posix()
+        except ValueError:
+            return str(path)
+
+    def keys(self, kind):
+        return sorted(self._facts.get(kind, ()))
+
+    def get(self, kind, key):
+        """Return the facts of ``kind`` about ``key``, in file order."""
+        return list(self._facts.get(kind, {}).get(key, ()))
+
+    def first(self, kind, key):
+        facts = self._facts.get(kind, {}).get(key)
+        return facts[0] if facts else None
+
+    def __iter__(self):
+        for keys in self._facts.values():
+            for facts in keys.values():
+                yield from facts
+
+
+@total_ordering
+class Version:
+    """A pub/semver version; pre-releases sort before their release."""
+
+    PATTERN = re.compile(r'^(\d+)(?:\.(\d+))?(?:\.(\d+))?'
+                         r'(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$')
+
+    def __init__(self, text):
+        match = self.PATTERN.match(text.strip())
+        if match is None:
+            raise ValueError(f"invalid version {text!r}")
+        self.text = text.strip()
+        self.release = tuple(int(part or 0) for part in match.group(1, 2, 3))
+        pre = match.group(4)
+        # Numeric identifiers sort before alphanumeric ones.
+        self.pre = tuple((0, int(part), '') if part.isdigit() else
+                         (1, 0, part) for part in pre.split('.')) \
+            if pre else None
+
+    def _key(self):
+        return self.release, self.pre is None, self.pre or ()
+
+    def __eq__(self, other):
+        return self._key() == other._key()
+
+    def __lt__(self, other):
+        return self._key() < other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"Version({self.text!r})"
+
+    def next_breaking(self):
+        """The first version a caret constraint ``^self`` excludes."""
+        major, minor, patch = self.release
+        if major:
+            return Version(f"{major + 1}.0.0")
+        if minor:
+            return Version(f"0.{minor + 1}.0")
+        return Version(f"0.0.{patch + 1}")
+
+
+class VersionRange:
+    """A pub version constraint: ``any``, ``^1.2.3``, ``1.2.3`` or bounds.
+
+    Bounds are ``None`` when open; each is ``(version, inclusive)``.
+    """
+
+    BOUND = re.compile(r'(>=|<=|>|<)\s*([^\s<>=]+)')
+
+    def __init__(self, text):
+        self.text = text = str(text).strip()
+        self.lower = self.upper = None
+        if text in ('', 'any'):
+            return
+        if text.startswith('^'):
+            version = Version(text[1:])
+            self.lower, self.upper = (version, True), \
+                (version.next_breaking(), False)
+            return
+        if text[0].isdigit():
+            version = Version(text)
+            self.lower = self.upper = (version, True)
+            return
+        position = 0
+        for match in self.BOUND.finditer(text):
+            if text[position:match.start()].strip():
+                break
+            op, version = match.group(1), Version(match.group(2))
+            if op[0] == '>':
+                self.lower = (version, op == '>=')
+            else:
+                self.upper = (version, op == '<=')
+            position = match.end()
+        if position == 0 or text[position:].strip():
+            raise ValueError(f"invalid version constraint {text!r}")
+
+    def allows(self, version):
+        if self.lower is not None:
+            bound, inclusive = self.lower
+            if version < bound or (version == bound and not inclusive):
+                return False
+        if self.upper is not None:
+            bound, inclusive = self.upper
+            if version > bound or (version == bound and not inclusive):
+                return False
+        return True
+
+    def within(self, other):
+        """Return whether every version allowed here is allowed by ``other``."""
+        if other.lower is not None:
+            if self.lower is None:
+                return False
+            (mine, my_inc), (theirs, their_inc) = self.lower, other.lower
+            if mine < theirs or (mine == theirs and my_inc and not their_inc):
+                return False
+        if other.upper is not None:
+            if self.upper is None:
+                return False
+            (mine, my_inc), (theirs, their_inc) = self.upper, other.upper
+            if mine > theirs or (mine == theirs and my_inc and not their_inc):
+                return False
+        return True
+
+    def __str__(self):
+        return self.text
+
+
+class ConsistencyCheck:
+    """A named check over a ``FactsIndex``; yields ``(path, message)``.
+
+    Mirrors :class:`tests.checks.FileCheck` where rules expect it: it has
+    a ``name`` and an optional ``requires`` module.
+    """
+
+    def __init__(self, name, func, kinds, requires=None):
+        self.name = name
+        self.func = func
+        self.kinds = tuple(kinds)
+        self.requires = requires
+
+    @property
+    def patterns(self):
+        return extractor_patterns(self.kinds)
+
+    def __call__(self, index):
+        return self.func(index)
+
+
+CONSISTENCY_CHECKS = {}
+
+
+def consistency(name, kinds, requires=None):
+    """Register the decorated function as the cross-file check ``name``."""
+    def register(func):
+        CONSISTENCY_CHECKS[name] = ConsistencyCheck(name, func, kinds,
+                                                    requires)
+        return func
+    return register
+
+
+def _where(index, facts):
+    return ', '.join(f"{fact.value} in {index.relative(fact.path)}"
+                     for fact in facts)
+
+
+@consistency('toolchain_versions_agree', [TOOLCHAIN])
+def toolchain_versions_agree(index):
+    for tool in index.keys(TOOLCHAIN):
+        facts = index.get(TOOLCHAIN, tool)
+        if len({fact.value for fact in facts}) < 2:
+            continue
+        for fact in facts:
+            others = [other for other in facts if other.value != fact.value]
+            yield fact.path, (f"{index.relative(fact.path)}: {tool} "
+                              f"{fact.value} disagrees with "
+                              f"{_where(index, others)}")
+
+
+@consistency('sdk_constraints_agree', [SDK_CONSTRAINT, SDK_LOCKED, TOOLCHAIN],
+             requires='yaml')
+def sdk_constraints_agree(index):
+    for sdk in index.keys(SDK_LOCKED):
+        locked = index.first(SDK_LOCKED, sdk)
+        declared = index.first(SDK_CONSTRAINT, sdk)
+        try:
+            locked_range = VersionRange(locked.value)
+            if declared is not None and \
+                    not locked_range.within(VersionRange(declared.value)):
+                yield locked.path, (
+                    f"{index.relative(locked.path)}: {sdk} {locked.value} "
+                    f"is outside the environment constraint "
+                    f"{declared.value} in {index.relative(declared.path)}; "
+                    f"re-run pub get")
+            for tool in index.get(TOOLCHAIN, sdk):
+                if not locked_range.allows(Version(tool.value)):
+                    yield tool.path, (
+                        f"{index.relative(tool.path)}: {sdk} {tool.value} "
+                        f"does not satisfy {locked.value} required by "
+                        f"{index.relative(locked.path)}")
+        except ValueError as e:
+            yield locked.path, f"{index.relative(locked.path)}: {e}"
+
+
+@consistency('dependency_pins_agree', [DEPENDENCY, LOCKED], requires='yaml')
+def dependency_pins_agree(index):
+    if not index.keys(LOCKED):
+        return  # no lock file to compare against
+    for package in index.keys(DEPENDENCY):
+        for declared in index.get(DEPENDENCY, package):
+            where = index.relative(declared.path)
+            locked = index.first(LOCKED, package)
+            if locked is None:
+                continue  # reported by dependencies_resolved
+            try:
+                allowed = VersionRange(declared.value).allows(
+                    Version(locked.value))
+            except ValueError as e:
+                yield declared.path, f"{where}: {package}: {e}"
+                continue
+            if not allowed:
+                yield declared.path, (
+                    f"{where}: {package} {declared.value} does not allow "
+                    f"{locked.value} locked in "
+                    f"{index.relative(locked.path)}")
+
+
+@consistency('dependencies_resolved', [DECLARED_KIND, LOCKED_KIND],
+             requires='yaml')
+def dependencies_resolved(index):
+    if not index.keys(LOCKED_KIND):
+        return  # no lock file to compare against
+    for package in index.keys(DECLARED_KIND):
+        for declared in index.get(DECLARED_KIND, package):
+            where = index.relative(declared.path)
+            locked = index.first(LOCKED_KIND, package)
+            if locked is None:
+                yield declared.path, (f"{where}: {package} is not resolved "
+                                      f"in the lock file; re-run pub get")
+            elif locked.value not in (declared.value, DIRECT_OVERRIDDEN):
+                yield declared.path, (
+                    f"{where}: {package} is declared as {declared.value} "
+                    f"but locked as {locked.value} in "
+                    f"{index.relative(locked.path)}")
+
+
+@consistency('idea_modules_exist', [MODULE_REF, MODULE_FILE])
+def idea_modules_exist(index):
+    for module in index.keys(MODULE_REF):
+        if index.first(MODULE_FILE, module) is not None:
+            continue
+        for fact in index.get(MODULE_REF, module):
+            yield fact.path, (f"{index.relative(fact.path)}: module "
+                              f"{fact.value} does not exist")
+
+
+@consistency('workflow_job_names_unique', [WORKFLOW_JOB], requires='yaml')
+def workflow_job_names_unique(index):
+    # Required status checks are matched by job name, so the same name in
+    # two GitHub workflows makes branch protection ambiguous.
+    for name in index.keys(WORKFLOW_JOB):
+        facts = [fact for fact in index.get(WORKFLOW_JOB, name)
+                 if index.relative(fact.path).startswith('.github/')]
+        if len({fact.path for fact in facts}) < 2:
+            continue
+        for fact in facts:
+            others = [other for other in facts if other.path != fact.path]
+            yield fact.path, (f"{index.relative(fact.path)}: job name "
+                              f"{name!r} is also used by "
+                              f"{_where(index, others)}")
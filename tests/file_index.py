@@ -0,0 +1,226 @@
+"""
+Shared repository file index for the validation tests.
+Walks the tree once, pruning ignored directories before descending.
+"""
+
+import fnmatch
+import os
+import re
+from pathlib import Path
+
+from tests.instrumentation import count, span
+
+
+REPO_ROOT = Path(__file__).parent.parent
+
+# Directories that are never worth descending into, whether or not a
+# .gitignore mentions them.
+DEFAULT_EXCLUDES = (
+    '.git', 'build', '.dart_tool', 'node_modules', '__pycache__',
+    '.pytest_cache', '.mypy_cache', '.ruff_cache', '.tox', '.nox',
+    '.venv', 'venv', '.gradle', 'Pods', 'ephemeral', '.validation_cache',
+)
+
+
+class _IgnoreRule:
+    """A single compiled .gitignore pattern."""
+
+    def __init__(self, base, pattern):
+        self.negated = pattern.startswith('!')
+        if self.negated:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        # A slash anywhere but the end anchors the pattern to its .gitignore.
+        self.anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        self.base = base
+        self.regex = glob_regex(pattern)
+
+    def matches(self, rel_path, is_dir):
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel_path.startswith(self.base + '/'):
+                return False
+            rel_path = rel_path[len(self.base) + 1:]
+        if self.anchored:
+            return bool(self.regex.match(rel_path))
+        return bool(self.regex.match(rel_path.rsplit('/', 1)[-1]))
+
+
+def _translate(pattern):
+    """Translate a gitignore glob into a regular expression."""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            parts.append('/.*')
+            i += 3
+        elif pattern[i] == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            parts.append('[^/]')
+            i += 1
+        elif pattern[i] == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                parts.append(re.escape('['))
+                i += 1
+            else:
+                parts.append(fnmatch.translate(pattern[i:end + 1])[4:-3])
+                i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return ''.join(parts)
+
+
+def glob_regex(pattern):
+    """Compile a gitignore-style glob matched against relative paths.
+
+    ``*`` stays within one path segment and ``**/`` spans any depth.
+    """
+    return re.compile(_translate(pattern) + r'\Z')
+
+
+def _read_ignore_rules(directory, base):
+    """Load the rules from ``directory/.gitignore`` if it exists."""
+    ignore_file = directory / '.gitignore'
+    if not ignore_file.is_file():
+        return []
+    rules = []
+    for line in ignore_file.read_text(encoding='utf-8').splitlines():
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        rules.append(_IgnoreRule(base, line))
+    return rules
+
+
+class FileIndex:
+    """All repository files, collected in a single pruned walk.
+
+    Files are bucketed by lower-case extension (``'.yml'``, ``'.json'``,
+    ...). Directories named in ``exclude`` or ignored by a ``.gitignore``
+    are skipped before the walk descends into them.
+    """
+
+    walk_count = 0
+
+    def __init__(self, root=REPO_ROOT, exclude=None, use_gitignore=True):
+        self.root = Path(root)
+        self.exclude = frozenset(DEFAULT_EXCLUDES if exclude is None
+                                 else exclude)
+        self.use_gitignore = use_gitignore
+        self._by_extension = {}
+        self._all = []
+        self._directories = []
+        with span('walk', str(self.root)):
+            self._walk()
+
+    def _ignored(self, rules, rel_path, is_dir):
+        ignored = False
+        for rule in rules:
+            if rule.matches(rel_path, is_dir):
+                ignored = not rule.negated
+        return ignored
+
+    def _walk(self):
+        FileIndex.walk_count += 1
+        stack = [(self.root, '', [])]
+        while stack:
+            directory, rel_dir, rules = stack.pop()
+            if self.use_gitignore:
+                rules = rules + _read_ignore_rules(directory, rel_dir)
+            try:
+                entries = sorted(os.scandir(directory), key=lambda e: e.name)
+            except OSError:
+                continue
+            count('fs.scandir')
+            self._directories.append(directory)
+            count('fs.entries', len(entries))
+            subdirs = []
+            for entry in entries:
+                rel_path = f'{rel_dir}/{entry.name}' if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in self.exclude:
+                        continue
+                    if rules and self._ignored(rules, rel_path, True):
+                        continue
+                    subdirs.append((Path(entry.path), rel_path, rules))
+                elif entry.is_file(follow_symlinks=False):
+                    if rules and self._ignored(rules, rel_path, False):
+                        continue
+                    path = Path(entry.path)
+                    self._all.append(path)
+                    self._by_extension.setdefault(
+                        path.suffix.lower(), []).append(path)
+            stack.extend(reversed(subdirs))
+        self._all.sort()
+        for paths in self._by_extension.values():
+            paths.sort()
+
+    def files(self, *extensions):
+        """Return every indexed file, or only those with ``extensions``."""
+        if not extensions:
+            return list(self._all)
+        paths = []
+        for extension in extensions:
+            paths.extend(self._by_extension.get(extension.lower(), ()))
+        return sorted(paths)
+
+    def directories(self):
+        """Return every directory the walk descended into, root first."""
+        return list(self._directories)
+
+    def is_file(self, path):
+        """Return whether ``path`` is a file on disk.
+
+        Unlike ``files()`` this also answers for ignored paths, so rules
+        naming a file explicitly still find it.
+        """
+        return Path(path).is_file()
+
+    def top_level(self, *extensions):
+        """Return the matching files that live directly in the root."""
+        return [path for path in self.files(*extensions)
+                if path.parent == self.root]
+
+    def under(self, directory, *extensions):
+        """Return the matching files below ``directory`` (relative to root)."""
+        base = self.root / directory
+        return [path for path in self.files(*extensions)
+                if base in path.parents]
+
+
+_indexes = {}
+
+
+def _env_excludes():
+    extra = os.environ.get('VALIDATION_EXCLUDE', '')
+    names = [name.strip() for name in extra.split(',') if name.strip()]
+    return DEFAULT_EXCLUDES + tuple(names)
+
+
+def get_file_index(root=REPO_ROOT):
+    """Return the session-wide index for ``root``, building it once.
+
+    Extra directory names to prune can be supplied as a comma separated
+    list in the ``VALIDATION_EXCLUDE`` environment variable.
+    """
+    key = Path(root).resolve()
+    index = _indexes.get(key)
+    if index is None:
+        index = FileIndex(key, exclude=_env_excludes())
+        _indexes[key] = index
+    return index
+
+
+def reset_file_index():
+    """Forget cached indexes, e.g. after files were added or removed."""
+    _indexes.clear()
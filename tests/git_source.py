@@ -0,0 +1,289 @@
+"""
+Git object-store file source for the validation engine.
+Validates commits, ranges and staged content without checking them out.
+
+Tree listings come from ``git ls-tree``/``git ls-files``; blob contents
+are streamed through one long-lived ``git cat-file --batch`` process with
+requests pipelined in batches. Verdicts are remembered per blob, so a
+file that is unchanged across the commits of a range is only validated
+once.
+"""
+
+import subprocess
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from tests.checks import _evaluate, _evaluate_batch
+from tests.document_cache import DEFAULT_MAX_BYTES, Document
+from tests.file_index import DEFAULT_EXCLUDES
+from tests.instrumentation import count, span
+from tests.validate import ValidationEngine
+
+
+# Regular files and executables; symlinks and submodules are skipped.
+BLOB_MODES = frozenset(('100644', '100755'))
+# Object ids written to cat-file before their replies are read back.
+BATCH_SIZE = 256
+
+
+class GitError(RuntimeError):
+    """Raised when git fails or returns something unexpected."""
+
+
+def _git(repo, *args):
+    try:
+        return subprocess.run(['git', *args], cwd=repo, check=True,
+                              capture_output=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise GitError(e.stderr.decode('utf-8', 'replace').strip()) from e
+
+
+class GitObjectStore:
+    """Reads blobs through a single ``git cat-file --batch`` process."""
+
+    def __init__(self, repo):
+        self.repo = Path(repo)
+        self._process = None
+
+    def _batch_process(self):
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                ['git', 'cat-file', '--batch'], cwd=self.repo,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        return self._process
+
+    def read_many(self, object_ids):
+        """Yield ``(object_id, data)`` for each id, in order.
+
+        Requests are written by a helper thread while replies are read,
+        so a batch never deadlocks on full pipes.
+        """
+        object_ids = list(object_ids)
+        process = self._batch_process()
+        for start in range(0, len(object_ids), BATCH_SIZE):
+            batch = object_ids[start:start + BATCH_SIZE]
+            request = ''.join(f'{oid}\n' for oid in batch).encode('ascii')
+            writer = threading.Thread(target=self._write,
+                                      args=(process, request))
+            writer.start()
+            try:
+                blobs = [self._read_reply(process, oid) for oid in batch]
+            finally:
+                writer.join()
+            count('git.blobs_read', len(blobs))
+            yield from zip(batch, blobs)
+
+    @staticmethod
+    def _write(process, request):
+        process.stdin.write(request)
+        process.stdin.flush()
+
+    @staticmethod
+    def _read_reply(process, object_id):
+        header = process.stdout.readline().split()
+        if len(header) != 3:
+            raise GitError(f"cat-file: {object_id} "
+                           f"{b' '.join(header[1:]).decode() or 'no reply'}")
+        data = process.stdout.read(int(header[2]))
+        process.stdout.read(1)  # trailing newline
+        return data
+
+    def read(self, object_id):
+        return next(self.read_many([object_id]))[1]
+
+    def close(self):
+        if self._process is not None:
+            self._process.stdin.close()
+            self._process.wait()
+            self._process.stdout.close()
+            self._process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GitTree:
+    """The blobs of one commit or of the index, shaped like a FileIndex.
+
+    Paths are virtual: ``root / rel_path``, whether or not a work tree
+    exists there.
+    """
+
+    def __init__(self, root, entries, name):
+        self.root = Path(root)
+        self.name = name
+        self._blobs = {}
+        for rel_path, (mode, object_id) in entries.items():
+            parts = rel_path.split('/')
+            if mode in BLOB_MODES and \
+                    not any(part in DEFAULT_EXCLUDES for part in parts[:-1]):
+                self._blobs[self.root / rel_path] = object_id
+
+    def files(self, *extensions):
+        paths = self._blobs if not extensions else \
+            [path for path in self._blobs
+             if path.suffix.lower() in extensions]
+        return sorted(paths)
+
+    def is_file(self, path):
+        return Path(path) in self._blobs
+
+    def object_id(self, path):
+        return self._blobs[Path(path)]
+
+
+class GitSource:
+    """Builds trees for revisions and validates blobs at most once each."""
+
+    def __init__(self, repo, max_bytes=DEFAULT_MAX_BYTES):
+        self.repo = Path(repo).resolve()
+        self.root = self._work_tree() or self.repo
+        self.store = GitObjectStore(self.repo)
+        self.max_bytes = max_bytes
+        # (check, blob id, rel path) -> failures. The path is part of
+        # the key because rules and messages depend on the file name.
+        self.verdicts = {}
+        self.evaluations = 0
+        self._documents = OrderedDict()
+        self._document_bytes = 0
+
+    def _work_tree(self):
+        inside = _git(self.repo, 'rev-parse', '--is-inside-work-tree')
+        if inside.strip() != b'true':
+            return None
+        return Path(_git(self.repo, 'rev-parse', '--show-toplevel')
+                    .decode('utf-8').strip())
+
+    def resolve(self, revision):
+        return _git(self.repo, 'rev-parse', '--verify', '--end-of-options',
+                    f'{revision}^{{commit}}').decode('ascii').strip()
+
+    def revisions(self, revision_range):
+        """Return the commits of ``A..B``, oldest first."""
+        output = _git(self.repo, 'rev-list', '--reverse', revision_range,
+                      '--')
+        return output.decode('ascii').split()
+
+    def tree(self, revision):
+        commit = self.resolve(revision)
+        output = _git(self.repo, 'ls-tree', '-r', '-z', '--full-tree',
+                      commit)
+        entries = {}
+        for record in output.split(b'\0'):
+            if record:
+                info, rel_path = record.split(b'\t', 1)
+                mode, _, object_id = info.decode('ascii').split()
+                entries[rel_path.decode('utf-8')] = (mode, object_id)
+        return GitTree(self.root, entries, commit)
+
+    def index_tree(self):
+        """Return the staged content; unmerged entries are left out."""
+        output = _git(self.repo, 'ls-files', '-s', '-z')
+        entries = {}
+        for record in output.split(b'\0'):
+            if record:
+                info, rel_path = record.split(b'\t', 1)
+                mode, object_id, stage = info.decode('ascii').split()
+                if stage == '0':
+                    entries[rel_path.decode('utf-8')] = (mode, object_id)
+        return GitTree(self.root, entries, 'index')
+
+    def _remember(self, key, document):
+        self._documents[key] = document
+        self._document_bytes += document.size
+        while self._document_bytes > self.max_bytes and \
+                len(self._documents) > 1:
+            _, old = self._documents.popitem(last=False)
+            self._document_bytes -= old.size
+
+    def documents(self, tree, paths):
+        """Return ``{path: Document}`` with blobs fetched in one batch."""
+        found, missing = {}, []
+        for path in paths:
+            key = (tree.object_id(path),
+                   path.relative_to(tree.root).as_posix())
+            document = self._documents.get(key)
+            if document is None:
+                missing.append((key, path))
+            else:
+                self._documents.move_to_end(key)
+                found[path] = document
+        blobs = dict(self.store.read_many({key[0] for key, _ in missing}))
+        for key, path in missing:
+            document = Document(path, data=blobs[key[0]])
+            self._remember(key, document)
+            found[path] = document
+        return found
+
+    def check(self, file_check, tree, paths):
+        """Return ``(path, failures)`` for ``paths`` of ``tree``."""
+        keys = [(file_check.name, tree.object_id(path),
+                 path.relative_to(tree.root).as_posix()) for path in paths]
+        pending = [path for path, key in zip(paths, keys)
+                   if key not in self.verdicts]
+        count('git.verdicts_reused', len(paths) - len(pending))
+        if pending:
+            self.evaluations += len(pending)
+            documents = self.documents(tree, pending)
+            if file_check.batch:
+                computed = _evaluate_batch(file_check, pending, documents)
+            else:
+                computed = [_evaluate(file_check, path, documents)
+                            for path in pending]
+            for path, failures in zip(pending, computed):
+                self.verdicts[(file_check.name, tree.object_id(path),
+                               path.relative_to(tree.root).as_posix())] = \
+                    failures
+        return [(path, self.verdicts[key]) for path, key in zip(paths, keys)]
+
+    def close(self):
+        self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GitValidationEngine(ValidationEngine):
+    """Runs the rules over a :class:`GitTree` instead of the work tree.
+
+    ``files`` (paths relative to the repository root) limits the run the
+    same way an explicit file list does for the work-tree engine.
+    """
+
+    def __init__(self, source, tree, files=None):
+        super().__init__(tree.root)
+        self.source = source
+        self.tree = tree
+        if files is not None:
+            paths = [tree.root / name for name in files]
+            self.files = [path for path in paths if tree.is_file(path)]
+
+    @property
+    def index(self):
+        return self.tree
+
+    def documents(self, paths):
+        return self.source.documents(self.tree, paths)
+
+    def check_files(self, rule, targets):
+        with span('git', self.tree.name, rule=rule.id):
+            return self.source.check(rule.check, self.tree, targets)
+
+
+def validate_revisions(source, revisions, rule_ids=None):
+    """Return ``(commit, results)`` for each revision, sharing verdicts."""
+    return [(tree.name, GitValidationEngine(source, tree).run(rule_ids))
+            for tree in map(source.tree, revisions)]
+
+
+def validate_staged(source, files=None, rule_ids=None):
+    """Validate the index content, optionally only ``files``."""
+    return GitValidationEngine(source, source.index_tree(), files).run(
+        rule_ids)
@@ -0,0 +1,194 @@
+"""
+Incremental validation support.
+Persists per-file check verdicts so unchanged files are not re-checked.
+"""
+
+import atexit
+import hashlib
+import importlib.util
+import json
+import marshal
+import os
+import sys
+import time
+from pathlib import Path
+
+from tests.document_cache import get_document_cache
+from tests.secret_scan import baseline_path
+
+
+REPO_ROOT = Path(__file__).parent.parent
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Modules whose code decides verdicts; editing any of them drops the
+# whole manifest.
+VALIDATOR_MODULES = ('checks.py', 'document_cache.py', 'incremental.py',
+                     'line_scanner.py', 'schema.py', 'secret_scan.py',
+                     'xml_validation.py', 'yaml_backend.py', 'yaml_query.py')
+
+# Files modified this recently may change again within the same mtime
+# tick, so their stat signature is not trusted on the next run.
+RACY_SECONDS = 2.0
+
+
+def cache_dir():
+    """Return the directory holding persisted validation state."""
+    return Path(os.environ.get('VALIDATION_CACHE_DIR',
+                               REPO_ROOT / '.validation_cache'))
+
+
+def load_cached(section, key):
+    """Return the value marshalled under ``section``/``key`` of the cache
+    directory, or None if it is missing or unreadable."""
+    try:
+        return marshal.loads(
+            (cache_dir() / section / f'{key}.marshal').read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def store_cached(section, key, value):
+    """Marshal ``value`` under ``section``/``key``, replacing atomically."""
+    path = cache_dir() / section / f'{key}.marshal'
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp.write_bytes(marshal.dumps(value))
+        os.replace(tmp, path)
+    except OSError:
+        pass  # A read-only checkout just rebuilds the value next time.
+
+
+def validator_fingerprint():
+    """Hash the validator sources, secrets baseline, Python version and
+    YAML backend."""
+    digest = hashlib.sha256(sys.version.encode('utf-8'))
+    digest.update(os.environ.get('VALIDATION_YAML_BACKEND', '').encode())
+    here = Path(__file__).parent
+    for name in VALIDATOR_MODULES:
+        digest.update((here / name).read_bytes())
+    baseline = baseline_path()
+    if baseline.is_file():
+        digest.update(baseline.read_bytes())
+    spec = importlib.util.find_spec('yaml')
+    if spec is not None and spec.origin:
+        stat = os.stat(spec.origin)
+        digest.update(f'{spec.origin}:{stat.st_mtime_ns}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Maps each file to its content hash and per-check verdicts.
+
+    A verdict is reused only when the file hash and the fingerprint of
+    the check that produced it are both unchanged. Files whose (mtime,
+    size) signature matches the manifest are not even read. Entries of
+    files that no longer exist are dropped when the manifest is saved.
+    """
+
+    def __init__(self, path, root=REPO_ROOT, fingerprint=None):
+        self.path = Path(path)
+        self.root = Path(root).resolve()
+        self.fingerprint = fingerprint or validator_fingerprint()
+        self.files = {}
+        self.dirty = False
+        self._fresh = set()
+        self._keys = {}
+        self.load()
+
+    def load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        if (data.get('version') == MANIFEST_VERSION and
+                data.get('validator') == self.fingerprint):
+            self.files = data.get('files', {})
+
+    def prune(self):
+        """Drop entries of files that were not seen and no longer exist.
+
+        Files a partial run did not look at keep their entries.
+        """
+        for key in [key for key in self.files if key not in self._fresh]:
+            if not (self.root / key).is_file():
+                del self.files[key]
+                self.dirty = True
+
+    def save(self):
+        self.prune()
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {'version': MANIFEST_VERSION, 'validator': self.fingerprint,
+                'files': self.files}
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps(data, sort_keys=True), encoding='utf-8')
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def _key(self, path):
+        key = self._keys.get(path)
+        if key is None:
+            resolved = Path(path).resolve()
+            try:
+                key = resolved.relative_to(self.root).as_posix()
+            except ValueError:
+                key = str(resolved)
+            self._keys[path] = key
+        return key
+
+    def _entry(self, path):
+        """Return the up-to-date entry for ``path``, rehashing if needed."""
+        key = self._key(path)
+        entry = self.files.get(key)
+        if key in self._fresh:
+            return entry
+        stat = os.stat(path)
+        signature = [stat.st_mtime_ns, stat.st_size]
+        if entry is None or entry.get('signature') != signature:
+            digest = get_document_cache().get(path).digest
+            if entry is None or entry.get('hash') != digest:
+                entry = {'hash': digest, 'checks': {}}
+                self.files[key] = entry
+            racy = time.time() - stat.st_mtime_ns / 1e9 < RACY_SECONDS
+            entry['signature'] = None if racy else signature
+            self.dirty = True
+        self._fresh.add(key)
+        return entry
+
+    def verdict(self, path, file_check):
+        """Return cached failures for ``file_check`` or None if stale."""
+        recorded = self._entry(path)['checks'].get(file_check.name)
+        if recorded and recorded[0] == file_check.fingerprint:
+            return recorded[1]
+        return None
+
+    def record(self, path, file_check, failures):
+        self._entry(path)['checks'][file_check.name] = [
+            file_check.fingerprint, list(failures)]
+        self.dirty = True
+
+
+_manifest = None
+
+
+def incremental_enabled():
+    return os.environ.get('VALIDATION_INCREMENTAL', '') not in ('', '0')
+
+
+def get_manifest():
+    """Return the session manifest, or None when not in incremental mode.
+
+    Enable with ``VALIDATION_INCREMENTAL=1``; the manifest lives in
+    ``VALIDATION_CACHE_DIR`` (``.validation_cache`` by default) and is
+    written back when the process exits.
+    """
+    global _manifest
+    if not incremental_enabled():
+        return None
+    if _manifest is None:
+        _manifest = Manifest(cache_dir() / MANIFEST_NAME)
+        atexit.register(_manifest.save)
+    return _manifest
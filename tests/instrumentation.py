@@ -0,0 +1,189 @@
+"""
+Optional instrumentation of the validation hot paths.
+Enable with VALIDATION_PROFILE=1; VALIDATION_TRACE=FILE also writes a
+Chrome trace-event file (open it in chrome://tracing or Perfetto).
+
+Call sites use ``span()`` and ``count()`` unconditionally. While
+profiling is off both return after a single global lookup, so leaving
+the hooks in place costs next to nothing.
+
+With ``VALIDATION_WORKERS`` above 1, per-file check spans run in the
+pool processes and are not collected; the enclosing rule spans still
+are.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import nullcontext
+from pathlib import Path
+from time import perf_counter
+
+
+SUMMARY_LIMIT = 10
+# Categories whose spans are attributed to the file in their ``path``.
+FILE_CATEGORIES = ('check',)
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ('profiler', 'category', 'name', 'args', 'start')
+
+    def __init__(self, profiler, category, name, args):
+        self.profiler = profiler
+        self.category = category
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.category, self.name, self.start,
+                             perf_counter() - self.start, self.args)
+        return False
+
+
+def _display(path):
+    try:
+        return Path(path).relative_to(Path.cwd()).as_posix()
+    except ValueError:
+        return str(path)
+
+
+class Profiler:
+    """Collects timed spans and named counters for one process."""
+
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self.epoch = perf_counter()
+        self.pid = os.getpid()
+        self.counters = Counter()
+        # (category, name) -> [calls, seconds]
+        self.totals = {}
+        self.files = Counter()
+        self.events = []
+        self.reported = False
+
+    def record(self, category, name, start, duration, args):
+        stats = self.totals.setdefault((category, name), [0, 0.0])
+        stats[0] += 1
+        stats[1] += duration
+        path = args.get('path')
+        if path is not None and category in FILE_CATEGORIES:
+            self.files[path] += duration
+        if self.trace_path is not None:
+            self.events.append((category, name, start, duration, args,
+                                threading.get_ident()))
+
+    def slowest(self, category, limit=SUMMARY_LIMIT):
+        """Return ``(name, calls, seconds)`` for ``category``, slowest first."""
+        rows = [(name, calls, seconds)
+                for (cat, name), (calls, seconds) in self.totals.items()
+                if cat == category]
+        return sorted(rows, key=lambda row: row[2], reverse=True)[:limit]
+
+    def summary(self, limit=SUMMARY_LIMIT):
+        """Return the ranked report as text."""
+        lines = []
+        phases = Counter()
+        calls = Counter()
+        for (category, _), (n, seconds) in self.totals.items():
+            phases[category] += seconds
+            calls[category] += n
+        if phases:
+            lines.append('Time by phase (inclusive):')
+            for category, seconds in phases.most_common():
+                lines.append(f'  {seconds * 1000:10.2f} ms  '
+                             f'{calls[category]:6d}x  {category}')
+        for title, category in (('Slowest tests', 'test'),
+                                ('Slowest rules', 'rule'),
+                                ('Slowest checks', 'check')):
+            rows = self.slowest(category, limit)
+            if rows:
+                lines.append(f'{title}:')
+                lines += [f'  {seconds * 1000:10.2f} ms  {n:6d}x  {name}'
+                          for name, n, seconds in rows]
+        if self.files:
+            lines.append('Slowest files:')
+            lines += [f'  {seconds * 1000:10.2f} ms  {_display(path)}'
+                      for path, seconds in self.files.most_common(limit)]
+        if self.counters:
+            lines.append('Counters:')
+            lines += [f'  {value:>12}  {name}'
+                      for name, value in sorted(self.counters.items())]
+        return '\n'.join(lines)
+
+    def trace_events(self):
+        """Return the spans and counters as Chrome trace-event dicts."""
+        events = [{
+            'name': name, 'cat': category, 'ph': 'X',
+            'ts': round((start - self.epoch) * 1e6, 3),
+            'dur': round(duration * 1e6, 3),
+            'pid': self.pid, 'tid': tid,
+            'args': {key: str(value) for key, value in args.items()},
+        } for category, name, start, duration, args, tid in self.events]
+        end = max((e['ts'] + e['dur'] for e in events), default=0)
+        events += [{'name': name, 'ph': 'C', 'ts': end, 'pid': self.pid,
+                    'args': {name: value}}
+                   for name, value in sorted(self.counters.items())]
+        return events
+
+    def write_trace(self, path=None):
+        path = path or self.trace_path
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.trace_events(),
+                       'displayTimeUnit': 'ms'}, f)
+
+
+_profiler = None
+
+
+def get_profiler():
+    """Return the active profiler, or None when instrumentation is off."""
+    return _profiler
+
+
+def enable(trace_path=None):
+    """Start collecting in this process and return the profiler."""
+    global _profiler
+    _profiler = Profiler(trace_path)
+    return _profiler
+
+
+def span(category, name, **args):
+    """Context manager timing one unit of work, e.g.
+    ``span('parse', 'yaml', path=path)``."""
+    if _profiler is None:
+        return _NULL_SPAN
+    return _Span(_profiler, category, name, args)
+
+
+def count(name, amount=1):
+    """Add ``amount`` to counter ``name``."""
+    if _profiler is not None:
+        _profiler.counters[name] += amount
+
+
+def _report_at_exit():
+    import multiprocessing
+
+    profiler = _profiler
+    # Pool workers inherit the environment; only the parent reports.
+    if profiler is None or multiprocessing.parent_process() is not None:
+        return
+    if profiler.trace_path is not None:
+        profiler.write_trace()
+    if not profiler.reported:
+        print(profiler.summary(), file=sys.stderr)
+
+
+if os.environ.get('VALIDATION_PROFILE', '').strip() not in ('', '0') or \
+        os.environ.get('VALIDATION_TRACE'):
+    enable(os.environ.get('VALIDATION_TRACE') or None)
+    atexit.register(_report_at_exit)
@@ -0,0 +1,244 @@
+"""
+Single-pass streaming line scanner for text hygiene checks.
+All registered line rules are evaluated while reading a file once.
+"""
+
+import codecs
+from collections import namedtuple
+
+
+CHUNK_SIZE = 64 * 1024
+MAX_FILE_SIZE = 100 * 1024  # 100 KB
+MAX_VIOLATIONS_PER_RULE = 100
+
+# Lines and columns are 1-based; columns count bytes.
+Violation = namedtuple('Violation', 'rule line column message')
+
+
+class LineRule:
+    """Base class for a rule fed line segments by ``LineScanner``.
+
+    ``segment`` may be called several times per line when a line spans
+    chunk boundaries, so rules keep only constant per-line state.
+    """
+
+    name = None
+
+    def start(self, emit):
+        self.emit = emit
+
+    def segment(self, data, line, column):
+        pass
+
+    def end_line(self, line, column):
+        pass
+
+    def finish(self, line, column):
+        pass
+
+
+class TabRule(LineRule):
+    name = 'tabs'
+
+    def segment(self, data, line, column):
+        index = data.find(b'\t')
+        while index != -1:
+            self.emit(line, column + index, 'tab character, use spaces')
+            index = data.find(b'\t', index + 1)
+
+
+class TrailingWhitespaceRule(LineRule):
+    name = 'trailing_whitespace'
+
+    def start(self, emit):
+        super().start(emit)
+        self.run_start = None
+        self.run_has_blank = False
+
+    def segment(self, data, line, column):
+        content = data.rstrip(b' \t\r')
+        if content:
+            self.run_start = column + len(content)
+            self.run_has_blank = False
+        elif self.run_start is None:
+            self.run_start = column
+        tail = data[len(content):]
+        if b' ' in tail or b'\t' in tail:
+            self.run_has_blank = True
+
+    def end_line(self, line, column):
+        if self.run_has_blank:
+            self.emit(line, self.run_start, 'trailing whitespace')
+        self.run_start = None
+        self.run_has_blank = False
+
+    def finish(self, line, column):
+        self.end_line(line, column)
+
+
+class CrlfRule(LineRule):
+    name = 'crlf'
+
+    def start(self, emit):
+        super().start(emit)
+        self.last = b''
+
+    def segment(self, data, line, column):
+        self.last = data[-1:]
+
+    def end_line(self, line, column):
+        if self.last == b'\r':
+            self.emit(line, column - 1, 'CRLF line ending, use LF')
+        self.last = b''
+
+
+class Utf8Rule(LineRule):
+    name = 'utf8'
+
+    def start(self, emit):
+        super().start(emit)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def segment(self, data, line, column):
+        while data:
+            pending = len(self.decoder.getstate()[0])
+            try:
+                self.decoder.decode(data)
+                return
+            except UnicodeDecodeError as e:
+                self.emit(line, max(column, column + e.start - pending),
+                          f'invalid UTF-8 ({e.reason})')
+                self.decoder.reset()
+                end = max(e.end - pending, 0)
+                column += end
+                data = data[end:]
+
+    def end_line(self, line, column):
+        pending = len(self.decoder.getstate()[0])
+        if pending:
+            self.emit(line, column - pending, 'truncated UTF-8 sequence')
+            self.decoder.reset()
+
+    def finish(self, line, column):
+        self.end_line(line, column)
+
+
+class SizeRule(LineRule):
+    name = 'size'
+
+    def __init__(self, max_bytes=MAX_FILE_SIZE):
+        self.max_bytes = max_bytes
+
+    def start(self, emit):
+        super().start(emit)
+        self.seen = 0
+        self.reported = False
+
+    def _advance(self, count, line, column):
+        if not self.reported and self.seen + count >= self.max_bytes:
+            self.emit(line, column + self.max_bytes - 1 - self.seen,
+                      f'file reaches the {self.max_bytes} byte size cap')
+            self.reported = True
+        self.seen += count
+
+    def segment(self, data, line, column):
+        self._advance(len(data), line, column)
+
+    def end_line(self, line, column):
+        self._advance(1, line, column)
+
+
+RULES = {rule.name: rule for rule in
+         (TabRule, TrailingWhitespaceRule, CrlfRule, Utf8Rule, SizeRule)}
+
+
+class ScanReport:
+    """Every violation found in one file, in stream order."""
+
+    def __init__(self):
+        self.violations = []
+        self.counts = {}
+        self.suppressed = {}
+        self.size = 0
+        self.lines = 0
+
+    def by_rule(self, name):
+        return [v for v in self.violations if v.rule == name]
+
+    def messages(self, name, path):
+        messages = [f"{path}:{v.line}:{v.column}: {v.message}"
+                    for v in self.by_rule(name)]
+        if self.suppressed.get(name):
+            messages.append(f"{path}: {self.suppressed[name]} more "
+                            f"'{name}' violations not shown")
+        return messages
+
+
+class LineScanner:
+    """Streams bytes in fixed-size chunks through a set of line rules.
+
+    Memory use depends on ``chunk_size`` and the violation cap, never on
+    the size of the file or the length of its lines.
+    """
+
+    def __init__(self, rules=None, chunk_size=CHUNK_SIZE,
+                 max_violations=MAX_VIOLATIONS_PER_RULE):
+        self.rules = rules if rules is not None else \
+            [rule() for rule in RULES.values()]
+        self.chunk_size = chunk_size
+        self.max_violations = max_violations
+
+    def scan(self, chunks):
+        """Scan an iterable of byte chunks and return a ``ScanReport``."""
+        report = ScanReport()
+        for rule in self.rules:
+            rule.start(self._emitter(report, rule.name))
+        line = column = 1
+        for chunk in chunks:
+            chunk = bytes(chunk)
+            report.size += len(chunk)
+            start = 0
+            while True:
+                newline = chunk.find(b'\n', start)
+                end = len(chunk) if newline == -1 else newline
+                if end > start:
+                    data = chunk[start:end]
+                    for rule in self.rules:
+                        rule.segment(data, line, column)
+                    column += end - start
+                if newline == -1:
+                    break
+                for rule in self.rules:
+                    rule.end_line(line, column)
+                line += 1
+                column = 1
+                start = newline + 1
+        for rule in self.rules:
+            rule.finish(line, column)
+        report.lines = line if column > 1 else line - 1
+        return report
+
+    def scan_file(self, path):
+        with open(path, 'rb') as f:
+            return self.scan(iter(lambda: f.read(self.chunk_size), b''))
+
+    def _emitter(self, report, name):
+        def emit(line, column, message):
+            count = report.counts.get(name, 0)
+            report.counts[name] = count + 1
+            if count < self.max_violations:
+                report.violations.append(
+                    Violation(name, line, column, message))
+            else:
+                report.suppressed[name] = report.suppressed.get(name, 0) + 1
+        return emit
+
+
+def scan_document(document):
+    """Return the hygiene report for a cached document, scanning once."""
+    report = document.memo.get('line_scan')
+    if report is None:
+        scanner = LineScanner()
+        report = scanner.scan(document.chunks(scanner.chunk_size))
+        document.memo['line_scan'] = report
+    return report
@@ -0,0 +1,419 @@
+"""
+Indexed view of ``pubspec.lock``: a compact package table and queries.
+Usage: python -m tests.lockfile [LOCK] [--source hosted] [--json]
+       python -m tests.lockfile --diff OLD [NEW]
+
+A lock file is parsed once into a table of slotted ``LockedPackage``
+rows, indexed by name, version, source and dependency kind. Pub writes
+lock files in a fixed block layout, which a line scanner reads far
+faster than a YAML parser; anything outside that layout falls back to
+YAML. Tables are cached by content hash in memory and on disk, so an
+unchanged lock file is never parsed again. OLD and NEW may be file
+paths or git object names such as ``HEAD~1:pubspec.lock``.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+from tests.document_cache import Document, get_document_cache
+from tests.file_index import REPO_ROOT
+from tests.instrumentation import count, span
+
+
+DIRECT_MAIN = 'direct main'
+DIRECT_DEV = 'direct dev'
+DIRECT_OVERRIDDEN = 'direct overridden'
+TRANSITIVE = 'transitive'
+
+
+class LockedPackage:
+    """One resolved package.
+
+    ``location`` is the hosted URL, git URL, path or SDK name; ``pin`` is
+    the content hash for hosted packages and the resolved commit for git
+    packages.
+    """
+
+    __slots__ = ('name', 'version', 'source', 'kind', 'location', 'pin')
+
+    def __init__(self, name, version, source, kind, location=None, pin=None):
+        self.name = name
+        self.version = version
+        self.source = source
+        self.kind = kind
+        self.location = location
+        self.pin = pin
+
+    @classmethod
+    def from_entry(cls, name, entry):
+        description = entry.get('description')
+        if isinstance(description, dict):
+            location = description.get('url') or description.get('path')
+            pin = description.get('sha256') or \
+                description.get('resolved-ref')
+        else:
+            location, pin = description, None
+        return cls(name, str(entry.get('version', '')),
+                   str(entry.get('source', 'hosted')),
+                   str(entry.get('dependency', TRANSITIVE)),
+                   None if location is None else str(location),
+                   None if pin is None else str(pin))
+
+    @property
+    def is_direct(self):
+        return self.kind.startswith('direct')
+
+    def row(self):
+        return (self.name, self.version, self.source, self.kind,
+                self.location, self.pin)
+
+    def __eq__(self, other):
+        return isinstance(other, LockedPackage) and self.row() == other.row()
+
+    def __hash__(self):
+        return hash(self.row())
+
+    def __repr__(self):
+        return f"LockedPackage({self.name!r}, {self.version!r})"
+
+
+def _group(packages, attribute):
+    groups = {}
+    for package in packages:
+        groups.setdefault(getattr(package, attribute), []).append(
+            package.name)
+    return {key: tuple(names) for key, names in groups.items()}
+
+
+# Scalars starting with these need a real YAML parser.
+_YAML_INDICATORS = frozenset('{[&*!|>%@`')
+# Plain scalars YAML reads as null rather than as a string.
+_YAML_NULLS = frozenset(('~', 'null', 'Null', 'NULL'))
+
+
+def _scalar(text, line_number):
+    if not text:
+        return None
+    if text[0] in _YAML_INDICATORS or '\\' in text or ' #' in text or \
+            text in _YAML_NULLS:
+        raise ValueError(f"line {line_number}: not in pub's layout")
+    if text[0] in '"\'':
+        quote, inner = text[0], text[1:-1]
+        if len(text) < 2 or text[-1] != quote:
+            raise ValueError(f"line {line_number}: unterminated string")
+        escaped = inner.replace("''", '') if quote == "'" else inner
+        if quote in escaped:
+            raise ValueError(f"line {line_number}: unescaped quote")
+        return inner.replace("''", "'") if quote == "'" else inner
+    return text
+
+
+def scan_lock(text):
+    """Read a lock file in the layout pub writes into plain dicts.
+
+    Every scalar is returned as a string. Raises ValueError for anything
+    the scanner does not understand, so callers can fall back to YAML.
+    """
+    lock = {}
+    # The mapping open at each indentation level: 0, 2, 4 and 6 spaces.
+    stack = [lock]
+    for line_number, line in enumerate(text.splitlines(), 1):
+        stripped = line.strip()
+        if not stripped or stripped[0] == '#':
+            continue
+        indent = len(line) - len(line.lstrip(' '))
+        key, sep, value = stripped.partition(':')
+        if indent % 2 or indent // 2 >= len(stack) or not sep or \
+                (value and value[0] != ' ') or '\t' in line or \
+                stripped.startswith(('-', '---')):
+            raise ValueError(f"line {line_number}: not in pub's layout")
+        del stack[indent // 2 + 1:]
+        parent = stack[-1]
+        key = _scalar(key, line_number)
+        if key in parent:
+            raise ValueError(f"line {line_number}: duplicate key {key!r}")
+        value = _scalar(value.strip(), line_number)
+        if value is None:
+            parent[key] = {}
+            stack.append(parent[key])
+        else:
+            parent[key] = value
+    return lock
+
+
+class PackageTable:
+    """The packages of one lock file, sorted by name, with indexes."""
+
+    __slots__ = ('digest', 'packages', 'sdks', '_by_name', '_by_version',
+                 '_by_source', '_by_kind')
+
+    def __init__(self, packages, sdks=None, digest=None):
+        self.digest = digest
+        self.packages = tuple(sorted(packages, key=lambda p: p.name))
+        self.sdks = dict(sdks or {})
+        self._by_name = {package.name: package for package in self.packages}
+        self._by_version = _group(self.packages, 'version')
+        self._by_source = _group(self.packages, 'source')
+        self._by_kind = _group(self.packages, 'kind')
+
+    @classmethod
+    def from_text(cls, text, digest=None):
+        """Build a table from lock file text, scanning when possible."""
+        try:
+            lock = scan_lock(text)
+        except ValueError:
+            count('lockfile.yaml_fallbacks')
+            from tests.yaml_backend import load
+            lock = load(text)
+        return cls.from_lock(lock, digest)
+
+    @classmethod
+    def from_lock(cls, lock, digest=None):
+        """Build a table from a parsed lock file mapping."""
+        if not isinstance(lock, dict):
+            raise ValueError("lock file is not a mapping")
+        packages = lock.get('packages') or {}
+        sdks = lock.get('sdks') or {}
+        if not isinstance(packages, dict) or not isinstance(sdks, dict):
+            raise ValueError("packages and sdks must be mappings")
+        # An entry that is not a mapping (null, a bare string) has no
+        # fields, so every field takes its default.
+        return cls([LockedPackage.from_entry(
+                        name, entry if isinstance(entry, dict) else {})
+                    for name, entry in packages.items()],
+                   {sdk: str(constraint) for sdk, constraint in
+                    sdks.items()}, digest)
+
+    def rows(self):
+        return tuple(package.row() for package in self.packages)
+
+    @classmethod
+    def from_rows(cls, rows, sdks, digest=None):
+        return cls([LockedPackage(*row) for row in rows], sdks, digest)
+
+    def __len__(self):
+        return len(self.packages)
+
+    def __iter__(self):
+        return iter(self.packages)
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def get(self, name):
+        return self._by_name.get(name)
+
+    def with_version(self, version):
+        return self._by_version.get(version, ())
+
+    def with_source(self, source):
+        """Return the names of packages from ``source`` (hosted, git...)."""
+        return self._by_source.get(source, ())
+
+    def with_kind(self, kind):
+        return self._by_kind.get(kind, ())
+
+    def sources(self):
+        return {source: len(names) for source, names in
+                sorted(self._by_source.items())}
+
+    def kinds(self):
+        return {kind: len(names) for kind, names in
+                sorted(self._by_kind.items())}
+
+    def hosted(self):
+        return self.with_source('hosted')
+
+    def non_hosted(self):
+        return tuple(sorted(name for source, names in self._by_source.items()
+                            if source != 'hosted' for name in names))
+
+    def unresolved(self, names):
+        """Return the ``names`` that have no entry in the table."""
+        return [name for name in names if name not in self._by_name]
+
+
+LockDiff = namedtuple('LockDiff', 'added removed changed')
+
+
+def diff(old, new):
+    """Return what changed from table ``old`` to table ``new``.
+
+    ``added`` and ``removed`` are packages; ``changed`` holds
+    ``(old, new)`` package pairs for names present in both.
+    """
+    if old.digest is not None and old.digest == new.digest:
+        return LockDiff([], [], [])
+    old_names, new_names = old._by_name, new._by_name
+    added = [new_names[name] for name in new_names.keys() - old_names.keys()]
+    removed = [old_names[name]
+               for name in old_names.keys() - new_names.keys()]
+    changed = [(old_names[name], new_names[name])
+               for name in old_names.keys() & new_names.keys()
+               if old_names[name] != new_names[name]]
+    return LockDiff(sorted(added, key=lambda p: p.name),
+                    sorted(removed, key=lambda p: p.name),
+                    sorted(changed, key=lambda pair: pair[0].name))
+
+
+def table_key(digest):
+    """Hash a lock file digest together with this module's code."""
+    key = hashlib.sha256(digest.encode('ascii'))
+    key.update(Path(__file__).read_bytes())
+    return key.hexdigest()[:24]
+
+
+def _load_table(digest):
+    from tests.incremental import load_cached
+    try:
+        rows, sdks = load_cached('lockfiles', table_key(digest))
+        return PackageTable.from_rows(rows, sdks, digest)
+    except (ValueError, TypeError):  # missing (None) or malformed
+        return None
+
+
+def _store_table(table):
+    from tests.incremental import store_cached
+    store_cached('lockfiles', table_key(table.digest),
+                 (table.rows(), table.sdks))
+
+
+_tables = {}
+
+
+def load_lockfile(document):
+    """Return the :class:`PackageTable` of a lock file document.
+
+    Tables are reused by content hash from memory, then from the on-disk
+    cache; the file is only parsed when neither has it.
+    """
+    table = document.memo.get('lockfile')
+    if table is not None:
+        return table
+    digest = document.digest
+    table = _tables.get(digest)
+    if table is None:
+        table = _load_table(digest)
+        if table is None:
+            count('lockfile.parses')
+            with span('lockfile', 'build', path=document.path):
+                table = PackageTable.from_text(document.text, digest)
+            _store_table(table)
+        else:
+            count('lockfile.disk_hits')
+        _tables[digest] = table
+    document.memo['lockfile'] = table
+    return table
+
+
+def read_lockfile(spec, root=REPO_ROOT):
+    """Return the table for a file path or a git ``REV:PATH`` name."""
+    path = Path(root) / spec
+    if path.is_file():
+        return load_lockfile(get_document_cache().get(path))
+    from tests.git_source import GitObjectStore
+    with GitObjectStore(root) as store:
+        data = store.read(spec)
+    return load_lockfile(Document(spec.rsplit(':', 1)[-1], data=data))
+
+
+def _diff_to_dict(changes):
+    return {
+        'added': {p.name: p.version for p in changes.added},
+        'removed': {p.name: p.version for p in changes.removed},
+        'changed': {old.name: {'from': old.version, 'to': new.version,
+                               'source': [old.source, new.source]}
+                    for old, new in changes.changed},
+    }
+
+
+def _print_diff(changes, out):
+    for package in changes.added:
+        print(f"+ {package.name} {package.version} ({package.source})",
+              file=out)
+    for package in changes.removed:
+        print(f"- {package.name} {package.version} ({package.source})",
+              file=out)
+    for old, new in changes.changed:
+        detail = f"{old.version} -> {new.version}"
+        if old.source != new.source:
+            detail += f" ({old.source} -> {new.source})"
+        elif old.version == new.version:
+            detail += f" ({old.kind} -> {new.kind})" \
+                if old.kind != new.kind else " (content changed)"
+        print(f"~ {old.name} {detail}", file=out)
+    print(f"{len(changes.added)} added, {len(changes.removed)} removed, "
+          f"{len(changes.changed)} changed", file=out)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m tests.lockfile',
+        description='Query and compare pubspec.lock files.')
+    parser.add_argument('lockfile', nargs='?', default='pubspec.lock',
+                        help='lock file or git REV:PATH '
+                             '(default: %(default)s)')
+    parser.add_argument('--diff', metavar='OLD',
+                        help='compare OLD (file or REV:PATH) to LOCKFILE')
+    parser.add_argument('--source', help='list packages from this source')
+    parser.add_argument('--kind', help="list packages of this dependency "
+                                       "kind, e.g. 'direct dev'")
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--root', default=str(REPO_ROOT))
+    return parser
+
+
+def main(argv=None, out=None):
+    out = out or sys.stdout
+    args = build_parser().parse_args(argv)
+    from tests.git_source import GitError
+    try:
+        table = read_lockfile(args.lockfile, args.root)
+        old = read_lockfile(args.diff, args.root) if args.diff else None
+    except (GitError, ValueError) as e:
+        print(f"lockfile: {e}", file=sys.stderr)
+        return 2
+
+    if old is not None:
+        changes = diff(old, table)
+        if args.json:
+            json.dump(_diff_to_dict(changes), out, indent=2)
+            out.write('\n')
+        else:
+            _print_diff(changes, out)
+        return 0 if not any(changes) else 1
+
+    names = None
+    if args.source or args.kind:
+        names = set(table.with_source(args.source) if args.source
+                    else (package.name for package in table))
+        if args.kind:
+            names &= set(table.with_kind(args.kind))
+    if args.json:
+        packages = [dict(zip(LockedPackage.__slots__, package.row()))
+                    for package in table
+                    if names is None or package.name in names]
+        json.dump({'sdks': table.sdks, 'sources': table.sources(),
+                   'kinds': table.kinds(), 'packages': packages},
+                  out, indent=2)
+        out.write('\n')
+    elif names is not None:
+        for name in sorted(names):
+            print(f"{name} {table.get(name).version}", file=out)
+    else:
+        print(f"{len(table)} packages", file=out)
+        for label, counts in (('source', table.sources()),
+                              ('kind', table.kinds())):
+            for key, number in counts.items():
+                print(f"  {label} {key}: {number}", file=out)
+        for sdk, constraint in table.sdks.items():
+            print(f"  sdk {sdk}: {constraint}", file=out)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
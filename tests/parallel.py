@@ -0,0 +1,110 @@
+"""
+Process-pool execution of per-file validation work.
+Results always come back in input order, whatever the worker count.
+
+Also home to the pieces shared with the prefetcher's thread pool: the
+``VALIDATION_*`` count settings and a lazily started shared executor.
+"""
+
+import atexit
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Below this many items a pool costs more to start than it saves.
+MIN_PARALLEL_ITEMS = 8
+CHUNKS_PER_WORKER = 4
+
+
+def env_int(name, default):
+    """Return the integer in environment variable ``name``.
+
+    Unset or empty gives ``default``; so does a malformed value, with a
+    warning naming the variable.
+    """
+    value = os.environ.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        warnings.warn(f"{name}={value!r} is not a whole number; "
+                      f"using {default}", RuntimeWarning, stacklevel=3)
+        return default
+
+
+def configured_workers():
+    """Return the worker count from ``VALIDATION_WORKERS``.
+
+    Unset or ``1`` runs in-process; ``0`` or ``auto`` uses every CPU.
+    """
+    value = os.environ.get('VALIDATION_WORKERS', '').strip().lower()
+    workers = 0 if value == 'auto' else env_int('VALIDATION_WORKERS', 1)
+    if workers == 0:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+def configured_chunksize(count, workers):
+    """Return ``VALIDATION_CHUNKSIZE`` or a size giving each worker a few
+    chunks, which keeps IPC overhead low while still balancing load."""
+    chunksize = env_int('VALIDATION_CHUNKSIZE', 0)
+    if chunksize > 0:
+        return chunksize
+    return max(1, count // (workers * CHUNKS_PER_WORKER))
+
+
+def configured_readers():
+    """Return the concurrent read count from ``VALIDATION_PREFETCH``."""
+    return max(0, env_int('VALIDATION_PREFETCH', 0))
+
+
+class SharedExecutor:
+    """One executor reused across calls and shut down at exit.
+
+    ``factory(workers)`` builds it on first use, and again whenever a
+    different worker count is asked for.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.executor = None
+        self.workers = 0
+        atexit.register(self.shutdown)
+
+    def get(self, workers):
+        if self.executor is None or self.workers != workers:
+            self.shutdown()
+            self.executor = self.factory(workers)
+            self.workers = workers
+        return self.executor
+
+    def shutdown(self):
+        """Stop the executor, if one was started."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+_pool = SharedExecutor(ProcessPoolExecutor)
+
+
+def shutdown():
+    """Stop the shared pool, if one was started."""
+    _pool.shutdown()
+
+
+def run_parallel(func, items, workers=None, chunksize=None):
+    """Return ``[func(item) for item in items]``, fanned out over processes.
+
+    ``func`` and the items must be picklable. Small batches, or a single
+    worker, run in the calling process.
+    """
+    items = list(items)
+    workers = configured_workers() if workers is None else max(1, workers)
+    if workers == 1 or len(items) < MIN_PARALLEL_ITEMS:
+        return [func(item) for item in items]
+    if chunksize is None:
+        chunksize = configured_chunksize(len(items), workers)
+    return list(_pool.get(workers).map(func, items, chunksize=chunksize))
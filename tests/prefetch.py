@@ -0,0 +1,185 @@
+"""
+Overlapped file reads for validation on high-latency filesystems.
+Enable with VALIDATION_PREFETCH=N (N concurrent reads; 0 or unset is off).
+
+On network and overlay mounts each ``stat()`` and ``open()`` waits a
+round trip, and reading one file at a time pays that latency serially.
+``prefetch_documents`` drives an asyncio loop on a helper thread that
+issues the blocking calls through a thread pool, at most N at a time:
+first a stat of every file, then reads of the files whose cached
+signature is stale, largest predicted size first so the long transfers
+start early. Loaded files go through a bounded queue, so at most a few
+files per reader are held ahead of the validators consuming them.
+
+All document cache updates and counters happen on the consuming thread.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from tests.document_cache import get_document_cache
+from tests.instrumentation import count, span
+from tests.parallel import SharedExecutor, configured_readers
+
+
+# Loaded files the queue holds per reader before readers wait.
+QUEUE_PER_READER = 2
+
+_DONE = object()
+
+
+class FileSystem:
+    """The blocking calls made by the readers, one per pool thread."""
+
+    def stat(self, path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def read(self, path):
+        """Return ``(signature, data)``, the signature taken at open."""
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            return (stat.st_mtime_ns, stat.st_size), f.read()
+
+
+_readers = SharedExecutor(lambda workers: ThreadPoolExecutor(
+    max_workers=workers, thread_name_prefix='prefetch'))
+
+
+def shutdown():
+    """Stop the shared reader threads, if any were started."""
+    _readers.shutdown()
+
+
+class _Producer:
+    """Runs on the helper thread; everything here is asyncio-side."""
+
+    def __init__(self, paths, known, readers, queue_size, fs):
+        self.paths = paths
+        self.known = known
+        self.readers = readers
+        self.queue_size = queue_size
+        self.fs = fs
+        self.loop = None
+        self.queue = None
+        self.task = None
+        self.drained = None
+        self.error = None
+        self.started = threading.Event()
+
+    def run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(self.queue_size)
+        self.task = asyncio.current_task()
+        self.drained = asyncio.Event()
+        self.started.set()
+        try:
+            try:
+                await self._produce()
+            except Exception as error:  # re-raised on the consuming thread
+                self.error = error
+            await self.queue.put(_DONE)
+            # Keep the loop alive until the consumer has taken everything.
+            await self.drained.wait()
+        except asyncio.CancelledError:
+            return
+
+    async def _produce(self):
+        # A reader slot is held until its result is queued, so a full
+        # queue stops new reads instead of piling up loaded files.
+        gate = asyncio.Semaphore(self.readers)
+        executor = _readers.get(self.readers)
+
+        async def stat(path):
+            async with gate:
+                try:
+                    signature = await self.loop.run_in_executor(
+                        executor, self.fs.stat, path)
+                except OSError:
+                    await self.queue.put((path, None, None))
+                    return None
+                if signature == self.known.get(path):
+                    await self.queue.put((path, signature, None))
+                    return None
+            return path, signature[1]
+
+        async def read(path):
+            async with gate:
+                try:
+                    signature, data = await self.loop.run_in_executor(
+                        executor, self.fs.read, path)
+                except OSError:
+                    signature = data = None
+                await self.queue.put((path, signature, data))
+
+        stale = [item for item in await asyncio.gather(
+            *(stat(path) for path in self.paths)) if item is not None]
+        stale.sort(key=lambda item: -item[1])
+        await asyncio.gather(*(read(path) for path, _ in stale))
+
+    async def _take(self):
+        item = await self.queue.get()
+        if item is _DONE:
+            self.drained.set()
+        return item
+
+    def get(self):
+        return asyncio.run_coroutine_threadsafe(
+            self._take(), self.loop).result()
+
+    def cancel(self):
+        try:
+            self.loop.call_soon_threadsafe(self.task.cancel)
+        except RuntimeError:  # the loop already finished
+            pass
+
+
+def prefetch_documents(paths, cache=None, readers=None, queue_size=None,
+                       fs=None):
+    """Yield ``(path, document)`` for ``paths`` as their reads complete.
+
+    ``document`` is None if the file could not be read; ask the cache
+    for it to get the error. Any other exception from ``fs`` is raised
+    here once the files loaded before it are yielded. Stopping the
+    iteration early cancels the outstanding reads.
+    """
+    paths = list(dict.fromkeys(Path(path) for path in paths))
+    cache = get_document_cache() if cache is None else cache
+    readers = readers or configured_readers() or 1
+    producer = _Producer(paths, {path: cache.signature(path)
+                                 for path in paths},
+                         readers, queue_size or readers * QUEUE_PER_READER,
+                         fs or FileSystem())
+    thread = threading.Thread(target=producer.run, name='prefetch',
+                              daemon=True)
+    thread.start()
+    producer.started.wait()
+    finished = False
+    try:
+        while True:
+            # Time the validators spend waiting on I/O.
+            with span('prefetch', 'wait'):
+                item = producer.get()
+            if item is _DONE:
+                finished = True
+                if producer.error is not None:
+                    raise producer.error
+                return
+            path, signature, data = item
+            if data is not None:
+                count('prefetch.reads')
+                count('prefetch.bytes_read', len(data))
+            if signature is None:
+                yield path, None
+            else:
+                yield path, cache.put(path, signature, data)
+    finally:
+        if not finished:
+            producer.cancel()
+        thread.join()
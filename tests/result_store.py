@@ -0,0 +1,322 @@
+"""
+Compact columnar store for validation results, with streaming writers.
+Usage: python -m tests.validate --format junit > validation.xml
+       python -m tests.validate --format sarif > validation.sarif
+
+Findings are kept as parallel ``array`` columns (rule, file, line,
+column, severity, message) holding small integers; rule ids, paths and
+messages are interned once. A finding costs about 20 bytes instead of
+a tuple, a string and a subTest. Messages of the form
+``path:line:column: text`` are split, so repeated texts such as
+``trailing whitespace`` are stored once.
+
+Every checked file is a row of its own (rule, file and the range of its
+findings), so the JUnit writer can emit passing test cases too. Both
+writers go through the store in insertion order and write each element
+as soon as it is complete; nothing proportional to the report is built
+in memory.
+"""
+
+import json
+import re
+from array import array
+from collections import Counter, namedtuple
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+from tests.instrumentation import span
+
+
+SEVERITIES = ('error', 'warning', 'note')
+COLUMNS = ('rule', 'file', 'line', 'column', 'severity', 'message')
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+
+Finding = namedtuple('Finding', COLUMNS)
+
+_LOCATED = re.compile(r'(?P<path>.*?):(?P<line>\d+):(?P<column>\d+): ')
+
+
+class _Interner:
+    """Maps strings to dense integer ids and back."""
+
+    __slots__ = ('ids', 'values')
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def __call__(self, value):
+        key = self.ids.get(value)
+        if key is None:
+            key = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return key
+
+    def __len__(self):
+        return len(self.values)
+
+
+class ResultStore:
+    """Findings and checked files of a validation run, column by column."""
+
+    def __init__(self, root=None):
+        self.root = Path(root).resolve() if root is not None else None
+        self.rules = _Interner()
+        self.paths = _Interner()
+        self.messages = _Interner()
+        self.statuses = {}
+        # One row per finding.
+        self._rule = array('I')
+        self._file = array('I')
+        self._line = array('I')
+        self._column = array('I')
+        self._severity = array('B')
+        self._message = array('I')
+        # One row per checked file; findings [start, end) belong to it.
+        self._checked_rule = array('I')
+        self._checked_file = array('I')
+        self._checked_end = array('I')
+
+    @classmethod
+    def from_results(cls, results, root):
+        store = cls(root)
+        for result in results:
+            store.add_result(result)
+        return store
+
+    def __len__(self):
+        return len(self._rule)
+
+    def relative(self, path):
+        path = str(path)
+        if self.root is not None:
+            try:
+                return Path(path).relative_to(self.root).as_posix()
+            except ValueError:
+                pass
+        return path
+
+    def add_result(self, result):
+        """Add a ``RuleResult`` with each of its files and findings."""
+        rule = result.rule
+        self.set_status(rule.id, result.status, result.reason)
+        severity = getattr(rule, 'severity', 'error')
+        for path, failures in result.files:
+            self.add_file(rule.id, path, failures, severity)
+
+    def set_status(self, rule_id, status, reason=None):
+        self.statuses[self.rules(rule_id)] = (status, reason)
+
+    def add_file(self, rule_id, path, messages=(), severity='error'):
+        """Record that ``rule_id`` checked ``path`` and found ``messages``.
+
+        ``path:line:column: `` prefixes are moved into the line and
+        column columns; other messages are stored whole with line 0.
+        """
+        rule = self.rules(rule_id)
+        name = str(path)
+        relative = self.relative(name)
+        file = self.paths(relative)
+        level = SEVERITIES.index(severity)
+        for message in messages:
+            line = column = 0
+            located = _LOCATED.match(message)
+            if located and self._same_file(located.group('path'), name,
+                                           relative):
+                line = int(located.group('line'))
+                column = int(located.group('column'))
+                message = message[located.end():]
+            self._rule.append(rule)
+            self._file.append(file)
+            self._line.append(line)
+            self._column.append(column)
+            self._severity.append(level)
+            self._message.append(self.messages(message))
+        self._checked_rule.append(rule)
+        self._checked_file.append(file)
+        self._checked_end.append(len(self._rule))
+
+    def _same_file(self, prefix, name, relative):
+        # Merged shard reports give relative paths while messages keep
+        # the absolute path of the node that ran the shard.
+        return prefix in (name, relative) or \
+            self.relative(prefix) == relative or \
+            prefix.replace('\\', '/').endswith('/' + relative)
+
+    def finding(self, position):
+        return Finding(self.rules.values[self._rule[position]],
+                       self.paths.values[self._file[position]],
+                       self._line[position], self._column[position],
+                       SEVERITIES[self._severity[position]],
+                       self.messages.values[self._message[position]])
+
+    def __iter__(self):
+        for position in range(len(self._rule)):
+            yield self.finding(position)
+
+    def checked(self):
+        """Yield ``(rule, path, start, end)`` for every checked file."""
+        start = 0
+        for rule, file, end in zip(self._checked_rule, self._checked_file,
+                                   self._checked_end):
+            yield (self.rules.values[rule], self.paths.values[file],
+                   start, end)
+            start = end
+
+    def group_by(self, *columns):
+        """Count findings per value (or tuple of values) of ``columns``.
+
+        Counting runs over the integer columns; only the distinct keys
+        are decoded.
+        """
+        if not columns or any(c not in COLUMNS for c in columns):
+            raise ValueError(f"group by one or more of {', '.join(COLUMNS)}")
+        arrays = [getattr(self, f'_{column}') for column in columns]
+        counts = Counter(arrays[0] if len(arrays) == 1 else zip(*arrays))
+        decoders = [self._decoder(column) for column in columns]
+        if len(columns) == 1:
+            return {decoders[0](key): n for key, n in counts.items()}
+        return {tuple(decode(k) for decode, k in zip(decoders, key)): n
+                for key, n in counts.items()}
+
+    def _decoder(self, column):
+        values = {'rule': self.rules.values, 'file': self.paths.values,
+                  'message': self.messages.values,
+                  'severity': SEVERITIES}.get(column)
+        return values.__getitem__ if values is not None else int
+
+    def summary(self):
+        """Return ``{rule: {'status', 'files', 'findings'}}`` in rule order."""
+        files = Counter(self._checked_rule)
+        findings = Counter(self._rule)
+        summary = {}
+        for rule, rule_id in enumerate(self.rules.values):
+            status, reason = self.statuses.get(rule, (None, None))
+            summary[rule_id] = {'status': status, 'files': files[rule],
+                                'findings': findings[rule]}
+            if reason:
+                summary[rule_id]['reason'] = reason
+        return summary
+
+    def nbytes(self):
+        """Bytes held by the columns, not counting interned strings."""
+        return sum(column.itemsize * len(column) for column in (
+            self._rule, self._file, self._line, self._column,
+            self._severity, self._message, self._checked_rule,
+            self._checked_file, self._checked_end))
+
+
+# Characters outside the XML 1.0 Char production; findings quote file
+# content, which may contain control characters.
+_XML_ILLEGAL = re.compile('[^\t\n\r\x20-\ud7ff\ue000-\ufffd'
+                          '\U00010000-\U0010ffff]')
+
+
+def _escape(text):
+    return escape(_XML_ILLEGAL.sub('\ufffd', text))
+
+
+def _quoteattr(text):
+    return quoteattr(_XML_ILLEGAL.sub('\ufffd', text))
+
+
+def _describe(finding):
+    if finding.line:
+        return f"{finding.file}:{finding.line}:{finding.column}: " \
+               f"{finding.message}"
+    return finding.message
+
+
+def write_junit(store, out, name='validation'):
+    """Write ``store`` as JUnit XML: a suite per rule, a case per file."""
+    with span('report', 'junit'):
+        summary = store.summary()
+        failures = Counter()
+        for rule, _, start, end in store.checked():
+            if end > start and summary[rule]['status'] != 'warned':
+                failures[rule] += 1
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        tests = sum(max(info['files'], 1) for info in summary.values())
+        out.write(f'<testsuites name={_quoteattr(name)} tests="{tests}" '
+                  f'failures="{sum(failures.values())}">\n')
+        current = None
+        for rule, path, start, end in store.checked():
+            if rule != current:
+                if current is not None:
+                    out.write('  </testsuite>\n')
+                current = rule
+                _write_suite_start(out, rule, summary[rule], failures[rule])
+            out.write(f'    <testcase classname={_quoteattr(rule)} '
+                      f'name={_quoteattr(path)}')
+            if end == start:
+                out.write('/>\n')
+                continue
+            kind = 'failure' if summary[rule]['status'] != 'warned' \
+                else 'system-out'
+            out.write('>\n')
+            if kind == 'failure':
+                out.write(f'      <failure message='
+                          f'{_quoteattr(f"{end - start} finding(s)")}>')
+            else:
+                out.write('      <system-out>')
+            for position in range(start, end):
+                out.write(_escape(_describe(store.finding(position))) + '\n')
+            out.write(f'</{kind}>\n    </testcase>\n')
+        if current is not None:
+            out.write('  </testsuite>\n')
+        # Rules with no file rows: skipped, failed with no target, or
+        # passed where only a status is known (merged shard reports).
+        for rule, info in summary.items():
+            if info['files']:
+                continue
+            _write_suite_start(out, rule, dict(info, files=1),
+                               int(info['status'] == 'failed'))
+            out.write(f'    <testcase classname={_quoteattr(rule)} '
+                      f'name={_quoteattr(rule)}')
+            if info['status'] not in ('failed', 'skipped'):
+                out.write('/>\n  </testsuite>\n')
+                continue
+            reason = _quoteattr(info.get('reason') or '')
+            tag = 'failure' if info['status'] == 'failed' else 'skipped'
+            out.write(f'>\n      <{tag} message={reason}/>\n'
+                      '    </testcase>\n  </testsuite>\n')
+        out.write('</testsuites>\n')
+
+
+def _write_suite_start(out, rule, info, failures):
+    out.write(f'  <testsuite name={_quoteattr(rule)} tests="{info["files"]}" '
+              f'failures="{failures}" '
+              f'skipped="{int(info["status"] == "skipped")}">\n')
+
+
+def write_sarif(store, out, tool='tests.validate'):
+    """Write ``store`` as a SARIF 2.1.0 log with one run."""
+    with span('report', 'sarif'):
+        rules = [{'id': rule_id} for rule_id in store.rules.values]
+        out.write('{\n  "$schema": ' + json.dumps(SARIF_SCHEMA) +
+                  ',\n  "version": "2.1.0",\n  "runs": [{\n'
+                  '    "tool": {"driver": ' +
+                  json.dumps({'name': tool, 'rules': rules}) + '},\n'
+                  '    "results": [')
+        separator = '\n      '
+        for position in range(len(store)):
+            finding = store.finding(position)
+            location = {'artifactLocation': {'uri': finding.file}}
+            if finding.line:
+                location['region'] = {'startLine': finding.line,
+                                      'startColumn': finding.column or 1}
+            out.write(separator + json.dumps({
+                'ruleId': finding.rule,
+                'ruleIndex': store._rule[position],
+                'level': finding.severity,
+                'message': {'text': finding.message},
+                'locations': [{'physicalLocation': location}]}))
+            separator = ',\n      '
+        out.write('\n    ]\n  }]\n}\n')
+
+
+WRITERS = {'junit': write_junit, 'sarif': write_sarif}
+
+
+def write_report(store, format, out):
+    WRITERS[format](store, out)
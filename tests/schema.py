@@ -0,0 +1,419 @@
+"""
+Declarative schemas for the structured configuration files.
+
+Each schema (a small JSON Schema subset, see ``KEYWORDS``) is compiled
+into straight-line Python, one function per schema node, with key sets,
+patterns and enums hoisted into constants. The compiled code object is
+cached on disk keyed by the schema hash, so later runs skip code
+generation entirely. A compiled validator reports every violation in a
+single pass and can check a whole batch of documents in one call.
+"""
+
+import hashlib
+import json
+import re
+import sys
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+from tests.instrumentation import count
+
+
+SchemaViolation = namedtuple('SchemaViolation', 'path message')
+
+TYPE_TESTS = {
+    'object': 'isinstance({v}, dict)',
+    'array': 'isinstance({v}, list)',
+    'string': 'isinstance({v}, str)',
+    'integer': '(isinstance({v}, int) and not isinstance({v}, bool))',
+    'number': '(isinstance({v}, (int, float)) and not isinstance({v}, bool))',
+    'boolean': 'isinstance({v}, bool)',
+    'null': '{v} is None',
+}
+
+KEYWORDS = frozenset((
+    'type', 'enum', 'pattern', 'required', 'requiredAny', 'properties',
+    'additionalProperties', 'minProperties', 'items', 'minItems',
+    # Annotations, ignored by the compiler.
+    'title', 'description',
+))
+
+IDENTIFIER = re.compile(r'^[A-Za-z_][\w-]*$')
+
+# Helpers every compiled module starts with.
+PRELUDE = '''\
+import re
+
+_MISSING = object()
+_TYPE_NAMES = {dict: 'object', list: 'array', str: 'string', int: 'integer',
+               float: 'number', bool: 'boolean', type(None): 'null'}
+
+
+def _type_name(value):
+    return _TYPE_NAMES.get(type(value), type(value).__name__)
+'''
+
+ENTRY_POINTS = '''
+
+def validate(value):
+    errors = []
+    _v0(value, '$', errors)
+    return errors
+
+
+def validate_many(values):
+    results = []
+    for value in values:
+        errors = []
+        _v0(value, '$', errors)
+        results.append(errors)
+    return results
+'''
+
+
+class SchemaError(ValueError):
+    """Raised for schemas using unknown keywords or malformed values."""
+
+
+def _child_path(key):
+    """Return source appending ``key`` to the runtime ``path``."""
+    if IDENTIFIER.match(key):
+        return f"path + {'.' + key!r}"
+    return f"path + {'[' + repr(key) + ']'!r}"
+
+
+class _Compiler:
+    """Generates one ``_vN(value, path, errors)`` function per node."""
+
+    def __init__(self):
+        self.constants = []
+        self.functions = []
+
+    def constant(self, expression):
+        name = f'_C{len(self.constants)}'
+        self.constants.append(f'{name} = {expression}')
+        return name
+
+    def node(self, schema):
+        if not isinstance(schema, dict):
+            raise SchemaError(f"schema nodes must be mappings: {schema!r}")
+        unknown = set(schema) - KEYWORDS
+        if unknown:
+            raise SchemaError(f"unknown schema keywords: {sorted(unknown)}")
+        name = f'_v{len(self.functions)}'
+        self.functions.append(None)
+        lines = [f'def {name}(value, path, errors):']
+        emit = lambda line, depth=1: lines.append('    ' * depth + line)
+
+        types = schema.get('type')
+        if types is not None:
+            types = [types] if isinstance(types, str) else list(types)
+            if not set(types) <= set(TYPE_TESTS):
+                raise SchemaError(f"unknown type in {types!r}")
+            test = ' or '.join(TYPE_TESTS[t].format(v='value')
+                               for t in types)
+            emit(f'if not ({test}):')
+            emit(f"errors.append((path, 'expected {' or '.join(types)}, "
+                 f"got ' + _type_name(value)))", 2)
+            emit('return', 2)
+        if 'enum' in schema:
+            values = self.constant(repr(tuple(schema['enum'])))
+            emit(f'if value not in {values}:')
+            emit(f"errors.append((path, 'expected one of ' + "
+                 f"', '.join(map(repr, {values})) + ', got ' + "
+                 f"repr(value)))", 2)
+        if 'pattern' in schema:
+            pattern = self.constant(f"re.compile({schema['pattern']!r})")
+            emit(f'if isinstance(value, str) and '
+                 f'not {pattern}.search(value):')
+            message = 'does not match ' + repr(schema['pattern'])
+            emit(f'errors.append((path, {message!r}))', 2)
+        # A failed type test returns early, so a node typed as exactly
+        # object or array needs no second isinstance guard.
+        self._object(schema, emit, 1 if types == ['object'] else 2)
+        self._array(schema, emit, 1 if types == ['array'] else 2)
+        if len(lines) == 1:
+            emit('pass')
+        self.functions[int(name[2:])] = '\n'.join(lines)
+        return name
+
+    def _object(self, schema, emit, depth):
+        keywords = ('required', 'requiredAny', 'properties',
+                    'additionalProperties', 'minProperties')
+        if not any(keyword in schema for keyword in keywords):
+            return
+        if depth > 1:
+            emit('if isinstance(value, dict):')
+        for key in schema.get('required', ()):
+            message = 'missing required key ' + repr(key)
+            emit(f'if {key!r} not in value:', depth)
+            emit(f'errors.append((path, {message!r}))', depth + 1)
+        any_of = schema.get('requiredAny')
+        if any_of:
+            test = ' and '.join(f'{key!r} not in value' for key in any_of)
+            message = 'should have at least one of ' + \
+                ', '.join(map(repr, any_of))
+            emit(f'if {test}:', depth)
+            emit(f'errors.append((path, {message!r}))', depth + 1)
+        if 'minProperties' in schema:
+            minimum = int(schema['minProperties'])
+            emit(f'if len(value) < {minimum}:', depth)
+            emit(f"errors.append((path, 'expected at least {minimum} "
+                 f"key(s)'))", depth + 1)
+        properties = schema.get('properties', {})
+        for key, subschema in properties.items():
+            function = self.node(subschema)
+            emit(f'item = value.get({key!r}, _MISSING)', depth)
+            emit('if item is not _MISSING:', depth)
+            emit(f'{function}(item, {_child_path(key)}, errors)', depth + 1)
+        extra = schema.get('additionalProperties', True)
+        if extra is True:
+            return
+        emit('for key, item in value.items():', depth)
+        if properties:
+            known = self.constant(repr(frozenset(properties)))
+            emit(f'if key in {known}:', depth + 1)
+            emit('continue', depth + 2)
+        if extra is False:
+            emit("errors.append((path, 'unexpected key ' + repr(key)))",
+                 depth + 1)
+        else:
+            function = self.node(extra)
+            emit(f"{function}(item, path + '.' + str(key), errors)",
+                 depth + 1)
+
+    def _array(self, schema, emit, depth):
+        if 'items' not in schema and 'minItems' not in schema:
+            return
+        if depth > 1:
+            emit('if isinstance(value, list):')
+        if 'minItems' in schema:
+            minimum = int(schema['minItems'])
+            emit(f'if len(value) < {minimum}:', depth)
+            emit(f"errors.append((path, 'expected at least {minimum} "
+                 f"item(s)'))", depth + 1)
+        if 'items' in schema:
+            function = self.node(schema['items'])
+            emit('for index, item in enumerate(value):', depth)
+            emit(f"{function}(item, path + '[' + str(index) + ']', errors)",
+                 depth + 1)
+
+    def source(self, schema):
+        self.node(schema)
+        return '\n\n\n'.join([PRELUDE + '\n\n' + '\n'.join(self.constants),
+                               *self.functions]) + '\n' + ENTRY_POINTS
+
+
+def generate_source(schema):
+    """Return the Python source of the validator module for ``schema``."""
+    return _Compiler().source(schema)
+
+
+@lru_cache(maxsize=None)
+def _compiler_digest():
+    # This module is not edited while a process runs; read it once.
+    digest = hashlib.sha256(Path(__file__).read_bytes())
+    digest.update(sys.implementation.cache_tag.encode())
+    return digest.digest()
+
+
+def schema_key(schema):
+    """Hash ``schema`` together with this compiler and the bytecode format."""
+    digest = hashlib.sha256(json.dumps(schema, sort_keys=True).encode())
+    digest.update(_compiler_digest())
+    return digest.hexdigest()[:24]
+
+
+class CompiledSchema:
+    """A validator generated from one schema.
+
+    ``validate(value)`` and ``validate_many(values)`` return lists of
+    :class:`SchemaViolation`, every violation found in a single pass.
+    """
+
+    def __init__(self, key, code):
+        self.key = key
+        namespace = {'__name__': f'schema_{key}'}
+        exec(code, namespace)
+        self._validate = namespace['validate']
+        self._validate_many = namespace['validate_many']
+
+    def validate(self, value):
+        return [SchemaViolation(*error) for error in self._validate(value)]
+
+    def validate_many(self, values):
+        return [[SchemaViolation(*error) for error in errors]
+                for errors in self._validate_many(values)]
+
+
+_compiled = {}
+
+
+def compile_schema(schema, key=None):
+    """Return the :class:`CompiledSchema` for ``schema``.
+
+    Compiled code is reused from memory, then from the on-disk cache,
+    and only generated when neither has it. ``key`` is
+    ``schema_key(schema)`` if the caller already knows it.
+    """
+    from tests.incremental import load_cached, store_cached
+    key = key or schema_key(schema)
+    compiled = _compiled.get(key)
+    if compiled is not None:
+        return compiled
+    code = load_cached('schemas', key)
+    if code is None:
+        count('schema.compiles')
+        code = compile(generate_source(schema), f'<schema {key}>', 'exec')
+        store_cached('schemas', key, code)
+    else:
+        count('schema.disk_hits')
+    compiled = _compiled[key] = CompiledSchema(key, code)
+    return compiled
+
+
+DEPENDENCIES = {
+    'type': ['object', 'null'],
+    'additionalProperties': {'type': ['string', 'object', 'null']},
+}
+
+PUBSPEC = {
+    'type': 'object',
+    'required': ['name', 'description', 'version', 'environment',
+                 'dependencies', 'dev_dependencies'],
+    'properties': {
+        'name': {'type': 'string', 'pattern': r'^[a-z][a-z0-9_]*$'},
+        'description': {'type': 'string'},
+        'version': {'type': 'string',
+                    'pattern': r'^\d+\.\d+\.\d+([-+][0-9A-Za-z.+-]+)?$'},
+        'publish_to': {'type': 'string'},
+        'environment': {
+            'type': 'object',
+            'required': ['sdk'],
+            'additionalProperties': {'type': 'string'},
+        },
+        'dependencies': DEPENDENCIES,
+        'dev_dependencies': DEPENDENCIES,
+        'dependency_overrides': DEPENDENCIES,
+        'flutter': {
+            'type': ['object', 'null'],
+            'properties': {
+                'uses-material-design': {'type': 'boolean'},
+                'generate': {'type': 'boolean'},
+                'assets': {'type': 'array', 'items': {'type': 'string'}},
+                'fonts': {'type': 'array', 'items': {
+                    'type': 'object', 'required': ['family', 'fonts']}},
+            },
+        },
+    },
+}
+
+PIPELINE_STEP = {
+    'type': 'object',
+    'minProperties': 1,
+    'properties': {
+        'task': {'type': 'string',
+                 'pattern': r'^[A-Za-z][\w.-]*@\d+(\.\d+)*$'},
+        'inputs': {'type': 'object'},
+        'displayName': {'type': 'string'},
+        'condition': {'type': 'string'},
+        'script': {'type': 'string'},
+        'publish': {'type': 'string'},
+        'artifact': {'type': 'string'},
+        'enabled': {'type': 'boolean'},
+        'continueOnError': {'type': 'boolean'},
+        'timeoutInMinutes': {'type': 'integer'},
+    },
+}
+
+AZURE_PIPELINES = {
+    'type': 'object',
+    'required': ['strategy', 'pool', 'steps'],
+    'properties': {
+        'trigger': {'type': ['string', 'array', 'object', 'null']},
+        'strategy': {
+            'type': 'object',
+            'properties': {
+                'matrix': {
+                    'type': 'object',
+                    'minProperties': 1,
+                    'additionalProperties': {
+                        'type': 'object',
+                        'properties': {'imageName': {'type': 'string'}},
+                    },
+                },
+                'maxParallel': {'type': 'integer'},
+            },
+        },
+        'pool': {
+            'type': ['object', 'string'],
+            'properties': {'vmImage': {'type': 'string'},
+                           'name': {'type': 'string'}},
+        },
+        'variables': {
+            'type': ['object', 'array'],
+            'additionalProperties': {
+                'type': ['string', 'integer', 'number', 'boolean', 'null']},
+        },
+        'parameters': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'required': ['name'],
+                'properties': {
+                    'name': {'type': 'string', 'pattern': r'^[A-Za-z_]\w*$'},
+                    'displayName': {'type': 'string'},
+                    'type': {'enum': [
+                        'string', 'number', 'boolean', 'object', 'step',
+                        'stepList', 'job', 'jobList', 'deployment',
+                        'deploymentList', 'stage', 'stageList']},
+                    'values': {'type': 'array'},
+                },
+            },
+        },
+        'steps': {'type': 'array', 'minItems': 1, 'items': PIPELINE_STEP},
+        'jobs': {'type': 'array'},
+        'stages': {'type': 'array'},
+    },
+}
+
+STRING_LIST = {'type': 'array', 'items': {'type': 'string'}}
+
+RENOVATE = {
+    'type': 'object',
+    'requiredAny': ['extends', 'packageRules', 'schedule', 'timezone',
+                    'labels', 'assignees', 'reviewers'],
+    'properties': {
+        '$schema': {'type': 'string'},
+        'extends': STRING_LIST,
+        'packageRules': {'type': 'array',
+                         'items': {'type': 'object', 'minProperties': 1}},
+        'schedule': {'type': ['array', 'string'], 'items': {'type': 'string'}},
+        'timezone': {'type': 'string'},
+        'labels': STRING_LIST,
+        'assignees': STRING_LIST,
+        'reviewers': STRING_LIST,
+        'ignoreDeps': STRING_LIST,
+        'enabled': {'type': 'boolean'},
+        'automerge': {'type': 'boolean'},
+    },
+}
+
+SCHEMAS = {
+    'pubspec': PUBSPEC,
+    'azure_pipelines': AZURE_PIPELINES,
+    'renovate': RENOVATE,
+}
+
+
+# Registered schema name -> schema_key, hashed once per process.
+_keys = {}
+
+
+def get_validator(name):
+    """Return the compiled validator for the registered schema ``name``."""
+    key = _keys.get(name)
+    if key is None:
+        key = _keys[name] = schema_key(SCHEMAS[name])
+    return compile_schema(SCHEMAS[name], key)
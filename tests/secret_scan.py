@@ -0,0 +1,341 @@
+"""
+Secret scanner for tracked text files.
+Usage: python -m tests.secret_scan [--format json] [--update-baseline]
+
+All keywords and token signatures are compiled into one trie-shaped
+regular expression, so each chunk is matched in a single linear sweep
+no matter how many patterns there are. Lines that hit are then checked
+by the detector that owns the keyword.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter, namedtuple
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).parent.parent
+BASELINE_NAME = '.secrets-baseline.json'
+CHUNK_SIZE = 64 * 1024
+# Longer lines are scanned in pieces of this size.
+MAX_LINE_BYTES = 64 * 1024
+
+ALLOW_PRAGMAS = (b'secret-scan: allow', b'pragma: allowlist secret')
+
+# Files where unquoted values are literal data rather than identifiers.
+CONFIG_SUFFIXES = frozenset((
+    '.yml', '.yaml', '.json', '.properties', '.env', '.ini', '.cfg',
+    '.conf', '.toml', '.xcconfig', '.plist', '.xml', '.lock',
+))
+
+SecretFinding = namedtuple(
+    'SecretFinding', 'rule path line column preview fingerprint')
+
+
+# Keywords that introduce a key=value assignment worth inspecting.
+ASSIGNMENT_KEYWORDS = (
+    b'password', b'passwd', b'secret', b'token', b'api_key', b'api-key',
+    b'apikey', b'access_key', b'private_key', b'credential',
+)
+
+# Signature prefixes and the case-sensitive pattern that confirms them.
+SIGNATURES = {
+    b'-----begin': ('private-key', re.compile(
+        rb'-----BEGIN (?:[A-Z]+ )*PRIVATE KEY-----')),
+    b'akia': ('aws-access-key', re.compile(rb'\bAKIA[0-9A-Z]{16}\b')),
+    **{prefix: ('github-token',
+                re.compile(rb'\bgh[pousr]_[A-Za-z0-9]{36,}'))
+       for prefix in (b'ghp_', b'gho_', b'ghu_', b'ghs_', b'ghr_')},
+    b'xox': ('slack-token', re.compile(rb'\bxox[abposr]-[A-Za-z0-9-]{10,}')),
+    b'aiza': ('google-api-key', re.compile(rb'\bAIza[0-9A-Za-z_\-]{35}')),
+}
+
+# Assignments are found from the separator outwards: the value after
+# it, and a bounded key token before it, so lines of any length scan in
+# linear time.
+ASSIGNMENT = re.compile(
+    rb'(?::=|=>|[:=])\s*(?P<quote>["\']?)(?P<value>[^\s"\'`,;#)]*)')
+ASSIGNMENT_KEY = re.compile(
+    rb'(?:password|passwd|secret|token|api[_-]?key|access[_-]?key|'
+    rb'private[_-]?key|credential)', re.IGNORECASE)
+MAX_KEY_LENGTH = 64
+_KEY_BEFORE_SEPARATOR = re.compile(
+    rb'([\w.-]{1,%d})["\']?[ \t]{0,16}\Z' % MAX_KEY_LENGTH)
+
+PLACEHOLDER_MARKERS = (
+    b'${', b'{{', b'$(', b'<', b'%', b'your', b'example', b'changeme',
+    b'xxx', b'***', b'dummy', b'placeholder', b'redacted', b'secrets.',
+    b'env.', b'getenv', b'environ',
+)
+NON_SECRET_VALUES = frozenset((
+    b'true', b'false', b'null', b'none', b'nil', b'required', b'optional',
+))
+
+HIGH_ENTROPY_TOKEN = re.compile(rb'[A-Za-z0-9+/_-]{32,}={0,2}')
+MIN_TOKEN_ENTROPY = 4.5
+# Hashes and checksums are expected to look random.
+HASH_CONTEXT = re.compile(
+    rb'sha\d*|md5|hash|checksum|integrity|digest|revision|commit',
+    re.IGNORECASE)
+
+
+def _trie_regex(words):
+    """Compile literal ``words`` into a regex shaped like their trie.
+
+    Alternatives at each node start with distinct bytes, so matching
+    never backtracks across keywords and stays linear in the input.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for byte in word:
+            node = node.setdefault(bytes([byte]), {})
+        node[b''] = {}
+
+    def build(node):
+        if list(node) == [b'']:
+            return b''
+        optional = b'' in node
+        branches = [re.escape(char) + build(child)
+                    for char, child in sorted(node.items()) if char]
+        body = branches[0] if len(branches) == 1 \
+            else b'(?:' + b'|'.join(branches) + b')'
+        return b'(?:' + body + b')?' if optional else body
+
+    return re.compile(build(trie), re.IGNORECASE)
+
+
+KEYWORDS = _trie_regex(ASSIGNMENT_KEYWORDS + tuple(SIGNATURES))
+
+
+def shannon_entropy(data):
+    counts = Counter(data)
+    total = len(data)
+    return -sum(n / total * math.log2(n / total) for n in counts.values())
+
+
+def _fingerprint(rel_path, rule, secret):
+    digest = hashlib.sha256(rel_path.encode('utf-8'))
+    digest.update(b'\0' + rule.encode('ascii') + b'\0' + secret)
+    return digest.hexdigest()[:20]
+
+
+def _preview(secret):
+    text = secret.decode('utf-8', 'replace')
+    return text[:4] + '...' if len(text) > 4 else '...'
+
+
+def _is_placeholder(value):
+    lowered = value.lower()
+    if lowered in NON_SECRET_VALUES or len(set(lowered)) <= 2:
+        return True
+    return any(marker in lowered for marker in PLACEHOLDER_MARKERS)
+
+
+class SecretScanner:
+    """Streams a file once and reports likely secrets line by line."""
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def scan(self, chunks, rel_path='', config_like=False):
+        """Return the findings in ``chunks`` that are not allowlisted."""
+        findings = []
+        line_number = 1
+        # Column of the block's first byte when it continues a long line.
+        offset = 0
+        carry = b''
+        for chunk in chunks:
+            block = carry + bytes(chunk)
+            end = block.rfind(b'\n') + 1
+            if end == 0 and len(block) < MAX_LINE_BYTES:
+                carry = block
+                continue
+            if end == 0:
+                end = len(block)
+            line_number = self._scan_block(block[:end], line_number,
+                                           rel_path, config_like, findings,
+                                           offset)
+            offset = 0 if block[end - 1] == 0x0a else offset + end
+            carry = block[end:]
+        if carry:
+            self._scan_block(carry, line_number, rel_path, config_like,
+                             findings, offset)
+        return findings
+
+    def _scan_block(self, block, first_line, rel_path, config_like,
+                    findings, offset=0):
+        """Scan whole lines in ``block``; return the next line number.
+
+        ``offset`` is added to columns on the first line, which continues
+        a piece of a long line when it is non-zero.
+        """
+        hit_lines = {}
+        for match in KEYWORDS.finditer(block):
+            start = block.rfind(b'\n', 0, match.start()) + 1
+            hit_lines.setdefault(start, set()).add(match.group().lower())
+        for match in HIGH_ENTROPY_TOKEN.finditer(block):
+            start = block.rfind(b'\n', 0, match.start()) + 1
+            hit_lines.setdefault(start, set()).add(b'')
+
+        line_number = first_line
+        counted = 0
+        for start in sorted(hit_lines):
+            line_number += block.count(b'\n', counted, start)
+            counted = start
+            end = block.find(b'\n', start)
+            line = block[start:] if end == -1 else block[start:end]
+            if any(pragma in line for pragma in ALLOW_PRAGMAS):
+                continue
+            shift = offset if start == 0 else 0
+            for rule, column, secret in self._detect(
+                    line, hit_lines[start], config_like):
+                findings.append(SecretFinding(
+                    rule, rel_path, line_number, column + shift,
+                    _preview(secret),
+                    _fingerprint(rel_path, rule, secret)))
+        return first_line + block.count(b'\n')
+
+    def _detect(self, line, keywords, config_like):
+        reported = set()
+        for keyword in keywords:
+            if keyword in SIGNATURES:
+                rule, pattern = SIGNATURES[keyword]
+                for match in pattern.finditer(line):
+                    reported.add(match.span())
+                    yield rule, match.start() + 1, match.group()
+        if keywords - {b''} - set(SIGNATURES):
+            for match in ASSIGNMENT.finditer(line):
+                start = match.start()
+                key = _KEY_BEFORE_SEPARATOR.search(
+                    line, max(0, start - MAX_KEY_LENGTH - 17), start)
+                if key is None or not ASSIGNMENT_KEY.search(key.group(1)):
+                    continue
+                value = match.group('value')
+                if not match.group('quote') and not config_like:
+                    continue
+                if len(value) < 6 or _is_placeholder(value):
+                    continue
+                reported.add(match.span('value'))
+                yield 'secret-assignment', match.start('value') + 1, value
+        if b'' in keywords and not HASH_CONTEXT.search(line):
+            for match in HIGH_ENTROPY_TOKEN.finditer(line):
+                token = match.group()
+                if any(start <= match.start() < end
+                       for start, end in reported):
+                    continue
+                if not (re.search(rb'[a-z]', token) and
+                        re.search(rb'[A-Z]', token) and
+                        re.search(rb'[0-9]', token)):
+                    continue
+                if shannon_entropy(token) >= MIN_TOKEN_ENTROPY:
+                    yield 'high-entropy-string', match.start() + 1, token
+
+
+def is_binary(first_chunk):
+    return b'\0' in first_chunk[:8192]
+
+
+class Baseline:
+    """Accepted findings, matched by fingerprint so line moves are fine."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.fingerprints = set()
+        if self.path.is_file():
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            self.fingerprints = {entry['fingerprint']
+                                 for entry in data.get('findings', [])}
+
+    def __contains__(self, finding):
+        return finding.fingerprint in self.fingerprints
+
+    def write(self, findings):
+        entries = [{'path': f.path, 'rule': f.rule, 'line': f.line,
+                    'fingerprint': f.fingerprint} for f in findings]
+        self.path.write_text(
+            json.dumps({'version': 1, 'findings': entries}, indent=2) + '\n',
+            encoding='utf-8')
+        self.fingerprints = {f.fingerprint for f in findings}
+
+
+_baselines = {}
+
+
+def baseline_path():
+    """Return the baseline file, overridable with
+    ``VALIDATION_SECRETS_BASELINE``."""
+    return Path(os.environ.get('VALIDATION_SECRETS_BASELINE',
+                               REPO_ROOT / BASELINE_NAME))
+
+
+def _get_baseline():
+    path = baseline_path()
+    if path not in _baselines:
+        _baselines[path] = Baseline(path)
+    return _baselines[path]
+
+
+def scan_document(document, use_baseline=True):
+    """Return the unaccepted secret findings in a cached document."""
+    chunks = document.chunks(CHUNK_SIZE)
+    first = next(chunks, b'')
+    if is_binary(bytes(first)):
+        return []
+    baseline = _get_baseline()
+    try:
+        rel_path = document.path.resolve().relative_to(
+            baseline.path.parent.resolve()).as_posix()
+    except ValueError:
+        rel_path = document.path.as_posix()
+    config_like = document.path.suffix.lower() in CONFIG_SUFFIXES or \
+        document.path.name.startswith('.env')
+
+    def all_chunks():
+        yield first
+        yield from chunks
+
+    findings = SecretScanner().scan(all_chunks(), rel_path, config_like)
+    if use_baseline:
+        findings = [f for f in findings if f not in baseline]
+    return findings
+
+
+def main(argv=None):
+    from tests.document_cache import get_document_cache
+    from tests.file_index import get_file_index
+
+    parser = argparse.ArgumentParser(
+        prog='python -m tests.secret_scan',
+        description='Scan tracked text files for hardcoded secrets.')
+    parser.add_argument('--format', choices=('text', 'json'),
+                        default='text')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help=f'accept all current findings into '
+                             f'{BASELINE_NAME}')
+    args = parser.parse_args(argv)
+
+    documents = get_document_cache()
+    findings = []
+    for path in get_file_index().files():
+        findings += scan_document(documents.get(path),
+                                  use_baseline=not args.update_baseline)
+    if args.update_baseline:
+        _get_baseline().write(findings)
+        print(f"Recorded {len(findings)} finding(s) in {baseline_path()}")
+        return 0
+    if args.format == 'json':
+        print(json.dumps([f._asdict() for f in findings], indent=2))
+    else:
+        for f in findings:
+            print(f"{f.path}:{f.line}:{f.column}: {f.rule} ({f.preview})")
+    return 1 if findings else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
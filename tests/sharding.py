@@ -0,0 +1,356 @@
+"""
+Deterministic sharding of the validation workload across CI nodes.
+Usage: python -m tests.validate --shard 2/4 --format json > shard-2.json
+       python -m tests.validate --merge shard-*.json
+       python -m tests.sharding --local 4
+
+Every node computes the same plan from the checkout: each file matched
+by a per-file rule is a unit weighted by its size (plus a fixed per-file
+cost) times the number of rules reading it. Sizes are those of the
+staged git blobs, or of the content with CRLF read as LF for untracked
+files, so checkouts with different line endings agree; each cross-file
+rule, and each rule that matches nothing, is a unit of its own. Units
+are handed out largest first to the least-loaded shard, ties broken by
+path, so shards finish at about the same time and every node agrees on
+the owner of every unit. The plan fingerprint in each shard report lets the
+merge step refuse reports computed from different trees.
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from tests.file_index import REPO_ROOT
+from tests.git_source import BLOB_MODES, GitError, _git
+from tests.instrumentation import span
+from tests.validate import (
+    RULES, RULES_BY_ID, CrossFileRule, RuleResult, ValidationEngine)
+
+
+# Fixed cost of checking one file, in bytes of content it is worth.
+FILE_OVERHEAD = 4096
+# Merged status of a rule: the first one any shard reported.
+STATUS_ORDER = ('failed', 'warned', 'passed', 'skipped')
+
+Shard = namedtuple('Shard', 'index count')
+
+
+class ShardError(ValueError):
+    """Raised for bad shard specs and inconsistent shard reports."""
+
+
+def parse_shard(text):
+    """Parse ``'i/N'`` (1-based) into a :class:`Shard`."""
+    try:
+        index, total = (int(part) for part in str(text).split('/'))
+    except ValueError:
+        raise ShardError(f"shard must look like i/N, got {text!r}") from None
+    if not 1 <= index <= total:
+        raise ShardError(f"shard {index}/{total} is out of range")
+    return Shard(index, total)
+
+
+def _rule_unit(rule):
+    return f'rule:{rule.id}'
+
+
+def blob_sizes(root):
+    """Return ``{path relative to root: size}`` of the blobs staged under
+    ``root``, or an empty dict outside a git work tree.
+
+    Blobs hold the content as committed, whatever ``core.autocrlf``
+    did to the working tree of this checkout.
+    """
+    try:
+        listing = _git(root, 'ls-files', '-s', '-z')
+    except (GitError, OSError):
+        return {}
+    object_ids = {}
+    for record in listing.split(b'\0'):
+        if record:
+            info, rel_path = record.split(b'\t', 1)
+            mode, object_id, stage = info.decode('ascii').split()
+            if mode in BLOB_MODES and stage == '0':
+                object_ids[rel_path.decode('utf-8')] = object_id
+    if not object_ids:
+        return {}
+    request = ''.join(f'{oid}\n' for oid in object_ids.values())
+    try:
+        output = subprocess.run(
+            ['git', 'cat-file', '--batch-check'], cwd=root, check=True,
+            input=request.encode('ascii'), capture_output=True).stdout
+    except (subprocess.CalledProcessError, OSError):
+        return {}
+    sizes = {}
+    replies = output.decode('ascii').splitlines()
+    for rel_path, reply in zip(object_ids, replies):
+        fields = reply.split()
+        if len(fields) == 3:  # '<oid> missing' otherwise
+            sizes[rel_path] = int(fields[2])
+    return sizes
+
+
+def normalized_size(path):
+    """Return the size of ``path`` with CRLF line endings counted as LF."""
+    data = Path(path).read_bytes()
+    return len(data) - data.count(b'\r\n')
+
+
+class ShardPlan:
+    """Assignment of work units to ``count`` shards."""
+
+    def __init__(self, weights, count):
+        self.count = count
+        self.weights = dict(weights)
+        self.loads = [0] * count
+        self._owners = {}
+        heap = [(0, shard) for shard in range(count)]
+        for key in sorted(self.weights, key=lambda k: (-self.weights[k], k)):
+            load, shard = heapq.heappop(heap)
+            self._owners[key] = shard + 1
+            self.loads[shard] = load + self.weights[key]
+            heapq.heappush(heap, (self.loads[shard], shard))
+
+    @classmethod
+    def build(cls, engine, rules, count):
+        """Plan the work ``rules`` would do over ``engine``'s tree."""
+        with span('shard', 'plan', shards=count):
+            weights = {}
+            sizes = {}
+            blobs = blob_sizes(engine.root)
+            for rule in rules:
+                selected = rule.select(engine.index)
+                for path in selected:
+                    if path not in sizes:
+                        size = blobs.get(engine.unit_key(path))
+                        if size is None:
+                            size = normalized_size(path)
+                        sizes[path] = size + FILE_OVERHEAD
+                if isinstance(rule, CrossFileRule) or not selected:
+                    weights[_rule_unit(rule)] = FILE_OVERHEAD + sum(
+                        sizes[path] for path in selected)
+                    continue
+                for path in selected:
+                    key = engine.unit_key(path)
+                    weights[key] = weights.get(key, 0) + sizes[path]
+        return cls(weights, count)
+
+    def owner(self, key):
+        return self._owners[key]
+
+    @property
+    def fingerprint(self):
+        digest = hashlib.sha256(str(self.count).encode())
+        for key in sorted(self._owners):
+            digest.update(f'{key}\0{self.weights[key]}\0'
+                          f'{self._owners[key]}\n'.encode())
+        return digest.hexdigest()[:16]
+
+
+class ShardEngine(ValidationEngine):
+    """Runs only the part of the workload ``shard`` owns."""
+
+    def __init__(self, root, shard, rules=None):
+        super().__init__(root)
+        self.shard = shard
+        self.rules = RULES if rules is None else rules
+        self._plan = None
+        # Per rule id: every file the rule selects, and the shard's part.
+        self._selected = {}
+        self._owned = {}
+
+    @property
+    def plan(self):
+        if self._plan is None:
+            self._plan = ShardPlan.build(self, self.rules, self.shard.count)
+        return self._plan
+
+    def unit_key(self, path):
+        return path.relative_to(self.root).as_posix()
+
+    def _rule_level(self, rule, selected):
+        return isinstance(rule, CrossFileRule) or not selected
+
+    def _select(self, rule):
+        selected = self._selected.get(rule.id)
+        if selected is None:
+            selected = self._selected[rule.id] = super().targets(rule)
+        return selected
+
+    def targets(self, rule):
+        owned = self._owned.get(rule.id)
+        if owned is None:
+            selected = self._select(rule)
+            if self._rule_level(rule, selected):
+                owned = selected
+            else:
+                owned = [path for path in selected
+                         if self.plan.owner(self.unit_key(path)) ==
+                         self.shard.index]
+            self._owned[rule.id] = owned
+        return owned
+
+    def owner(self, rule):
+        """Return the shard running ``rule``, or None if it is split."""
+        selected = self._select(rule)
+        if self._rule_level(rule, selected):
+            return self.plan.owner(_rule_unit(rule))
+        return None
+
+    def owns(self, rule):
+        owner = self.owner(rule)
+        if owner is not None:
+            return owner == self.shard.index
+        return bool(self.targets(rule))
+
+    def run_rule(self, rule):
+        if isinstance(rule, str):
+            rule = RULES_BY_ID[rule]
+        if not self.owns(rule):
+            return RuleResult(rule, 'skipped',
+                              reason=f"not in shard {self.shard.index}/"
+                                     f"{self.shard.count}")
+        return super().run_rule(rule)
+
+    def run(self, rule_ids=None):
+        rules = self.rules if rule_ids is None else \
+            [RULES_BY_ID[rule_id] for rule_id in rule_ids]
+        return [self.run_rule(rule) for rule in rules if self.owns(rule)]
+
+    def describe(self, seconds):
+        """Return the ``shard`` section of this shard's JSON report."""
+        return {'index': self.shard.index, 'count': self.shard.count,
+                'fingerprint': self.plan.fingerprint,
+                'weight': self.plan.loads[self.shard.index - 1],
+                'seconds': round(seconds, 3)}
+
+
+def merge_reports(reports):
+    """Combine per-shard JSON reports into one report.
+
+    Raises ShardError if shards are missing, duplicated, or were planned
+    from different trees.
+    """
+    if not reports:
+        raise ShardError("no shard reports to merge")
+    shards = [report.get('shard') for report in reports]
+    if any(shard is None for shard in shards):
+        raise ShardError("not a shard report (no 'shard' section)")
+    counts = {shard['count'] for shard in shards}
+    fingerprints = {shard['fingerprint'] for shard in shards}
+    if len(counts) > 1 or len(fingerprints) > 1:
+        raise ShardError("shard reports come from different plans: "
+                         f"counts {sorted(counts)}, "
+                         f"fingerprints {sorted(fingerprints)}")
+    total = counts.pop()
+    indexes = sorted(shard['index'] for shard in shards)
+    duplicated = sorted({i for i in indexes if indexes.count(i) > 1})
+    missing = sorted(set(range(1, total + 1)) - set(indexes))
+    if duplicated or missing:
+        problems = []
+        if missing:
+            problems.append('missing ' + ', '.join(
+                f'{i}/{total}' for i in missing))
+        if duplicated:
+            problems.append('duplicate ' + ', '.join(
+                f'{i}/{total}' for i in duplicated))
+        raise ShardError(f"incomplete shard set: {'; '.join(problems)}")
+
+    order = {rule.id: position for position, rule in enumerate(RULES)}
+    merged = {}
+    for report in sorted(reports, key=lambda r: r['shard']['index']):
+        for rule in report['rules']:
+            current = merged.get(rule['rule'])
+            if current is None:
+                merged[rule['rule']] = dict(
+                    rule, findings=list(rule['findings']),
+                    checked=list(rule.get('checked', ())))
+                continue
+            current['files'] += rule['files']
+            current['findings'] += rule['findings']
+            current['checked'] += rule.get('checked', ())
+            if STATUS_ORDER.index(rule['status']) < \
+                    STATUS_ORDER.index(current['status']):
+                current['status'] = rule['status']
+                current.pop('reason', None)
+    rules = sorted(merged.values(),
+                   key=lambda rule: order.get(rule['rule'], len(order)))
+    for rule in rules:
+        rule['findings'].sort(key=lambda finding: finding['path'])
+        rule['checked'].sort()
+    return {
+        'ok': not any(rule['status'] == 'failed' for rule in rules),
+        'root': reports[0].get('root'),
+        'rules': rules,
+        'shards': {'count': total, 'fingerprint': fingerprints.pop(),
+                   'weights': [shard['weight'] for shard in
+                               sorted(shards, key=lambda s: s['index'])],
+                   'seconds': [shard['seconds'] for shard in
+                               sorted(shards, key=lambda s: s['index'])]},
+    }
+
+
+def run_local(total, root=REPO_ROOT, extra_args=(), out_dir=None):
+    """Run ``total`` shard processes side by side; return their reports."""
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(out_dir or tmp)
+        processes = []
+        for index in range(1, total + 1):
+            output = out_dir / f'shard-{index}-of-{total}.json'
+            with open(output, 'w') as f:
+                processes.append((output, subprocess.Popen(
+                    [sys.executable, '-m', 'tests.validate', '--root',
+                     str(root), '--format', 'json',
+                     '--shard', f'{index}/{total}', *extra_args],
+                    stdout=f, cwd=REPO_ROOT)))
+        reports = []
+        for output, process in processes:
+            if process.wait() not in (0, 1):
+                raise ShardError(f"{output.name}: exited with "
+                                 f"{process.returncode}")
+            reports.append(json.loads(output.read_text(encoding='utf-8')))
+        return reports
+
+
+def main(argv=None, out=None):
+    out = out or sys.stdout
+    parser = argparse.ArgumentParser(
+        prog='python -m tests.sharding',
+        description='Run every shard locally and merge the results.')
+    parser.add_argument('--local', type=int, required=True, metavar='N',
+                        help='number of shard processes to run')
+    parser.add_argument('--root', default=str(REPO_ROOT))
+    parser.add_argument('--keep', metavar='DIR',
+                        help='write the shard reports to DIR')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        reports = run_local(args.local, args.root, out_dir=args.keep)
+        merged = merge_reports(reports)
+    except ShardError as e:
+        print(f"shard: {e}", file=sys.stderr)
+        return 2
+    shards = merged['shards']
+    for index, (weight, seconds) in enumerate(
+            zip(shards['weights'], shards['seconds']), 1):
+        print(f"shard {index}/{shards['count']}: {weight // 1024} KB "
+              f"planned, {seconds:.3f} s", file=out)
+    failed = [rule['rule'] for rule in merged['rules']
+              if rule['status'] == 'failed']
+    print(f"{len(merged['rules'])} rules, {len(failed)} failed "
+          f"({time.perf_counter() - start:.2f} s wall)", file=out)
+    for rule_id in failed:
+        print(f"FAILED  {rule_id}", file=out)
+    return 0 if merged['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Tests for the synthetic repository generator and the benchmark suite.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.benchmarks.suite import (
+    check_budget, check_regression, measure_repository, run_incremental)
+from tests.benchmarks.synthetic_repo import RepoSpec, generate_repo
+from tests.file_index import FileIndex
+
+
+def run_entry(wall, spec=None, **metrics):
+    entry = {'spec': spec or {'files': 1}, 'python': '3', 'walks': 1,
+             'bytes_read': 1000, 'peak_rss_kb': 20000, 'wall_seconds': wall}
+    entry.update(metrics)
+    return entry
+
+
+class TestSyntheticRepository(unittest.TestCase):
+    """Validate the generated fixture and the measurements taken on it."""
+
+    def test_generated_repository_validates_in_one_walk(self):
+        """Ensure the fixture passes and ignored trees are never read."""
+        with tempfile.TemporaryDirectory() as tmp:
+            spec = RepoSpec(files=20, depth=3, file_size=512,
+                            ignored_files=40)
+            written = generate_repo(tmp, spec)
+            index = FileIndex(tmp)
+            self.assertEqual(len(index.files('.dart')), 4)
+            self.assertFalse(any('.dart_tool' in path.parts
+                                 for path in index.files()))
+
+            report = measure_repository(Path(tmp))
+            self.assertEqual(report['failed_rules'], [])
+            self.assertEqual(report['walks'], 1)
+            # Streamed scans and parses may read a file twice, but
+            # nothing under the ignored trees is read at all.
+            ignored = sum(path.stat().st_size
+                          for path in Path(tmp).rglob('*')
+                          if path.is_file()) - written
+            self.assertLess(report['bytes_read'], 2 * written)
+            self.assertLess(report['bytes_read'], ignored)
+            self.assertEqual(report['rules']['yaml.valid']['status'],
+                             'passed')
+
+    def test_incremental_rerun_skips_unchanged_files(self):
+        """Ensure a re-run reads far less than the files it validates."""
+        with tempfile.TemporaryDirectory() as tmp:
+            written = generate_repo(tmp, RepoSpec(files=20, depth=3,
+                                                  file_size=512,
+                                                  ignored_files=0))
+            report = run_incremental(tmp)
+            self.assertEqual(report['incremental_failed_rules'], [])
+            # Only the few inputs of cross-file rules are parsed again.
+            self.assertLess(report['incremental_bytes_read'], written / 4)
+
+
+class TestRegressionCheck(unittest.TestCase):
+    """Validate comparison of a run against the recorded history."""
+
+    def test_no_history_never_regresses(self):
+        """Ensure the first run of a shape is accepted."""
+        self.assertEqual(check_regression([], run_entry(10.0)), [])
+
+    def test_slowdown_beyond_threshold_against_median(self):
+        """Ensure one noisy outlier in history does not move the baseline."""
+        history = [run_entry(1.0), run_entry(0.1), run_entry(1.0)]
+        self.assertEqual(check_regression(history, run_entry(1.2)), [])
+        messages = check_regression(history, run_entry(1.3))
+        self.assertEqual(len(messages), 1)
+        self.assertTrue(messages[0].startswith('wall_seconds'))
+        self.assertTrue(check_regression(history,
+                                         run_entry(1.0, walks=2)))
+
+    def test_only_comparable_runs_are_used(self):
+        """Ensure runs of a different repository shape are ignored."""
+        history = [run_entry(0.1, spec={'files': 5})]
+        self.assertEqual(check_regression(history, run_entry(1.0)), [])
+
+    def test_metrics_missing_from_older_runs_are_skipped(self):
+        """Ensure history recorded before a metric existed still loads."""
+        history = [run_entry(1.0)]
+        entry = run_entry(1.0, incremental_seconds=0.05)
+        self.assertEqual(check_regression(history, entry), [])
+        self.assertEqual(check_budget(entry), [])
+        self.assertEqual(len(check_budget(dict(entry,
+                                               incremental_seconds=0.2))), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
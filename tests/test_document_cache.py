@@ -0,0 +1,94 @@
+"""
+Tests for the parse-once document cache.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.document_cache import DocumentCache
+
+
+class TestDocumentCache(unittest.TestCase):
+    """Validate reuse, invalidation and eviction of cached documents."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = self.root / name
+        path.write_text(content, encoding='utf-8')
+        return path
+
+    def test_reads_and_parses_once(self):
+        """Ensure repeated lookups reuse bytes, text and parse tree."""
+        path = self.write('a.json', json.dumps({'key': 'value'}))
+        cache = DocumentCache()
+        first = cache.get(path)
+        second = cache.get(path)
+        self.assertIs(first, second)
+        self.assertIs(first.parsed, second.parsed)
+        self.assertEqual(first.parsed, {'key': 'value'})
+        self.assertEqual(cache.reads, 1)
+
+    def test_identical_content_shares_parse_tree(self):
+        """Ensure documents are content-addressed for parsing."""
+        first = self.write('a.json', '[1, 2]')
+        second = self.write('b.json', '[1, 2]')
+        cache = DocumentCache()
+        self.assertIs(cache.get(first).parsed, cache.get(second).parsed)
+
+    def test_changed_file_is_reloaded(self):
+        """Ensure a new mtime or size invalidates the entry."""
+        path = self.write('a.json', '{"a": 1}')
+        cache = DocumentCache()
+        self.assertEqual(cache.get(path).parsed, {'a': 1})
+        self.write('a.json', '{"a": 22}')
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertEqual(cache.get(path).parsed, {'a': 22})
+        self.assertEqual(cache.reads, 2)
+        self.assertEqual(cache.total_bytes, path.stat().st_size)
+
+    def test_parse_errors_are_cached(self):
+        """Ensure invalid documents raise on every access."""
+        path = self.write('bad.json', '{')
+        document = DocumentCache().get(path)
+        for _ in range(2):
+            with self.assertRaises(json.JSONDecodeError):
+                _ = document.parsed
+
+    def test_evicts_least_recently_used(self):
+        """Ensure total cached bytes stay below the cap."""
+        paths = [self.write(f'{name}.json', '"0123456789"')
+                 for name in 'abc']
+        cache = DocumentCache(max_bytes=25)
+        for path in [paths[0], paths[1], paths[0], paths[2]]:
+            _ = cache.get(path).data
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.total_bytes, 25)
+        reads = cache.reads
+        _ = cache.get(paths[0]).data
+        self.assertEqual(cache.reads, reads)
+        _ = cache.get(paths[1]).data
+        self.assertEqual(cache.reads, reads + 1)
+
+    def test_chunks_stream_without_loading(self):
+        """Ensure streaming a document does not pull it into memory."""
+        path = self.write('a.yml', 'x' * 100)
+        cache = DocumentCache()
+        document = cache.get(path)
+        chunks = [bytes(chunk) for chunk in document.chunks(chunk_size=30)]
+        self.assertEqual([len(chunk) for chunk in chunks], [30, 30, 30, 10])
+        self.assertEqual(cache.reads, 0)
+        self.assertEqual(document.size, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
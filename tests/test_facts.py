@@ -0,0 +1,231 @@
+"""
+Tests for the extracted-facts index and the cross-file consistency rules.
+"""
+
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tests import incremental
+from tests.document_cache import DocumentCache
+from tests.facts import (
+    DEPENDENCY, EXTRACTORS, LOCKED, SDK_LOCKED, TOOLCHAIN, WORKFLOW_JOB,
+    FactsIndex, Version, VersionRange)
+from tests.file_index import reset_file_index
+from tests.validate import ValidationEngine
+
+
+WORKFLOW = """\
+jobs:
+  build:
+    env:
+      FLUTTER_VERSION: {flutter}
+    steps:
+      - uses: actions/setup-java@v4
+        with:
+          java-version: '17'
+      - uses: subosito/flutter-action@v2
+        with:
+          flutter-version: ${{{{ env.FLUTTER_VERSION }}}}
+"""
+
+PUBSPEC = """\
+name: app
+environment:
+  sdk: '>=3.0.0 <4.0.0'
+dependencies:
+  flutter:
+    sdk: flutter
+  http: ^1.2.0
+  local:
+    path: ../local
+"""
+
+LOCK = """\
+packages:
+  http:
+    dependency: "direct main"
+    source: hosted
+    version: "{http}"
+sdks:
+  dart: "{dart}"
+  flutter: ">=3.18.0-18.0.pre.54"
+"""
+
+
+class TestVersions(unittest.TestCase):
+    """Validate pub version and constraint semantics."""
+
+    def test_version_order(self):
+        """Ensure pre-releases sort before releases, numerically."""
+        ordered = ['3.18.0-18.0.pre.9', '3.18.0-18.0.pre.54', '3.18.0',
+                   '3.18.1', '3.38.3']
+        self.assertEqual(sorted(ordered, key=Version), ordered)
+        self.assertEqual(Version('17'), Version('17.0.0'))
+
+    def test_constraints(self):
+        """Ensure caret, exact and bounded constraints match pub."""
+        self.assertTrue(VersionRange('^1.2.0').allows(Version('1.9.0')))
+        self.assertFalse(VersionRange('^1.2.0').allows(Version('2.0.0')))
+        self.assertFalse(VersionRange('^0.2.3').allows(Version('0.3.0')))
+        self.assertTrue(VersionRange('1.6.0').allows(Version('1.6.0')))
+        self.assertFalse(VersionRange('>=3.0.0 <4.0.0').allows(
+            Version('4.0.0')))
+        self.assertTrue(VersionRange('any').allows(Version('0.0.1')))
+        self.assertTrue(VersionRange('>=3.8.0 <4.0.0').within(
+            VersionRange('>=3.0.0 <4.0.0')))
+        self.assertFalse(VersionRange('>=2.19.0 <4.0.0').within(
+            VersionRange('>=3.0.0 <4.0.0')))
+        with self.assertRaises(ValueError):
+            VersionRange('>=3.0.0 oops')
+
+
+class TestFactsIndex(unittest.TestCase):
+    """Validate extraction and the cross-file rules over a fixture tree."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name).resolve()
+        self.write('.tool-versions', 'flutter 3.38.3\njava 17 # LTS\n')
+        self.write('.github/workflows/ci.yml', WORKFLOW.format(
+            flutter='3.38.3'))
+        self.write('pubspec.yaml', PUBSPEC)
+        self.write('pubspec.lock', LOCK.format(http='1.6.0',
+                                               dart='>=3.8.0 <4.0.0'))
+        reset_file_index()
+        self.addCleanup(reset_file_index)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(textwrap.dedent(content), encoding='utf-8')
+
+    def build(self):
+        paths = sorted(path for path in self.root.rglob('*')
+                       if path.is_file())
+        return FactsIndex.build(self.root, DocumentCache(), paths)
+
+    def findings(self, rule_id):
+        result = ValidationEngine(self.root).run_rule(rule_id)
+        return result.status, [message for _, message in result.findings]
+
+    def test_extracts_typed_facts(self):
+        """Ensure each file contributes its facts, expressions skipped."""
+        index = self.build()
+        self.assertEqual(
+            sorted((index.relative(f.path), f.value)
+                   for f in index.get(TOOLCHAIN, 'flutter')),
+            [('.github/workflows/ci.yml', '3.38.3'),
+             ('.tool-versions', '3.38.3')])
+        self.assertEqual([f.value for f in index.get(TOOLCHAIN, 'java')],
+                         ['17', '17'])
+        self.assertEqual(index.keys(DEPENDENCY), ['http'])
+        self.assertEqual(index.first(LOCKED, 'http').value, '1.6.0')
+        self.assertEqual(index.keys(SDK_LOCKED), ['dart', 'flutter'])
+        self.assertEqual(index.first(WORKFLOW_JOB, 'build').value, 'build')
+
+    def test_facts_reuse_the_cached_parse(self):
+        """Ensure rebuilding the index neither reads nor parses again."""
+        documents = DocumentCache()
+        paths = sorted(path for path in self.root.rglob('*')
+                       if path.is_file())
+        first = FactsIndex.build(self.root, documents, paths)
+        reads = documents.reads
+        second = FactsIndex.build(self.root, documents, paths)
+        self.assertEqual(documents.reads, reads)
+        self.assertEqual(sorted(first), sorted(second))
+
+    def test_consistent_tree_passes(self):
+        """Ensure agreeing files pass every consistency rule."""
+        for rule_id in ('consistency.toolchain_versions',
+                        'consistency.sdk_constraints',
+                        'consistency.dependency_pins'):
+            self.assertEqual(self.findings(rule_id), ('passed', []))
+
+    def test_toolchain_drift_is_a_warning(self):
+        """Ensure a CI pin that drifted from .tool-versions is reported."""
+        self.write('.github/workflows/ci.yml', WORKFLOW.format(
+            flutter='3.35.2'))
+        status, messages = self.findings('consistency.toolchain_versions')
+        self.assertEqual(status, 'warned')
+        self.assertIn('.github/workflows/ci.yml: flutter 3.35.2 disagrees '
+                      'with 3.38.3 in .tool-versions', messages)
+
+    def test_stale_lock_fails(self):
+        """Ensure lock files outside the pubspec constraints fail."""
+        self.write('pubspec.lock', LOCK.format(http='2.0.0',
+                                               dart='>=2.19.0 <4.0.0'))
+        status, messages = self.findings('consistency.dependency_pins')
+        self.assertEqual(status, 'failed')
+        self.assertEqual(messages, [
+            'pubspec.yaml: http ^1.2.0 does not allow 2.0.0 locked in '
+            'pubspec.lock'])
+        status, messages = self.findings('consistency.sdk_constraints')
+        self.assertEqual(status, 'failed')
+        self.assertIn('outside the environment constraint', messages[0])
+
+    def test_duplicate_job_names_fail(self):
+        """Ensure two workflows with one job name break the build."""
+        self.write('.github/workflows/release.yml', WORKFLOW.format(
+            flutter='3.38.3'))
+        status, messages = self.findings('consistency.workflow_job_names')
+        self.assertEqual(status, 'failed')
+        self.assertEqual(len(messages), 2)
+
+    def test_unparsable_files_are_reported(self):
+        """Ensure a file with no facts because it is broken fails."""
+        self.write('.github/workflows/ci.yml', 'jobs: [\n')
+        status, messages = self.findings('consistency.toolchain_versions')
+        self.assertEqual(status, 'warned')
+        self.assertEqual(len(messages), 1)
+        self.assertTrue(messages[0].startswith(
+            '.github/workflows/ci.yml: cannot extract github_workflow '
+            'facts: '), messages[0])
+
+    def test_extractor_bugs_propagate(self):
+        """Ensure a broken extractor fails the rule instead of passing."""
+        extractor, = [extractor for extractor in EXTRACTORS
+                      if extractor.name == 'github_workflow']
+        with mock.patch.object(extractor, 'func',
+                               side_effect=KeyError('jobs')):
+            with self.assertRaises(KeyError):
+                self.findings('consistency.toolchain_versions')
+
+    def test_idea_modules_resolve_against_the_validated_tree(self):
+        """Ensure a deleted .iml fails even when verdicts are cached."""
+        self.write('.idea/app.iml', '<module/>')
+        self.write('.idea/modules.xml', (
+            '<project><component><modules>'
+            '<module filepath="$PROJECT_DIR$/.idea/app.iml"/>'
+            '</modules></component></project>'))
+        env = {'VALIDATION_INCREMENTAL': '1',
+               'VALIDATION_CACHE_DIR': str(self.root / 'cache')}
+        with mock.patch.dict(os.environ, env), \
+                mock.patch.object(incremental, '_manifest', None):
+            self.assertEqual(self.findings('idea.modules_exist'),
+                             ('passed', []))
+            self.assertEqual(self.findings('idea.xml')[0], 'passed')
+            (self.root / '.idea/app.iml').unlink()
+            reset_file_index()
+            self.assertEqual(self.findings('idea.modules_exist'), (
+                'failed', ['.idea/modules.xml: module '
+                           '$PROJECT_DIR$/.idea/app.iml does not exist']))
+
+    def test_toolchain_must_satisfy_lock(self):
+        """Ensure pinned SDKs older than the lock file requires fail."""
+        self.write('.tool-versions', 'flutter 3.16.0\n')
+        self.write('.github/workflows/ci.yml', WORKFLOW.format(
+            flutter='3.16.0'))
+        status, messages = self.findings('consistency.sdk_constraints')
+        self.assertEqual(status, 'failed')
+        self.assertEqual(len(messages), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Tests for the shared repository file index.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.file_index import FileIndex, get_file_index
+
+
+class TestFileIndex(unittest.TestCase):
+    """Validate pruning and extension bucketing of the file index."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        for rel_path in ['pubspec.yaml', 'config.json', 'lib/main.dart',
+                         '.github/workflows/ci.yml', '.git/config.yml',
+                         'build/app.json', '.dart_tool/package.json',
+                         'ios/Pods/x.json', 'ios/Flutter/out/keep.yml',
+                         'android/local.properties']:
+            path = self.root / rel_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text('a: 1\n', encoding='utf-8')
+        (self.root / 'ios/.gitignore').write_text(
+            '**/Pods/\nout/\n!Flutter/out/\n', encoding='utf-8')
+        (self.root / 'android/.gitignore').write_text(
+            '/local.properties\n', encoding='utf-8')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def relative(self, paths):
+        return [path.relative_to(self.root).as_posix() for path in paths]
+
+    def test_buckets_by_extension(self):
+        """Ensure files are grouped by extension and sorted."""
+        index = FileIndex(self.root)
+        self.assertEqual(self.relative(index.files('.yml', '.yaml')),
+                         ['.github/workflows/ci.yml',
+                          'ios/Flutter/out/keep.yml', 'pubspec.yaml'])
+        self.assertEqual(self.relative(index.top_level('.json', '.yaml')),
+                         ['config.json', 'pubspec.yaml'])
+
+    def test_prunes_excluded_and_ignored_directories(self):
+        """Ensure default excludes and .gitignore rules are honored."""
+        index = FileIndex(self.root)
+        paths = self.relative(index.files())
+        for ignored in ['.git/config.yml', 'build/app.json',
+                        '.dart_tool/package.json', 'ios/Pods/x.json',
+                        'android/local.properties']:
+            self.assertNotIn(ignored, paths)
+        # '.github' must not be mistaken for '.git'.
+        self.assertIn('.github/workflows/ci.yml', paths)
+
+    def test_custom_exclude_list(self):
+        """Ensure a configured exclude list replaces the defaults."""
+        index = FileIndex(self.root, exclude=['lib'], use_gitignore=False)
+        paths = self.relative(index.files())
+        self.assertNotIn('lib/main.dart', paths)
+        self.assertIn('build/app.json', paths)
+        self.assertIn('android/local.properties', paths)
+
+    def test_session_index_is_built_once(self):
+        """Ensure repeated lookups reuse the same walk."""
+        before = FileIndex.walk_count
+        first = get_file_index(self.root)
+        second = get_file_index(self.root)
+        self.assertIs(first, second)
+        self.assertEqual(FileIndex.walk_count, before + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
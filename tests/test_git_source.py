@@ -0,0 +1,145 @@
+"""
+Tests for validating commits and staged content from the git object store.
+"""
+
+import io
+import json
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.git_source import (
+    GitError, GitSource, validate_revisions, validate_staged)
+from tests.validate import main
+
+
+def git(repo, *args):
+    return subprocess.run(
+        ['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+         *args], cwd=repo, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def commit(work, files, message):
+    for name, content in files.items():
+        path = work / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+    git(work, 'add', '-A')
+    git(work, 'commit', '-q', '-m', message)
+    return git(work, 'rev-parse', 'HEAD')
+
+
+def failed(results):
+    return sorted(r.rule.id for r in results if r.status == 'failed')
+
+
+class TestGitSource(unittest.TestCase):
+    """Validate revisions of a bare repository fixture."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        work = Path(cls.tmp.name) / 'work'
+        work.mkdir()
+        git(work, 'init', '-q')
+        cls.commits = [
+            commit(work, {'renovate.json': '{"extends": []}\n',
+                          'config/a.yml': 'a: 1\n',
+                          'config/b.yml': 'b: 2\n'}, 'initial'),
+            commit(work, {'config/b.yml': 'b: [\n'}, 'break b.yml'),
+            commit(work, {'config/b.yml': 'b: 3\n',
+                          'config/c.yml': 'a: 1\n'}, 'fix b.yml, add c.yml'),
+        ]
+        cls.bare = Path(cls.tmp.name) / 'repo.git'
+        git(cls.tmp.name, 'clone', '-q', '--bare', str(work), str(cls.bare))
+        cls.work = work
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_range_reports_each_commit(self):
+        """Ensure each commit of a range is validated from its own tree."""
+        with GitSource(self.bare) as source:
+            revisions = source.revisions(f'{self.commits[0]}..HEAD')
+            self.assertEqual(revisions, self.commits[1:])
+            results = dict(validate_revisions(
+                source, self.commits, ['yaml.valid', 'json.valid']))
+        self.assertEqual([failed(results[c]) for c in self.commits],
+                         [[], ['yaml.valid'], []])
+        broken = next(r for r in results[self.commits[1]]
+                      if r.rule.id == 'yaml.valid')
+        self.assertEqual([path.name for path, failures in broken.files
+                          if failures], ['b.yml'])
+
+    def test_unchanged_blobs_are_validated_once(self):
+        """Ensure verdicts are shared across commits by blob id."""
+        with GitSource(self.bare) as source:
+            process = source.store._batch_process()
+            validate_revisions(source, self.commits, ['yaml.valid'])
+            # a.yml once, b.yml in three versions, c.yml once.
+            self.assertEqual(source.evaluations, 5)
+            self.assertIs(source.store._batch_process(), process)
+
+    def test_missing_objects_raise(self):
+        """Ensure unknown revisions and objects are reported as errors."""
+        with GitSource(self.bare) as source:
+            with self.assertRaises(GitError):
+                source.tree('no-such-branch')
+            with self.assertRaises(GitError):
+                source.store.read('0' * 40)
+
+    def test_staged_content_is_validated(self):
+        """Ensure the index is read rather than the working copy."""
+        (self.work / 'config/a.yml').write_text('a: [\n', encoding='utf-8')
+        try:
+            with GitSource(self.work) as source:
+                self.assertEqual(
+                    failed(validate_staged(source, rule_ids=['yaml.valid'])),
+                    [])
+                git(self.work, 'add', 'config/a.yml')
+                self.assertEqual(
+                    failed(validate_staged(source, ['config/a.yml'],
+                                           ['yaml.valid'])),
+                    ['yaml.valid'])
+        finally:
+            git(self.work, 'reset', '-q', '--hard')
+
+    def test_module_references_use_the_revision_tree(self):
+        """Ensure modules.xml is checked against the commit, not the disk."""
+        with tempfile.TemporaryDirectory() as tmp:
+            work = Path(tmp)
+            git(work, 'init', '-q')
+            modules = ('<project><component><modules><module filepath='
+                       '"$PROJECT_DIR$/.idea/app.iml"/></modules>'
+                       '</component></project>')
+            first = commit(work, {'.idea/modules.xml': modules,
+                                  '.idea/app.iml': '<module/>'}, 'add')
+            git(work, 'rm', '-q', '.idea/app.iml')
+            git(work, 'commit', '-q', '-m', 'remove')
+            second = git(work, 'rev-parse', 'HEAD')
+            # Present on disk, but not in the validated revision.
+            (work / '.idea/app.iml').write_text('<module/>',
+                                                encoding='utf-8')
+            with GitSource(work) as source:
+                results = dict(validate_revisions(
+                    source, [first, second], ['idea.modules_exist']))
+        self.assertEqual([failed(results[c]) for c in (first, second)],
+                         [[], ['idea.modules_exist']])
+
+    def test_cli_range(self):
+        """Ensure the command line validates ranges and reports per commit."""
+        out = io.StringIO()
+        code = main(['--root', str(self.bare), '--format', 'json',
+                     '--range', f'{self.commits[0]}..HEAD',
+                     '--rule', 'yaml.valid'], out=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(code, 1)
+        self.assertEqual([(c['commit'], c['ok']) for c in report['commits']],
+                         [(self.commits[1], False), (self.commits[2], True)])
+
+
+if __name__ == '__main__':
+    unittest.main()
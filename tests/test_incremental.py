@@ -0,0 +1,127 @@
+"""
+Tests for incremental validation with a persisted verdict manifest.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.checks import FileCheck
+from tests.document_cache import get_document_cache
+from tests.incremental import Manifest
+
+
+class TestManifest(unittest.TestCase):
+    """Validate when cached verdicts are reused or recomputed."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.manifest_path = self.root / 'cache' / 'manifest.json'
+        self.file = self.root / 'a.yml'
+        self.write('a: 1\n')
+        self.calls = 0
+
+        def counting_check(document):
+            self.calls += 1
+            return [] if document.size < 10 else ['too big']
+
+        self.check = FileCheck('counting', counting_check)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, content, age=60):
+        self.file.write_text(content, encoding='utf-8')
+        # Backdate the file so its signature is not considered racy.
+        stamp = self.file.stat().st_mtime - age
+        os.utime(self.file, (stamp, stamp))
+
+    def run_check(self, fingerprint='v1', file_check=None):
+        file_check = file_check or self.check
+        manifest = Manifest(self.manifest_path, self.root, fingerprint)
+        failures = manifest.verdict(self.file, file_check)
+        if failures is None:
+            failures = file_check(get_document_cache().get(self.file))
+            manifest.record(self.file, file_check, failures)
+        manifest.save()
+        return failures
+
+    def test_unchanged_file_is_not_rechecked(self):
+        """Ensure a second run reuses the stored verdict."""
+        self.assertEqual(self.run_check(), [])
+        self.assertEqual(self.run_check(), [])
+        self.assertEqual(self.calls, 1)
+
+    def test_failures_are_persisted(self):
+        """Ensure cached failing verdicts are still reported."""
+        self.write('a: 1234567890\n')
+        self.assertEqual(self.run_check(), ['too big'])
+        self.assertEqual(self.run_check(), ['too big'])
+        self.assertEqual(self.calls, 1)
+
+    def test_changed_content_is_rechecked(self):
+        """Ensure a new content hash invalidates the verdicts."""
+        self.run_check()
+        self.write('a: 1234567890\n', age=30)
+        self.assertEqual(self.run_check(), ['too big'])
+        self.assertEqual(self.calls, 2)
+
+    def test_touched_but_identical_file_is_not_rechecked(self):
+        """Ensure an mtime change alone only costs a rehash."""
+        self.run_check()
+        self.write('a: 1\n', age=30)
+        self.run_check()
+        self.assertEqual(self.calls, 1)
+
+    def test_changed_check_definition_is_rechecked(self):
+        """Ensure editing a check invalidates only its verdicts."""
+        self.run_check()
+        changed = FileCheck('counting', lambda document: ['changed'])
+        self.assertEqual(self.run_check(file_check=changed), ['changed'])
+
+    def test_changed_validator_drops_manifest(self):
+        """Ensure a new validator fingerprint discards all verdicts."""
+        self.run_check(fingerprint='v1')
+        self.run_check(fingerprint='v2')
+        self.assertEqual(self.calls, 2)
+
+    def test_deleted_files_are_pruned(self):
+        """Ensure entries of deleted files are dropped, unseen ones kept."""
+        manifest = Manifest(self.manifest_path, self.root, 'v1')
+        for name in ('a.yml', 'b.yml', 'c.yml'):
+            path = self.root / name
+            path.write_text('x: 1\n', encoding='utf-8')
+            manifest.record(path, self.check, [])
+        manifest.save()
+        (self.root / 'b.yml').unlink()
+        manifest = Manifest(self.manifest_path, self.root, 'v1')
+        manifest.verdict(self.file, self.check)
+        manifest.save()
+        self.assertEqual(
+            sorted(Manifest(self.manifest_path, self.root, 'v1').files),
+            ['a.yml', 'c.yml'])
+
+
+class TestCheckFingerprints(unittest.TestCase):
+    """Validate that check fingerprints are stable across processes."""
+
+    def test_fingerprints_match_across_processes(self):
+        """Ensure fingerprints do not depend on addresses or hash seeds."""
+        script = ('from tests.checks import CHECKS\n'
+                  'for name in sorted(CHECKS):\n'
+                  '    print(name, CHECKS[name].fingerprint)\n')
+        runs = [subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True,
+            check=True, cwd=Path(__file__).parent.parent,
+            env=dict(os.environ, PYTHONHASHSEED=seed)).stdout
+            for seed in ('1', '2')]
+        self.assertIn('no_secrets', runs[0])
+        self.assertEqual(runs[0], runs[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Tests for the optional hot-path instrumentation.
+"""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tests import instrumentation
+from tests.checks import CHECKS, _evaluate
+from tests.document_cache import DocumentCache
+from tests.file_index import FileIndex
+from tests.instrumentation import Profiler
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Validate span and counter collection, reports and traces."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        (self.root / 'a.yml').write_text('key: value\n', encoding='utf-8')
+        (self.root / 'b.yml').write_text('key: value\n', encoding='utf-8')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_checks(self):
+        documents = DocumentCache()
+        FileIndex(self.root)
+        for path in sorted(self.root.glob('*.yml')):
+            _evaluate(CHECKS['yaml_valid'], path, documents)
+
+    def test_disabled_hooks_record_nothing(self):
+        """Ensure the hooks are inert while profiling is off."""
+        with mock.patch.object(instrumentation, '_profiler', None):
+            self.assertIs(instrumentation.span('check', 'x'),
+                          instrumentation._NULL_SPAN)
+            instrumentation.count('fs.stat')
+            self.run_checks()
+            self.assertIsNone(instrumentation.get_profiler())
+
+    def test_counts_and_timings(self):
+        """Ensure walks, stats, reads, parses and checks are recorded."""
+        profiler = Profiler()
+        with mock.patch.object(instrumentation, '_profiler', profiler):
+            self.run_checks()
+        self.assertEqual(profiler.counters['fs.stat'], 2)
+        self.assertEqual(profiler.counters['io.bytes_read'], 22)
+        # Identical contents share one parse tree.
+        self.assertEqual(profiler.counters['parse.calls'], 1)
+        self.assertEqual(profiler.counters['parse.cache_hits'], 1)
+        self.assertEqual(profiler.totals[('walk', str(self.root))][0], 1)
+        self.assertEqual(profiler.totals[('check', 'yaml_valid')][0], 2)
+        self.assertEqual(set(profiler.files),
+                         {self.root / 'a.yml', self.root / 'b.yml'})
+
+    def test_summary_ranks_slowest_first(self):
+        """Ensure the report lists the most expensive entries first."""
+        profiler = Profiler()
+        profiler.record('check', 'fast', 0.0, 0.001, {'path': 'x.yml'})
+        profiler.record('check', 'slow', 0.0, 0.5, {'path': 'y.yml'})
+        self.assertEqual([row[0] for row in profiler.slowest('check')],
+                         ['slow', 'fast'])
+        summary = profiler.summary()
+        self.assertIn('Slowest files:', summary)
+        self.assertLess(summary.index('y.yml'), summary.index('x.yml'))
+
+    def test_chrome_trace(self):
+        """Ensure the trace file holds complete events and counters."""
+        trace = self.root / 'trace.json'
+        profiler = Profiler(trace_path=trace)
+        with mock.patch.object(instrumentation, '_profiler', profiler):
+            self.run_checks()
+        profiler.write_trace()
+        events = json.loads(trace.read_text(encoding='utf-8'))['traceEvents']
+        spans = [e for e in events if e['ph'] == 'X']
+        self.assertTrue(spans)
+        self.assertTrue(all(e['dur'] >= 0 for e in spans))
+        self.assertIn('fs.stat', {e['name'] for e in events
+                                  if e['ph'] == 'C'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests for the single-pass streaming line scanner.
+"""
+
+import unittest
+
+from tests.line_scanner import LineScanner, SizeRule, TabRule
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestLineScanner(unittest.TestCase):
+    """Validate rule positions regardless of chunk boundaries."""
+
+    def positions(self, data, rule, chunk_size=3, **kwargs):
+        report = LineScanner(chunk_size=chunk_size, **kwargs).scan(
+            chunked(data, chunk_size))
+        return [(v.line, v.column) for v in report.by_rule(rule)]
+
+    def test_reports_every_violation_in_one_pass(self):
+        """Ensure all rules report all findings, not just the first."""
+        data = b'a:\tb\nc: d  \r\n\te: f\n'
+        report = LineScanner(chunk_size=4).scan(chunked(data, 4))
+        self.assertEqual(
+            [(v.rule, v.line, v.column) for v in report.violations],
+            [('tabs', 1, 3), ('trailing_whitespace', 2, 5),
+             ('crlf', 2, 7), ('tabs', 3, 1)])
+        self.assertEqual(report.lines, 3)
+        self.assertEqual(report.size, len(data))
+
+    def test_results_do_not_depend_on_chunk_size(self):
+        """Ensure lines split across chunks are handled correctly."""
+        data = b'key: value \t \nlist:\r\n  - \t item\n \nend'
+        expected = LineScanner(chunk_size=1024).scan([data]).violations
+        for chunk_size in range(1, 12):
+            with self.subTest(chunk_size=chunk_size):
+                report = LineScanner(chunk_size=chunk_size).scan(
+                    chunked(data, chunk_size))
+                self.assertEqual(report.violations, expected)
+
+    def test_invalid_utf8_positions(self):
+        """Ensure bad bytes are located even inside split sequences."""
+        data = 'ok: é\n'.encode('utf-8') + b'bad: \xff\xfe\nx: \xc3'
+        for chunk_size in (1, 2, 5, 64):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(
+                    self.positions(data, 'utf8', chunk_size=chunk_size),
+                    [(2, 6), (2, 7), (3, 4)])
+
+    def test_size_cap(self):
+        """Ensure the cap is reported once at the crossing byte."""
+        rules = [SizeRule(max_bytes=8)]
+        report = LineScanner(rules, chunk_size=3).scan(
+            chunked(b'abc\ndefgh\nijk\n', 3))
+        self.assertEqual([(v.line, v.column) for v in report.violations],
+                         [(2, 4)])
+
+    def test_violation_cap_counts_the_rest(self):
+        """Ensure huge violation counts stay bounded in memory."""
+        report = LineScanner([TabRule()], max_violations=2).scan(
+            [b'\t' * 10])
+        self.assertEqual(len(report.violations), 2)
+        self.assertEqual(report.suppressed, {'tabs': 8})
+        self.assertEqual(len(report.messages('tabs', 'f.yml')), 3)
+
+    def test_streams_long_lines(self):
+        """Ensure a generated multi-megabyte line scans chunk by chunk."""
+        chunks = (b'x' * 65536 for _ in range(64))
+        report = LineScanner([TabRule()]).scan(chunks)
+        self.assertEqual(report.size, 64 * 65536)
+        self.assertEqual(report.lines, 1)
+        self.assertEqual(report.violations, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+"""
+Tests for the indexed pubspec.lock package table.
+"""
+
+import io
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tests import lockfile
+from tests.document_cache import Document
+from tests.lockfile import (
+    DIRECT_DEV, LockedPackage, PackageTable, diff, load_lockfile, main,
+    scan_lock)
+
+
+REPO_ROOT = Path(__file__).parent.parent
+
+
+def lock_text(packages, sdks=None):
+    """Render ``{name: (version, source, kind)}`` as a pubspec.lock."""
+    lines = ['packages:']
+    for name, (version, source, kind) in sorted(packages.items()):
+        lines += [f'  {name}:', f'    dependency: "{kind}"',
+                  '    description:', f'      name: {name}',
+                  f'      sha256: "{version:0>8}"',
+                  '      url: "https://pub.dev"',
+                  f'    source: {source}', f'    version: "{version}"']
+    lines.append('sdks:')
+    for sdk, constraint in (sdks or {'dart': '>=3.8.0 <4.0.0'}).items():
+        lines.append(f'  {sdk}: "{constraint}"')
+    return '\n'.join(lines) + '\n'
+
+
+def table_for(packages):
+    return load_lockfile(Document('pubspec.lock',
+                                  data=lock_text(packages).encode()))
+
+
+class TestPackageTable(unittest.TestCase):
+    """Validate parsing, indexes, caching and diffs."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        env = mock.patch.dict(os.environ,
+                              {'VALIDATION_CACHE_DIR': self.tmp.name})
+        tables = mock.patch.dict(lockfile._tables, clear=True)
+        env.start()
+        tables.start()
+        self.addCleanup(env.stop)
+        self.addCleanup(tables.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_repository_lockfile(self):
+        """Ensure the repository lock file is indexed by every attribute."""
+        path = REPO_ROOT / 'pubspec.lock'
+        table = load_lockfile(Document(path))
+        self.assertEqual(table.get('http').source, 'hosted')
+        self.assertIn('gradient_input_border', table.non_hosted())
+        self.assertEqual(set(table.with_kind(DIRECT_DEV)),
+                         {'flutter_lints', 'flutter_test', 'test', 'yaml'})
+        self.assertEqual(sum(table.sources().values()), len(table))
+        self.assertIn('flutter', table.sdks)
+        self.assertEqual(table.unresolved(['http', 'nope']), ['nope'])
+        self.assertFalse(hasattr(table.get('http'), '__dict__'))
+
+    def test_scanner_matches_yaml(self):
+        """Ensure the line scanner reads pub's layout exactly like YAML."""
+        from tests.yaml_backend import load
+        text = (REPO_ROOT / 'pubspec.lock').read_text(encoding='utf-8')
+        scanned = PackageTable.from_lock(scan_lock(text))
+        parsed = PackageTable.from_lock(load(text))
+        self.assertEqual(scanned.rows(), parsed.rows())
+        self.assertEqual(scanned.sdks, parsed.sdks)
+
+    def test_unusual_layout_falls_back_to_yaml(self):
+        """Ensure hand-edited lock files are still read correctly."""
+        text = ('packages: {a: {dependency: transitive, source: hosted,\n'
+                '  version: "1.0.0", description: a}}\n'
+                'sdks: {dart: ">=3.0.0 <4.0.0"}\n')
+        with self.assertRaises(ValueError):
+            scan_lock(text)
+        table = PackageTable.from_text(text)
+        self.assertEqual(table.get('a').row(),
+                         ('a', '1.0.0', 'hosted', 'transitive', 'a', None))
+
+    def test_nulls_and_stray_quotes_fall_back_to_yaml(self):
+        """Ensure scalars YAML reads differently are not taken as text."""
+        for text in ('packages:\n  a: ~\n', 'packages: ~\n',
+                     'packages:\n  a:\n    version: null\n',
+                     'packages:\n  a:\n    version: "1"0"\n',
+                     "packages:\n  a:\n    version: '1'0'\n"):
+            with self.assertRaises(ValueError, msg=text):
+                scan_lock(text)
+        self.assertEqual(PackageTable.from_text('packages:\n  a: ~\n')
+                         .get('a').row(),
+                         ('a', '', 'hosted', 'transitive', None, None))
+        self.assertEqual(len(PackageTable.from_text('packages: ~\n')), 0)
+        self.assertEqual(PackageTable.from_lock({'packages': {'a': 'x'}})
+                         .get('a').version, '')
+        self.assertEqual(scan_lock("a: 'it''s'\n"), {'a': "it's"})
+        with self.assertRaises(ValueError):
+            PackageTable.from_lock({'packages': ['a']})
+
+    def test_table_is_cached_by_content(self):
+        """Ensure identical content is parsed once, even across processes."""
+        packages = {'a': ('1.0.0', 'hosted', 'direct main')}
+        first = table_for(packages)
+        self.assertIs(table_for(packages), first)
+        lockfile._tables.clear()
+        with mock.patch.object(PackageTable, 'from_lock',
+                               side_effect=AssertionError('reparsed')):
+            from_disk = table_for(packages)
+        self.assertEqual(from_disk.packages, first.packages)
+        self.assertEqual(from_disk.sdks, first.sdks)
+
+    def test_diff(self):
+        """Ensure added, removed and changed packages are reported."""
+        old = table_for({'a': ('1.0.0', 'hosted', 'direct main'),
+                         'b': ('2.0.0', 'hosted', 'transitive'),
+                         'c': ('1.0.0', 'hosted', 'transitive')})
+        new = table_for({'a': ('1.1.0', 'hosted', 'direct main'),
+                         'c': ('1.0.0', 'hosted', 'transitive'),
+                         'd': ('0.1.0', 'git', 'direct dev')})
+        changes = diff(old, new)
+        self.assertEqual([p.name for p in changes.added], ['d'])
+        self.assertEqual([p.name for p in changes.removed], ['b'])
+        self.assertEqual([(o.version, n.version) for o, n in changes.changed],
+                         [('1.0.0', '1.1.0')])
+        self.assertEqual(diff(old, old), ([], [], []))
+
+    def test_large_lockfile_diff(self):
+        """Ensure diffs of monorepo-sized lock files stay exact."""
+        packages = {f'pkg_{i:05d}': (f'1.{i % 7}.0', 'hosted', 'transitive')
+                    for i in range(20000)}
+        bumped = dict(packages, pkg_00042=('9.9.9', 'hosted', 'transitive'))
+        del bumped['pkg_00007']
+        rows = [LockedPackage(*row) for row in
+                ((name, *info, None, None) for name, info in bumped.items())]
+        changes = diff(table_for(packages), PackageTable(rows))
+        self.assertEqual([p.name for p in changes.removed], ['pkg_00007'])
+        # The hand-built table has no location or pin, so all differ.
+        self.assertEqual(len(changes.changed), len(bumped))
+        changes = diff(table_for(packages), table_for(bumped))
+        self.assertEqual([o.name for o, _ in changes.changed], ['pkg_00042'])
+
+    def test_cli_diff_against_git_revision(self):
+        """Ensure REV:PATH names are read from the git object store."""
+        root = Path(self.tmp.name) / 'repo'
+        root.mkdir()
+        lock = root / 'pubspec.lock'
+        lock.write_text(lock_text({'a': ('1.0.0', 'hosted', 'direct main')}),
+                        encoding='utf-8')
+        for args in (['init', '-q'], ['add', 'pubspec.lock'],
+                     ['commit', '-q', '-m', 'lock']):
+            subprocess.run(['git', '-c', 'user.name=Test', '-c',
+                            'user.email=test@example.com', *args],
+                           cwd=root, check=True, capture_output=True)
+        lock.write_text(lock_text({'a': ('2.0.0', 'hosted', 'direct main')}),
+                        encoding='utf-8')
+        out = io.StringIO()
+        code = main(['--root', str(root), '--diff', 'HEAD:pubspec.lock',
+                     '--json'], out=out)
+        self.assertEqual(code, 1)
+        self.assertEqual(json.loads(out.getvalue())['changed'], {
+            'a': {'from': '1.0.0', 'to': '2.0.0',
+                  'source': ['hosted', 'hosted']}})
+
+
+if __name__ == '__main__':
+    unittest.main()
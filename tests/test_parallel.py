@@ -0,0 +1,88 @@
+"""
+Tests for process-pool execution of per-file validators.
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tests.checks import run_check
+from tests.parallel import (
+    configured_chunksize, configured_readers, configured_workers,
+    run_parallel)
+
+
+def _worker_pid(item):
+    return item, os.getpid()
+
+
+class TestRunParallel(unittest.TestCase):
+    """Validate ordering and fan-out of the parallel runner."""
+
+    def test_results_keep_input_order(self):
+        """Ensure results are ordered for any worker count and chunking."""
+        items = list(range(40))
+        for workers, chunksize in [(1, None), (2, 1), (3, 7), (4, None)]:
+            with self.subTest(workers=workers, chunksize=chunksize):
+                results = run_parallel(_worker_pid, items, workers=workers,
+                                       chunksize=chunksize)
+                self.assertEqual([item for item, _ in results], items)
+
+    def test_work_runs_in_worker_processes(self):
+        """Ensure multiple workers actually leave the calling process."""
+        results = run_parallel(_worker_pid, range(40), workers=2,
+                               chunksize=1)
+        self.assertNotIn(os.getpid(), {pid for _, pid in results})
+
+    def test_single_worker_runs_in_process(self):
+        """Ensure the default configuration avoids pool startup."""
+        with mock.patch.dict(os.environ, {'VALIDATION_WORKERS': '1'}):
+            results = run_parallel(_worker_pid, range(20))
+        self.assertEqual({pid for _, pid in results}, {os.getpid()})
+
+    def test_settings(self):
+        """Ensure counts parse, and malformed ones fall back with a warning."""
+        cpus = os.cpu_count() or 1
+        for value, workers in [('', 1), ('3', 3), ('0', cpus),
+                               ('auto', cpus), ('-2', 1)]:
+            with mock.patch.dict(os.environ, {'VALIDATION_WORKERS': value}):
+                self.assertEqual(configured_workers(), workers, value)
+        with mock.patch.dict(os.environ, {'VALIDATION_WORKERS': 'many',
+                                          'VALIDATION_CHUNKSIZE': '2k',
+                                          'VALIDATION_PREFETCH': 'yes'}):
+            with self.assertWarnsRegex(RuntimeWarning,
+                                       "VALIDATION_WORKERS='many'"):
+                self.assertEqual(configured_workers(), 1)
+            with self.assertWarns(RuntimeWarning):
+                self.assertEqual(configured_chunksize(80, 2), 10)
+            with self.assertWarns(RuntimeWarning):
+                self.assertEqual(configured_readers(), 0)
+
+
+class TestParallelChecks(unittest.TestCase):
+    """Validate that parallel check failures map back to their files."""
+
+    def test_failures_map_to_their_files(self):
+        """Ensure each file's verdict matches a sequential run."""
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i in range(24):
+                path = Path(tmp) / f'f{i:02}.json'
+                path.write_text('{' if i % 5 == 0 else '{"i": %d}' % i,
+                                encoding='utf-8')
+                paths.append(path)
+            with mock.patch.dict(os.environ, {'VALIDATION_WORKERS': '1'}):
+                sequential = run_check('json_valid', paths)
+            with mock.patch.dict(os.environ, {'VALIDATION_WORKERS': '3',
+                                              'VALIDATION_CHUNKSIZE': '2'}):
+                parallel = run_check('json_valid', paths)
+        self.assertEqual(parallel, sequential)
+        failed = [path.name for path, failures in parallel if failures]
+        self.assertEqual(failed, ['f00.json', 'f05.json', 'f10.json',
+                                  'f15.json', 'f20.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+Tests for the overlapped file reader and its latency-injection harness.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tests import document_cache
+from tests.benchmarks.prefetch import SlowFileSystem, benchmark
+from tests.checks import run_check
+from tests.document_cache import DocumentCache
+from tests.prefetch import FileSystem, prefetch_documents
+
+
+class RecordingFileSystem(FileSystem):
+    """Records reads and how far they ran ahead of the consumer."""
+
+    def __init__(self):
+        self.reads = []
+        self.lock = threading.Lock()
+
+    def read(self, path):
+        with self.lock:
+            self.reads.append(Path(path).name)
+        return super().read(path)
+
+
+class TestPrefetch(unittest.TestCase):
+    """Validate ordering, caching, backpressure and error handling."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.paths = []
+        for i, size in enumerate([10, 300, 50, 2000, 1, 700]):
+            path = self.root / f'f{i}.yml'
+            path.write_text('a: b\n' + '#' * size + '\n', encoding='utf-8')
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_loads_every_file_into_the_cache(self):
+        """Ensure documents match the files and are reused when fresh."""
+        cache = DocumentCache()
+        fs = RecordingFileSystem()
+        loaded = dict(prefetch_documents(self.paths, cache, readers=3, fs=fs))
+        self.assertEqual(set(loaded), set(self.paths))
+        for path, document in loaded.items():
+            self.assertEqual(document.data, path.read_bytes())
+            self.assertIs(cache.get(path), document)
+        self.assertEqual(cache.reads, len(self.paths))
+        fs.reads.clear()
+        again = dict(prefetch_documents(self.paths, cache, readers=3, fs=fs))
+        self.assertEqual(fs.reads, [])
+        self.assertIs(again[self.paths[0]], loaded[self.paths[0]])
+
+    def test_largest_files_are_read_first(self):
+        """Ensure reads are issued in order of decreasing size."""
+        fs = RecordingFileSystem()
+        list(prefetch_documents(self.paths, DocumentCache(), readers=1,
+                                fs=fs))
+        self.assertEqual(fs.reads, ['f3.yml', 'f5.yml', 'f1.yml', 'f2.yml',
+                                    'f0.yml', 'f4.yml'])
+
+    def test_queue_bounds_read_ahead(self):
+        """Ensure a slow consumer holds back the readers."""
+        fs = RecordingFileSystem()
+        consumed = 0
+        for _ in prefetch_documents(self.paths, DocumentCache(), readers=1,
+                                    queue_size=1, fs=fs):
+            time.sleep(0.02)
+            consumed += 1
+            # One queued, one read waiting to be queued.
+            self.assertLessEqual(len(fs.reads), consumed + 2)
+
+    def test_early_stop_and_missing_files(self):
+        """Ensure abandoned iteration stops and unreadable files are None."""
+        fs = RecordingFileSystem()
+        documents = prefetch_documents(self.paths, DocumentCache(),
+                                       readers=1, queue_size=1, fs=fs)
+        next(documents)
+        documents.close()
+        self.assertLess(len(fs.reads), len(self.paths))
+
+        self.paths[2].unlink()
+        loaded = dict(prefetch_documents(self.paths, DocumentCache()))
+        self.assertIsNone(loaded[self.paths[2]])
+
+    def test_unexpected_errors_reach_the_consumer(self):
+        """Ensure a failing read raises its own error, not CancelledError."""
+        class FaultyFileSystem(FileSystem):
+            def read(self, path):
+                if path.name == 'f1.yml':
+                    raise UnicodeError('bad mount')
+                return super().read(path)
+
+        loaded = []
+        with self.assertRaisesRegex(UnicodeError, 'bad mount'):
+            for path, _ in prefetch_documents(self.paths, DocumentCache(),
+                                              readers=2,
+                                              fs=FaultyFileSystem()):
+                loaded.append(path)
+        self.assertNotIn(self.paths[1], loaded)
+
+    def test_not_imported_unless_enabled(self):
+        """Ensure asyncio is not loaded by runs that do not prefetch."""
+        loaded = subprocess.run(
+            [sys.executable, '-c', 'import sys, tests.validate; '
+             'print("asyncio" in sys.modules)'],
+            cwd=Path(__file__).parent.parent, check=True,
+            capture_output=True, text=True).stdout.strip()
+        self.assertEqual(loaded, 'False')
+
+    def test_run_check_gives_the_same_verdicts(self):
+        """Ensure prefetched checks match sequential ones, in path order."""
+        (self.root / 'bad.yml').write_text('a: [\n', encoding='utf-8')
+        paths = [*self.paths, self.root / 'bad.yml', self.root / 'gone.yml']
+        for name in ('yaml_valid', 'yaml_no_trailing_whitespace'):
+            with mock.patch.object(document_cache, '_cache', None):
+                expected = run_check(name, paths)
+            with mock.patch.object(document_cache, '_cache', None), \
+                    mock.patch.dict(os.environ, {'VALIDATION_PREFETCH': '4'}):
+                self.assertEqual(run_check(name, paths), expected, name)
+        self.assertTrue(expected[-1][1])
+
+    def test_latency_injection_shows_the_gain(self):
+        """Ensure reads overlap on a slow filesystem."""
+        latency = 0.03
+        results = benchmark(self.paths, latency, readers=(6,))
+        prefetched = results['prefetch x6']
+        # A stat and a read per file, six of them in flight at once.
+        self.assertEqual(prefetched['calls'], 2 * len(self.paths))
+        self.assertEqual(prefetched['peak'], 6)
+        self.assertEqual(prefetched['files'], len(self.paths))
+        # Overlapped, the run takes a fraction of the summed latency
+        # (about a sixth); serial calls could not finish under it.
+        self.assertLess(prefetched['seconds'],
+                        prefetched['calls'] * latency)
+        fs = SlowFileSystem(0.001)
+        fs.stat(self.paths[0])
+        self.assertEqual((fs.calls, fs.peak), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+Tests for the columnar result store and its JUnit and SARIF writers.
+"""
+
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+
+from tests.result_store import (
+    Finding, ResultStore, write_junit, write_sarif)
+from tests.validate import Rule, RuleResult, main
+
+
+ROOT = Path('/repo')
+
+
+def sample_store():
+    store = ResultStore(ROOT)
+    store.set_status('yaml.trailing', 'failed')
+    store.add_file('yaml.trailing', ROOT / 'a.yml', [
+        f'{ROOT / "a.yml"}:3:7: trailing whitespace',
+        f'{ROOT / "a.yml"}:9:1: trailing whitespace'])
+    store.add_file('yaml.trailing', ROOT / 'b.yml')
+    store.set_status('versions', 'warned')
+    store.add_file('versions', ROOT / 'c.yml', ['3.35.2 <disagrees> & "x"'],
+                   severity='warning')
+    store.set_status('azure.structure', 'skipped', 'not found')
+    return store
+
+
+class TestResultStore(unittest.TestCase):
+    """Validate storage, summaries and streamed reports."""
+
+    def test_columns_and_interning(self):
+        """Ensure locations are split out and repeated texts stored once."""
+        store = sample_store()
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.finding(1), Finding(
+            'yaml.trailing', 'a.yml', 9, 1, 'error', 'trailing whitespace'))
+        self.assertEqual(list(store)[2].line, 0)
+        self.assertEqual(len(store.messages), 2)
+        self.assertEqual(
+            [(rule, path, end - start) for rule, path, start, end
+             in store.checked()],
+            [('yaml.trailing', 'a.yml', 2), ('yaml.trailing', 'b.yml', 0),
+             ('versions', 'c.yml', 1)])
+
+    def test_group_by(self):
+        """Ensure findings are counted per rule, file and combinations."""
+        store = sample_store()
+        self.assertEqual(store.group_by('rule'),
+                         {'yaml.trailing': 2, 'versions': 1})
+        self.assertEqual(store.group_by('file', 'severity'),
+                         {('a.yml', 'error'): 2, ('c.yml', 'warning'): 1})
+        self.assertEqual(store.summary()['yaml.trailing'],
+                         {'status': 'failed', 'files': 2, 'findings': 2})
+        with self.assertRaises(ValueError):
+            store.group_by('nope')
+
+    def test_junit(self):
+        """Ensure suites per rule, cases per file, escaped messages."""
+        out = io.StringIO()
+        write_junit(sample_store(), out)
+        suites = ElementTree.fromstring(out.getvalue())
+        self.assertEqual(suites.get('failures'), '1')
+        by_name = {suite.get('name'): suite for suite in suites}
+        trailing = by_name['yaml.trailing']
+        self.assertEqual((trailing.get('tests'), trailing.get('failures')),
+                         ('2', '1'))
+        failure = trailing.find('testcase/failure')
+        self.assertIn('a.yml:9:1: trailing whitespace', failure.text)
+        self.assertEqual(by_name['versions'].find('testcase/system-out').text,
+                         '3.35.2 <disagrees> & "x"\n')
+        self.assertEqual(
+            by_name['azure.structure'].find('testcase/skipped').get('message'),
+            'not found')
+
+    def test_junit_replaces_characters_xml_cannot_hold(self):
+        """Ensure control characters quoted from files keep XML valid."""
+        store = ResultStore(ROOT)
+        store.set_status('secrets', 'failed')
+        store.add_file('secrets', ROOT / 'a\x01.yml', ['quoted "\x01\x1b"'])
+        out = io.StringIO()
+        write_junit(store, out)
+        suite = ElementTree.fromstring(out.getvalue()).find('testsuite')
+        self.assertEqual(suite.find('testcase').get('name'), 'a\ufffd.yml')
+        self.assertEqual(suite.find('testcase/failure').text,
+                         'quoted "\ufffd\ufffd"\n')
+
+    def test_relative_paths_keep_locations(self):
+        """Ensure located messages match files given relative to root."""
+        store = ResultStore(ROOT)
+        store.add_file('yaml.trailing', 'a.yml',
+                       [f'{ROOT / "a.yml"}:3:7: trailing whitespace',
+                        '/elsewhere/a.yml:4:1: trailing whitespace',
+                        'b.yml:1:1: not this file'])
+        self.assertEqual([(f.line, f.column, f.message) for f in store], [
+            (3, 7, 'trailing whitespace'), (4, 1, 'trailing whitespace'),
+            (0, 0, 'b.yml:1:1: not this file')])
+
+    def test_sarif(self):
+        """Ensure SARIF results carry rule, level and region."""
+        out = io.StringIO()
+        write_sarif(sample_store(), out)
+        run = json.loads(out.getvalue())['runs'][0]
+        self.assertEqual([rule['id'] for rule in run['tool']['driver']['rules']],
+                         ['yaml.trailing', 'versions', 'azure.structure'])
+        first, _, warning = run['results']
+        self.assertEqual(first['locations'][0]['physicalLocation'], {
+            'artifactLocation': {'uri': 'a.yml'},
+            'region': {'startLine': 3, 'startColumn': 7}})
+        self.assertEqual((warning['level'], warning['ruleIndex']),
+                         ('warning', 1))
+
+    def test_large_reports_stream(self):
+        """Ensure many findings stay compact and write in bounded memory."""
+        store = ResultStore(ROOT)
+        for file in range(50):
+            path = ROOT / f'f{file}.yml'
+            store.add_file('yaml.trailing', path, [
+                f'{path}:{line}:5: trailing whitespace'
+                for line in range(1, 201)])
+        self.assertEqual(len(store), 10000)
+        self.assertLess(store.nbytes(), 25 * len(store))
+        self.assertEqual(store.group_by('message'),
+                         {'trailing whitespace': 10000})
+        with tempfile.TemporaryDirectory() as tmp:
+            for writer in (write_junit, write_sarif):
+                with open(os.path.join(tmp, 'report'), 'w') as out:
+                    tracemalloc.start()
+                    writer(store, out)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    size = out.tell()
+                # Buffers and interned strings only, not the report.
+                self.assertGreater(size, 300 * 1024)
+                self.assertLess(peak, 128 * 1024, writer.__name__)
+
+    def test_results_and_cli(self):
+        """Ensure engine results convert and the CLI writes both formats."""
+        rule = Rule('sample', 'json_valid', ['*.json'])
+        result = RuleResult(rule, 'failed', [
+            (ROOT / 'x.json', ['Invalid JSON in x.json'])])
+        store = ResultStore.from_results([result], ROOT)
+        self.assertEqual(store.group_by('file'), {'x.json': 1})
+        with tempfile.TemporaryDirectory() as tmp:
+            Path(tmp, 'broken.json').write_text('{', encoding='utf-8')
+            out = io.StringIO()
+            self.assertEqual(main(['--root', tmp, '--rule', 'json.valid',
+                                   '--format', 'junit'], out=out), 1)
+            suite = ElementTree.fromstring(out.getvalue()).find('testsuite')
+            self.assertEqual(suite.find('testcase').get('name'),
+                             'broken.json')
+            out = io.StringIO()
+            main(['--root', tmp, '--rule', 'json.valid', '--format',
+                  'sarif'], out=out)
+            results = json.loads(out.getvalue())['runs'][0]['results']
+            self.assertEqual(results[0]['ruleId'], 'json.valid')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Tests for the compiled configuration schemas.
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tests import schema
+from tests.checks import run_check
+from tests.schema import SchemaError, compile_schema
+
+
+SAMPLE = {
+    'type': 'object',
+    'required': ['name', 'size'],
+    'requiredAny': ['tags', 'labels'],
+    'properties': {
+        'name': {'type': 'string', 'pattern': r'^[a-z]+$'},
+        'size': {'type': 'integer'},
+        'kind': {'enum': ['a', 'b']},
+        'tags': {'type': 'array', 'minItems': 1,
+                 'items': {'type': 'string'}},
+        'odd key': {'type': 'null'},
+    },
+    'additionalProperties': False,
+}
+
+
+class TestSchemaCompiler(unittest.TestCase):
+    """Validate generated validators and their on-disk cache."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        env = mock.patch.dict(os.environ,
+                              {'VALIDATION_CACHE_DIR': self.tmp.name})
+        compiled = mock.patch.dict(schema._compiled, clear=True)
+        env.start()
+        compiled.start()
+        self.addCleanup(env.stop)
+        self.addCleanup(compiled.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_all_violations_in_one_pass(self):
+        """Ensure every violation is reported with its path."""
+        value = {'name': 'Bad', 'size': True, 'kind': 'c', 'tags': [1, 'x'],
+                 'odd key': 0, 'extra': 1}
+        self.assertEqual(compile_schema(SAMPLE).validate(value), [
+            ('$.name', "does not match '^[a-z]+$'"),
+            ('$.size', 'expected integer, got boolean'),
+            ('$.kind', "expected one of 'a', 'b', got 'c'"),
+            ('$.tags[0]', 'expected string, got integer'),
+            ("$['odd key']", 'expected null, got integer'),
+            ('$', "unexpected key 'extra'"),
+        ])
+
+    def test_required_keys(self):
+        """Ensure missing required and any-of keys are reported."""
+        self.assertEqual(compile_schema(SAMPLE).validate({}), [
+            ('$', "missing required key 'name'"),
+            ('$', "missing required key 'size'"),
+            ('$', "should have at least one of 'tags', 'labels'"),
+        ])
+        self.assertEqual(compile_schema(SAMPLE).validate([]),
+                         [('$', 'expected object, got array')])
+
+    def test_validate_many(self):
+        """Ensure a batch returns one result list per value, in order."""
+        valid = {'name': 'ok', 'size': 1, 'tags': ['x']}
+        results = compile_schema(SAMPLE).validate_many(
+            [valid, {**valid, 'tags': []}, valid])
+        self.assertEqual(results, [
+            [], [('$.tags', 'expected at least 1 item(s)')], []])
+
+    def test_unknown_keywords_are_rejected(self):
+        """Ensure schema typos fail loudly instead of being ignored."""
+        with self.assertRaises(SchemaError):
+            compile_schema({'type': 'object', 'requried': ['name']})
+
+    def test_compiled_code_is_cached_on_disk(self):
+        """Ensure a fresh process reuses the code without regenerating."""
+        compiled = compile_schema(SAMPLE)
+        cache_file = Path(self.tmp.name) / 'schemas' / \
+            f'{compiled.key}.marshal'
+        self.assertTrue(cache_file.is_file())
+        schema._compiled.clear()
+        with mock.patch.object(schema, 'generate_source',
+                               side_effect=AssertionError('recompiled')):
+            self.assertEqual(compile_schema(SAMPLE).validate({})[0],
+                             ('$', "missing required key 'name'"))
+        changed = dict(SAMPLE, required=['name'])
+        self.assertNotEqual(compile_schema(changed).key, compiled.key)
+
+    def test_registered_schemas_are_hashed_once(self):
+        """Ensure repeated lookups neither hash nor read the compiler."""
+        validator = schema.get_validator('renovate')
+        with mock.patch.object(schema, 'schema_key',
+                               side_effect=AssertionError('rehashed')), \
+                mock.patch.object(Path, 'read_bytes',
+                                  side_effect=AssertionError('read')):
+            self.assertIs(schema.get_validator('renovate'), validator)
+
+    def test_batch_check_reports_per_file(self):
+        """Ensure a batch check maps violations back to each file."""
+        root = Path(self.tmp.name)
+        good, bad, broken = root / 'good.json', root / 'bad.json', \
+            root / 'broken.json'
+        good.write_text('{"extends": ["config:base"]}', encoding='utf-8')
+        bad.write_text('{"extends": "config:base"}', encoding='utf-8')
+        broken.write_text('{', encoding='utf-8')
+        results = dict(run_check('renovate_schema', [good, bad, broken]))
+        self.assertEqual(results[good], [])
+        self.assertEqual(results[bad], [
+            'bad.json: $.extends: expected array, got string'])
+        self.assertEqual(len(results[broken]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
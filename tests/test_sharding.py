@@ -0,0 +1,188 @@
+"""
+Tests for deterministic sharding and shard report merging.
+"""
+
+import io
+import json
+import subprocess
+import tempfile
+import unittest
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+from unittest import mock
+
+from tests.sharding import (
+    ShardEngine, ShardError, ShardPlan, blob_sizes, merge_reports,
+    parse_shard, run_local)
+from tests.validate import ValidationEngine, main
+
+
+REPO_ROOT = Path(__file__).parent.parent
+
+
+def report(engine, results):
+    """The JSON report ``--shard --format json`` writes for ``results``."""
+    return {'ok': not any(r.status == 'failed' for r in results),
+            'root': str(engine.root), 'shard': engine.describe(0),
+            'rules': [r.to_dict(engine.root) for r in results]}
+
+
+def comparable(data):
+    return [(rule['rule'], rule['status'], rule['files'],
+             sorted((f['path'], f['message']) for f in rule['findings']))
+            for rule in data['rules']]
+
+
+class TestSharding(unittest.TestCase):
+    """Validate plans, shard engines and the merge step."""
+
+    def test_parse_shard(self):
+        """Ensure shard specs are 1-based and range checked."""
+        self.assertEqual(parse_shard('2/4'), (2, 4))
+        for bad in ('0/4', '5/4', '1', 'a/b', '1/2/3'):
+            with self.assertRaises(ShardError, msg=bad):
+                parse_shard(bad)
+
+    def test_plan_is_stable_and_balanced(self):
+        """Ensure every node computes the same, evenly loaded plan."""
+        weights = {f'file{i}': (i * 7919) % 1000 + 1 for i in range(200)}
+        plan = ShardPlan(weights, 4)
+        shuffled = ShardPlan(dict(reversed(list(weights.items()))), 4)
+        self.assertEqual(plan.fingerprint, shuffled.fingerprint)
+        self.assertEqual([plan.owner(key) for key in weights],
+                         [shuffled.owner(key) for key in weights])
+        self.assertLessEqual(max(plan.loads) - min(plan.loads),
+                             max(weights.values()))
+        self.assertNotEqual(plan.fingerprint,
+                            ShardPlan(dict(weights, extra=1), 4).fingerprint)
+
+    def test_shards_cover_the_unsharded_run(self):
+        """Ensure merged shard results equal one run over everything."""
+        expected = ValidationEngine(REPO_ROOT).run()
+        engines = [ShardEngine(REPO_ROOT, parse_shard(f'{i}/3'))
+                   for i in (1, 2, 3)]
+        merged = merge_reports([report(engine, engine.run())
+                                for engine in engines])
+        self.assertEqual(comparable(merged), comparable(
+            {'rules': [r.to_dict(REPO_ROOT.resolve()) for r in expected]}))
+        # Every file-level unit is checked by exactly one shard.
+        owned = [set(engine.targets(rule)) for engine in engines
+                 for rule in engine.rules if not engine.owner(rule)]
+        self.assertEqual(sum(map(len, owned)),
+                         sum(len(ValidationEngine(REPO_ROOT).targets(rule))
+                             for rule in engines[0].rules
+                             if not engines[0].owner(rule)))
+
+    def test_rules_are_selected_once_per_shard_run(self):
+        """Ensure ownership checks reuse one selection per rule."""
+        engine = ShardEngine(REPO_ROOT, parse_shard('1/2'))
+        with mock.patch.object(ValidationEngine, 'targets', autospec=True,
+                               side_effect=ValidationEngine.targets) as calls:
+            engine.run()
+            engine.run()
+        self.assertEqual(calls.call_count, len(engine.rules))
+
+    def test_plan_ignores_line_endings(self):
+        """Ensure CRLF checkouts plan like LF ones, in git and out."""
+        files = {'a.json': '{\n  "a": 1\n}\n',
+                 'config/b.yml': 'b:\n  - 1\n  - 2\n',
+                 'renovate.json': '{\n  "extends": []\n}\n'}
+
+        def fingerprint(root, newline):
+            for name, content in files.items():
+                path = root / name
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(content.replace('\n', newline).encode())
+            engine = ShardEngine(root, parse_shard('1/2'))
+            return engine.plan.fingerprint
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            lf = fingerprint(root, '\n')
+            self.assertEqual(fingerprint(root, '\r\n'), lf)
+            self.assertEqual(fingerprint(root, '\n'), lf)
+            subprocess.run(['git', 'init', '-q'], cwd=root, check=True)
+            subprocess.run(['git', 'add', '-A'], cwd=root, check=True)
+            # The index keeps LF blobs, as core.autocrlf checkouts do.
+            self.assertEqual(fingerprint(root, '\r\n'), lf)
+            self.assertEqual(blob_sizes(root)['config/b.yml'],
+                             len(files['config/b.yml']))
+
+    def test_merge_detects_missing_and_foreign_shards(self):
+        """Ensure incomplete or mismatched shard sets are refused."""
+        engines = [ShardEngine(REPO_ROOT, parse_shard(f'{i}/3'))
+                   for i in (1, 2, 3)]
+        reports = [report(engine, []) for engine in engines]
+        with self.assertRaisesRegex(ShardError, r'missing 2/3'):
+            merge_reports([reports[0], reports[2]])
+        with self.assertRaisesRegex(ShardError, r'duplicate 1/3'):
+            merge_reports([reports[0], *reports])
+        foreign = dict(reports[1], shard=dict(reports[1]['shard'],
+                                              fingerprint='0' * 16))
+        with self.assertRaisesRegex(ShardError, r'different plans'):
+            merge_reports([reports[0], foreign, reports[2]])
+
+    def test_local_shard_processes_merge(self):
+        """Ensure N shard processes on one machine merge through the CLI."""
+        with tempfile.TemporaryDirectory() as tmp:
+            reports = run_local(2, REPO_ROOT, ['--rule', 'json.valid',
+                                               '--rule', 'yaml.valid'],
+                                out_dir=tmp)
+            self.assertEqual(sorted(r['shard']['index'] for r in reports),
+                             [1, 2])
+            out = io.StringIO()
+            names = sorted(str(path) for path in Path(tmp).glob('*.json'))
+            self.assertEqual(main(['--merge', '--format', 'json', *names],
+                                  out=out), 0)
+            merged = json.loads(out.getvalue())
+            self.assertEqual([rule['rule'] for rule in merged['rules']],
+                             ['json.valid', 'yaml.valid'])
+            self.assertEqual(main(['--merge', names[0]], out=io.StringIO()),
+                             2)
+
+            out = io.StringIO()
+            self.assertEqual(main(['--merge', '--format', 'junit', *names],
+                                  out=out), 0)
+            suites = ElementTree.fromstring(out.getvalue())
+            self.assertEqual(suites.get('failures'), '0')
+            for suite in suites:
+                self.assertIsNone(suite.find('testcase/skipped'),
+                                  suite.get('name'))
+            # Every checked file is a test case, as in an unsharded run.
+            self.assertEqual(
+                sum(1 for _ in suites.iter('testcase')),
+                sum(rule['files'] for rule in merged['rules']))
+
+    def test_merged_junit_groups_findings_by_file(self):
+        """Ensure merged files are one test case each, passing ones too."""
+        shard = {'index': 1, 'count': 1, 'fingerprint': 'f', 'weight': 1,
+                 'seconds': 0.0}
+        findings = [{'path': 'a.json', 'message': '/node/a.json:3:5: first'},
+                    {'path': 'b.json', 'message': 'other'},
+                    {'path': 'a.json', 'message': 'second'}]
+        shard_report = {'ok': False, 'root': '/repo', 'shard': shard,
+                        'rules': [{'rule': 'json.valid', 'check': 'json_valid',
+                                   'status': 'failed', 'files': 3,
+                                   'findings': findings,
+                                   'checked': ['a.json', 'b.json',
+                                               'c.json']}]}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp, 'shard.json')
+            path.write_text(json.dumps(shard_report), encoding='utf-8')
+            out = io.StringIO()
+            self.assertEqual(main(['--merge', '--format', 'junit',
+                                   str(path)], out=out), 1)
+            sarif = io.StringIO()
+            main(['--merge', '--format', 'sarif', str(path)], out=sarif)
+        cases = ElementTree.fromstring(out.getvalue()).iter('testcase')
+        self.assertEqual(
+            [(case.get('name'), ''.join(case.itertext()).strip())
+             for case in cases],
+            [('a.json', 'a.json:3:5: first\nsecond'), ('b.json', 'other'),
+             ('c.json', '')])
+        region = json.loads(sarif.getvalue())['runs'][0]['results'][0][
+            'locations'][0]['physicalLocation']['region']
+        self.assertEqual(region, {'startLine': 3, 'startColumn': 5})
+
+if __name__ == '__main__':
+    unittest.main()
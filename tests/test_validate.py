@@ -0,0 +1,104 @@
+"""
+Tests for the standalone validation engine and its command line.
+"""
+
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.validate import RULES, ValidationEngine, main
+
+
+REPO_ROOT = Path(__file__).parent.parent
+
+
+class TestValidationEngine(unittest.TestCase):
+    """Validate rule selection, results and CLI output."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        (self.root / 'renovate.json').write_text('{"extends": []}',
+                                                 encoding='utf-8')
+        (self.root / 'broken.json').write_text('{', encoding='utf-8')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_cli(self, *args):
+        out = io.StringIO()
+        code = main(['--root', str(self.root), '--format', 'json', *args],
+                    out=out)
+        return code, json.loads(out.getvalue())
+
+    def statuses(self, report):
+        return {rule['rule']: rule['status'] for rule in report['rules']}
+
+    def test_reports_failures_as_json(self):
+        """Ensure failing rules produce findings and a non-zero exit."""
+        code, report = self.run_cli()
+        self.assertEqual(code, 1)
+        self.assertFalse(report['ok'])
+        statuses = self.statuses(report)
+        self.assertEqual(statuses['json.valid'], 'failed')
+        self.assertEqual(statuses['renovate.structure'], 'passed')
+        # Required files that are missing fail; optional ones are skipped.
+        self.assertEqual(statuses['pubspec.exists'], 'failed')
+        self.assertEqual(statuses['azure.structure'], 'skipped')
+        json_valid = next(rule for rule in report['rules']
+                          if rule['rule'] == 'json.valid')
+        self.assertEqual([f['path'] for f in json_valid['findings']],
+                         ['broken.json'])
+
+    def test_explicit_file_list(self):
+        """Ensure only rules matching the given files run."""
+        code, report = self.run_cli('renovate.json', 'deleted.yml')
+        self.assertEqual(code, 0)
+        statuses = self.statuses(report)
+        self.assertEqual(statuses['renovate.structure'], 'passed')
+        self.assertEqual(statuses['pubspec.exists'], 'skipped')
+        self.assertEqual(statuses['yaml.valid'], 'skipped')
+
+    def test_files_from_stdin_style_list(self):
+        """Ensure NUL separated lists (e.g. from git -z) are accepted."""
+        listing = self.root / 'files.txt'
+        listing.write_bytes(b'broken.json\0renovate.json\0')
+        code, report = self.run_cli('--files-from', str(listing), '-z')
+        self.assertEqual(code, 1)
+        self.assertEqual(self.statuses(report)['json.valid'], 'failed')
+
+    def test_rule_selection(self):
+        """Ensure --rule limits the run and rejects unknown ids."""
+        code, report = self.run_cli('--rule', 'renovate.structure')
+        self.assertEqual(code, 0)
+        self.assertEqual(list(self.statuses(report)), ['renovate.structure'])
+        self.assertEqual(main(['--rule', 'no.such.rule'], out=io.StringIO()),
+                         2)
+
+    def test_rule_ids_are_unique(self):
+        """Ensure every rule can be addressed by its id."""
+        ids = [rule.id for rule in RULES]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_engine_passes_on_repository(self):
+        """Ensure the repository itself validates cleanly."""
+        results = ValidationEngine(REPO_ROOT).run()
+        self.assertEqual([r.rule.id for r in results if r.status == 'failed'],
+                         [])
+
+    def test_json_only_run_does_not_import_yaml(self):
+        """Ensure PyYAML is only imported when YAML files are validated."""
+        code = ('import sys, io; from tests.validate import main; '
+                'main(["renovate.json"], out=io.StringIO()); '
+                'print("yaml" in sys.modules)')
+        output = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT,
+                                check=True, capture_output=True, text=True)
+        self.assertEqual(output.stdout.strip(), 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""
+Tests for the watch-mode daemon and its query socket.
+"""
+
+import os
+import socket
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from tests.document_cache import reset_document_cache
+from tests.file_index import get_file_index, reset_file_index
+from tests.watch import (
+    RESCAN, InotifyWatcher, PollingWatcher, QueryServer, WatchError,
+    WatchSession, query)
+
+
+def touch(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    # Make sure the signature changes even on coarse-grained clocks.
+    stamp = time.time_ns() + 10 ** 9
+    os.utime(path, ns=(stamp, stamp))
+
+
+def yaml_status(session):
+    return session.results['yaml.valid'].status
+
+
+class WatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name).resolve()
+        touch(self.root / 'config/a.yml', 'a: 1\n')
+        touch(self.root / 'config/b.yml', 'b: 2\n')
+        touch(self.root / 'renovate.json', '{"extends": []}\n')
+        reset_file_index()
+        reset_document_cache()
+        self.addCleanup(reset_file_index)
+        self.addCleanup(reset_document_cache)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+class TestWatchers(WatchTestCase):
+    """Validate change detection by polling and inotify."""
+
+    def assertDetects(self, watcher):
+        touch(self.root / 'config/a.yml', 'a: 2\n')
+        self.assertIn(self.root / 'config/a.yml', watcher.wait(timeout=2))
+        touch(self.root / 'config/c.yml', 'c: 1\n')
+        self.assertIn(self.root / 'config/c.yml', watcher.wait(timeout=2))
+        (self.root / 'config/b.yml').unlink()
+        changed = watcher.wait(timeout=2)
+        self.assertIsNot(changed, RESCAN)
+        self.assertIn(self.root / 'config/b.yml', changed)
+        self.assertEqual(watcher.wait(timeout=0.1), set())
+
+    def test_polling_watcher(self):
+        """Ensure polling sees modified, created and deleted files."""
+        watcher = PollingWatcher(get_file_index(self.root), interval=0.01)
+        self.assertDetects(watcher)
+        self.assertNotIn(self.root / 'config/b.yml', watcher.files)
+
+    @unittest.skipUnless(InotifyWatcher.available(), 'inotify unavailable')
+    def test_inotify_watcher(self):
+        """Ensure inotify sees changes, including in new directories."""
+        watcher = InotifyWatcher(get_file_index(self.root))
+        self.addCleanup(watcher.close)
+        self.assertDetects(watcher)
+        (self.root / 'new').mkdir()
+        self.assertIn(self.root / 'new', watcher.wait(timeout=2))
+        touch(self.root / 'new/d.yml', 'd: 1\n')
+        self.assertIn(self.root / 'new/d.yml', watcher.wait(timeout=2))
+
+
+class TestWatchSession(WatchTestCase):
+    """Validate incremental re-runs and the socket API."""
+
+    def test_only_affected_rules_and_files_rerun(self):
+        """Ensure a save re-runs matching rules over changed files only."""
+        session = WatchSession(self.root)
+        self.assertEqual(yaml_status(session), 'passed')
+        evaluations = session.engine.evaluations
+        touch(self.root / 'config/b.yml', 'b: [\n')
+        results = session.refresh({self.root / 'config/b.yml'})
+        rerun = [r.rule.id for r in results]
+        self.assertIn('yaml.valid', rerun)
+        self.assertNotIn('json.valid', rerun)
+        # One evaluation per re-run rule: a.yml keeps its verdicts.
+        self.assertEqual(session.engine.evaluations,
+                         evaluations + len(results))
+        self.assertEqual(yaml_status(session), 'failed')
+
+    def test_created_and_deleted_files(self):
+        """Ensure new files are indexed and deleted ones drop out."""
+        session = WatchSession(self.root)
+        touch(self.root / 'config/c.yml', 'c: [\n')
+        session.refresh({self.root / 'config/c.yml'})
+        result = session.results['yaml.valid']
+        self.assertIn(self.root / 'config/c.yml',
+                      [path for path, _ in result.files])
+        self.assertEqual(result.status, 'failed')
+        self.assertIn(self.root / 'config/c.yml', session.engine.verdicts)
+        (self.root / 'config/c.yml').unlink()
+        session.refresh({self.root / 'config/c.yml'})
+        self.assertEqual(yaml_status(session), 'passed')
+        self.assertNotIn(self.root / 'config/c.yml', session.engine.verdicts)
+
+    def test_socket_queries(self):
+        """Ensure status and check requests are answered over the socket."""
+        session = WatchSession(self.root)
+        server = QueryServer(self.root / 'watch.sock', session)
+        self.addCleanup(server.close)
+        self.assertTrue(query({'cmd': 'ping'}, server.path)['ok'])
+        status = query({'cmd': 'status'}, server.path)
+        statuses = {r['rule']: r['status'] for r in status['rules']}
+        self.assertEqual(statuses['yaml.valid'], 'passed')
+        # The fixture has no pubspec.yaml, a required file.
+        self.assertEqual(statuses['pubspec.exists'], 'failed')
+        self.assertFalse(status['ok'])
+        touch(self.root / 'config/a.yml', 'a: [\n')
+        reply = query({'cmd': 'check', 'files': ['config/a.yml']},
+                      server.path)
+        self.assertFalse(reply['ok'])
+        statuses = {r['rule']: r['status'] for r in reply['rules']}
+        self.assertEqual(statuses['yaml.valid'], 'failed')
+        self.assertNotIn('pubspec.exists', statuses)
+        self.assertFalse(query({'cmd': 'bogus'}, server.path)['ok'])
+
+    def test_socket_is_not_taken_from_a_live_watcher(self):
+        """Ensure a second watcher refuses, and stale sockets are reused."""
+        session = WatchSession(self.root)
+        path = self.root / 'watch.sock'
+        server = QueryServer(path, session)
+        with self.assertRaises(WatchError):
+            QueryServer(path, session)
+        self.assertTrue(query({'cmd': 'ping'}, path)['ok'])
+        server.close()
+        # A socket file nobody listens on, as a killed watcher leaves.
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(str(path))
+        server = QueryServer(path, session)
+        self.addCleanup(server.close)
+        self.assertTrue(query({'cmd': 'ping'}, path)['ok'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Tests for the streaming XML validator.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.checks import run_check
+from tests.xml_validation import XmlRule, scan_xml
+
+
+def scan(data, path='file.xml', chunk_size=None, rules=None):
+    chunks = [data] if chunk_size is None else \
+        [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    return scan_xml(chunks, Path(path), rules)
+
+
+class ChildCountRule(XmlRule):
+    """Records how many children the root holds at each start tag."""
+
+    patterns = ('*.xml',)
+    seen = []
+
+    def element(self, element, depth):
+        if depth == 1:
+            self.root = element
+        else:
+            ChildCountRule.seen.append(len(self.root))
+
+
+class TestXmlValidation(unittest.TestCase):
+    """Validate well-formedness, structural rules and bounded memory."""
+
+    def test_well_formed_error_position(self):
+        """Ensure the first syntax error is reported with its position."""
+        report = scan(b'<?xml version="1.0"?>\n<a>\n  <b></a>\n')
+        self.assertEqual(report.issues, [(3, 8, 'not well-formed: '
+                                                'mismatched tag')])
+        self.assertEqual(scan(b'').issues[0].message,
+                         'not well-formed: no element found')
+
+    def test_results_do_not_depend_on_chunking(self):
+        """Ensure parsing in small pieces gives the same report."""
+        data = b'<root>' + b'<item id="1">text</item>' * 50 + b'</root>'
+        expected = scan(data)
+        self.assertEqual((expected.elements, expected.max_depth), (51, 2))
+        for chunk_size in (1, 7, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(scan(data, chunk_size=chunk_size), expected)
+
+    def test_finished_elements_are_discarded(self):
+        """Ensure the root only holds children of the current chunk."""
+        ChildCountRule.seen = []
+        item = b'<item><sub/></item>'
+        data = b'<root>' + item * 1000 + b'</root>'
+        report = scan(data, chunk_size=512, rules=[ChildCountRule()])
+        self.assertEqual(report.elements, 2001)
+        self.assertLessEqual(max(ChildCountRule.seen), 512 // len(item) + 2)
+
+    def test_root_element_rules(self):
+        """Ensure manifests and value resources have the right root."""
+        self.assertEqual(
+            scan(b'<resources/>', 'app/AndroidManifest.xml').issues[0].message,
+            'root element should be <manifest>, found <resources>')
+        self.assertEqual(scan(b'<resources/>',
+                              'src/main/res/values-night/styles.xml').issues,
+                         [])
+
+    def test_module_references_name_iml_files(self):
+        """Ensure modules.xml entries are .iml paths.
+
+        Whether they exist is the cross-file rule idea.modules_exist.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            idea = Path(tmp) / '.idea'
+            idea.mkdir()
+            modules = idea / 'modules.xml'
+            modules.write_text(
+                '<project><component><modules>'
+                '<module filepath="$PROJECT_DIR$/.idea/gone.iml"/>'
+                '<module filepath="$PROJECT_DIR$/app.xml"/>'
+                '<module/>'
+                '</modules></component></project>', encoding='utf-8')
+            broken = idea / 'workspace.xml'
+            broken.write_text('<project>', encoding='utf-8')
+            results = dict(run_check('xml_valid', [modules, broken]))
+        self.assertEqual(results[modules], [
+            'modules.xml: module $PROJECT_DIR$/app.xml is not an .iml file',
+            'modules.xml: module entry without a filepath'])
+        self.assertEqual(results[broken], [
+            'workspace.xml:1:10: not well-formed: no element found'])
+
+
+if __name__ == '__main__':
+    unittest.main()
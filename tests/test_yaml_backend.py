@@ -0,0 +1,69 @@
+"""
+Tests for YAML loader selection and cross-backend equivalence.
+"""
+
+import os
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tests import yaml_backend
+from tests.benchmarks.yaml_backends import generate_pipeline_yaml
+from tests.file_index import get_file_index
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+class TestYamlBackend(unittest.TestCase):
+    """Validate backend fallback and parse-tree equivalence."""
+
+    def setUp(self):
+        if yaml is None:
+            self.skipTest("PyYAML not installed")
+        self.repo_root = Path(__file__).parent.parent
+        patcher = mock.patch.object(yaml_backend, '_backend', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_prefers_fastest_available_loader(self):
+        """Ensure the C loader is picked whenever libyaml is built."""
+        expected = 'libyaml' if hasattr(yaml, 'CSafeLoader') else None
+        names = [b.name for b in yaml_backend.available_backends()]
+        self.assertEqual(yaml_backend.backend_name(), expected or names[0])
+        self.assertEqual(names[-1], 'pyyaml')
+
+    def test_falls_back_without_c_loader(self):
+        """Ensure a missing CSafeLoader degrades to pure Python."""
+        with mock.patch.object(yaml, 'CSafeLoader', None, create=True), \
+                mock.patch.dict(yaml_backend._FACTORIES,
+                                {'ruamel': lambda: None}):
+            self.assertEqual(yaml_backend.backend_name(), 'pyyaml')
+
+    def test_backend_can_be_forced(self):
+        """Ensure VALIDATION_YAML_BACKEND overrides the automatic choice."""
+        with mock.patch.dict(os.environ,
+                             {'VALIDATION_YAML_BACKEND': 'pyyaml'}):
+            self.assertEqual(yaml_backend.backend_name(), 'pyyaml')
+
+    def test_unknown_backend_is_rejected(self):
+        """Ensure typos in the backend name fail loudly."""
+        with self.assertRaises(ValueError):
+            yaml_backend.make_backend('fastyaml')
+
+    def test_backends_agree_on_corpus(self):
+        """Ensure every backend builds identical trees for our YAML."""
+        corpus = [path.read_text(encoding='utf-8') for path in
+                  get_file_index(self.repo_root).files('.yml', '.yaml')]
+        corpus.append(generate_pipeline_yaml(jobs=3, steps=4))
+        # YAML 1.1 scalars that YAML 1.2 loaders read differently.
+        corpus.append('on: push\nenabled: yes\nlegacy: off\n'
+                      'mode: 0755\nduration: 1:30\n')
+        corpus.append('a: [1, 2\n')  # must fail on every backend
+        self.assertEqual(yaml_backend.compare_backends(corpus), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
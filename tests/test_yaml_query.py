@@ -0,0 +1,159 @@
+"""
+Tests for event-stream YAML path queries.
+"""
+
+import unittest
+from unittest import mock
+
+from tests import instrumentation, yaml_backend
+from tests.benchmarks.yaml_backends import generate_pipeline_yaml
+from tests.benchmarks.yaml_query import QUERIES, benchmark
+from tests.document_cache import Document
+from tests.instrumentation import Profiler
+from tests.yaml_backend import YamlBackend, load, make_backend
+from tests.yaml_query import (
+    MISSING, Index, Key, Match, QueryError, parse_path, query_document,
+    query_yaml)
+
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+PIPELINE = """\
+variables:
+  FLUTTER_CHANNEL: stable
+  FLUTTER_VERSION: 3.35.2
+parameters:
+  - name: other
+    type: string
+  - type: object
+    name: webBuilds
+strategy:
+  matrix:
+    linux: {imageName: ubuntu-22.04}
+    mac: {imageName: macOS-15}
+steps:
+  - task: FlutterInstall@0
+    inputs: {version: custom, buildNumber: 12, verbose: true}
+"""
+
+
+@unittest.skipIf(yaml is None, 'PyYAML is not installed')
+class TestYamlQuery(unittest.TestCase):
+    """Validate path queries against a full load."""
+
+    def assertMatchesLoad(self, text, paths):
+        results = query_yaml(text, paths)
+        full = load(text)
+        for path in paths:
+            expected = full
+            for step in parse_path(path):
+                expected = expected[step.name] if isinstance(step, Key) \
+                    else expected[step.position] if isinstance(step, Index) \
+                    else next(item for item in expected
+                              if item.get(step.field) == step.value)
+            self.assertEqual(results[path], expected, path)
+        return results
+
+    def test_parse_path(self):
+        """Ensure keys, indexes and field matches are parsed."""
+        self.assertEqual(parse_path('parameters[name=webBuilds].type'),
+                         (Key('parameters'), Match('name', 'webBuilds'),
+                          Key('type')))
+        self.assertEqual(parse_path('steps[0].task'),
+                         (Key('steps'), Index(0), Key('task')))
+        for bad in ('', 'a..b', 'a[', 'a]b'):
+            with self.assertRaises(QueryError, msg=bad):
+                parse_path(bad)
+
+    def test_values_match_a_full_load(self):
+        """Ensure answers have the types and values a full load gives."""
+        results = self.assertMatchesLoad(PIPELINE, [
+            'variables.FLUTTER_VERSION', 'parameters[name=webBuilds].type',
+            'strategy.matrix', 'steps[0].inputs', 'steps[0].task',
+            'variables'])
+        self.assertEqual(results['steps[0].inputs']['buildNumber'], 12)
+        self.assertIs(results['steps[0].inputs']['verbose'], True)
+
+    def test_missing_paths(self):
+        """Ensure absent paths are MISSING, distinct from null."""
+        results = query_yaml(PIPELINE + 'empty:\n', [
+            'nope', 'variables.NOPE', 'parameters[name=nope]', 'steps[5]',
+            'variables.FLUTTER_CHANNEL.deeper', 'empty'])
+        self.assertEqual(results['empty'], None)
+        self.assertEqual(
+            [path for path, value in results.items() if value is MISSING],
+            ['nope', 'variables.NOPE', 'parameters[name=nope]', 'steps[5]',
+             'variables.FLUTTER_CHANNEL.deeper'])
+        self.assertEqual(query_yaml('', ['a']), {'a': MISSING})
+        self.assertEqual(query_yaml('- 1\n', ['a']), {'a': MISSING})
+
+    def test_stops_at_the_answer(self):
+        """Ensure reading stops once every path is answered."""
+        text = 'variables: {A: 1}\nrest: [\n'  # broken after the answer
+        self.assertEqual(query_yaml(text, ['variables.A']),
+                         {'variables.A': 1})
+        with self.assertRaises(yaml.YAMLError):
+            query_yaml(text, ['rest'])
+
+    def test_aliases_fall_back_to_a_full_load(self):
+        """Ensure anchors and merge keys resolve like a full load."""
+        self.assertMatchesLoad(
+            'base: &base {pool: linux}\njob: *base\n'
+            'other:\n  <<: *base\n  name: x\n',
+            ['job.pool', 'other.pool', 'other.name'])
+
+    def test_large_pipeline_builds_little(self):
+        """Ensure skipped subtrees are never constructed."""
+        text = generate_pipeline_yaml(jobs=50, steps=20)
+        profiler = Profiler()
+        with mock.patch.object(instrumentation, '_profiler', profiler):
+            query_yaml(text, ['variables.FLUTTER_VERSION'])
+        # trigger: and variables: only, out of tens of thousands.
+        self.assertLess(profiler.counters['yaml_query.events'], 40)
+        results = benchmark(generate_pipeline_yaml(jobs=10, steps=10),
+                            QUERIES, repeat=1)
+        for name, row in results.items():
+            self.assertLess(row['query_peak_kb'], row['load_peak_kb'], name)
+
+    def test_session_backend_is_used(self):
+        """Ensure the forced backend parses, or answers from its tree."""
+        pure = make_backend('pyyaml')
+        with mock.patch.object(yaml_backend, '_backend', pure), \
+                mock.patch.object(yaml, 'parse',
+                                  wraps=yaml.parse) as parse:
+            self.assertMatchesLoad(PIPELINE, ['variables.FLUTTER_VERSION'])
+        self.assertIs(parse.call_args.kwargs['Loader'], yaml.SafeLoader)
+
+        tree = YamlBackend('tree', pure.load, pure.errors)
+        profiler = Profiler()
+        with mock.patch.object(yaml_backend, '_backend', tree), \
+                mock.patch.object(instrumentation, '_profiler', profiler):
+            self.assertMatchesLoad(PIPELINE, ['steps[0].inputs.version'])
+        self.assertEqual(profiler.counters['yaml_query.fallbacks'], 1)
+        self.assertNotIn('yaml_query.events', profiler.counters)
+
+    def test_query_document_reuses_a_cached_tree(self):
+        """Ensure a document that was fully parsed is not streamed again."""
+        document = Document('azure-pipelines.yml',
+                            data=PIPELINE.encode('utf-8'))
+        profiler = Profiler()
+        with mock.patch.object(instrumentation, '_profiler', profiler):
+            self.assertEqual(
+                query_document(document, 'variables.FLUTTER_VERSION'),
+                ('3.35.2',))
+            self.assertIn('variables.FLUTTER_VERSION',
+                          document.memo['yaml_query'])
+            self.assertNotIn('parse.calls', profiler.counters)
+            document.parsed
+            events = profiler.counters['yaml_query.events']
+            self.assertEqual(query_document(document, 'strategy.matrix.mac'),
+                             ({'imageName': 'macOS-15'},))
+            self.assertEqual(profiler.counters['yaml_query.events'], events)
+
+
+if __name__ == '__main__':
+    unittest.main()
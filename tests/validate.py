@@ -0,0 +1,550 @@
+"""
+Configuration validation engine and command line entry point.
+Usage: python -m tests.validate [--format json] [--staged] [FILE ...]
+       python -m tests.validate --range origin/main..HEAD
+       python -m tests.validate --shard 1/4 --format json
+       python -m tests.validate --merge shard-*.json
+       python -m tests.validate --format sarif > validation.sarif
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+import warnings
+from pathlib import Path
+
+from tests.checks import CHECKS, run_check
+from tests.document_cache import get_document_cache
+from tests.facts import CONSISTENCY_CHECKS, FactsIndex
+from tests.file_index import REPO_ROOT, get_file_index, glob_regex
+from tests.instrumentation import span
+from tests.result_store import WRITERS, ResultStore, write_report
+
+
+YAML_FILES = ('**/*.yml', '**/*.yaml')
+CONFIG_FILES = ('*.json', '*.yaml', '*.yml')
+SHELL_SCRIPTS = ('run_tests.sh', 'run_validation_tests.sh')
+
+
+class Rule:
+    """A check applied to every file matching ``patterns``.
+
+    Patterns are gitignore-style globs relative to the repository root.
+    A ``required`` rule fails with ``missing`` when no file matches;
+    other rules whose literal targets are absent are skipped. Findings
+    of a rule with ``severity='warning'`` are reported without failing.
+    """
+
+    checks = CHECKS
+
+    def __init__(self, rule_id, check, patterns, required=False,
+                 missing=None, severity='error'):
+        self.id = rule_id
+        self.check = self.checks[check]
+        self.patterns = tuple(patterns)
+        self.required = required
+        self.missing = missing
+        self.severity = severity
+        self._regexes = [glob_regex(pattern) for pattern in self.patterns]
+        self.literal = not any(c in pattern for pattern in self.patterns
+                               for c in '*?[')
+        suffixes = {os.path.splitext(pattern)[1].lower()
+                    for pattern in self.patterns}
+        # Glob patterns that all end in '*.ext' can use the index buckets.
+        self._extensions = None if self.literal or '' in suffixes or any(
+            c in suffix for suffix in suffixes for c in '*?[') \
+            else sorted(suffixes)
+
+    def matches(self, rel_path):
+        return any(regex.match(rel_path) for regex in self._regexes)
+
+    def select(self, index):
+        """Return the matching files of ``index`` in path order."""
+        if self.literal:
+            paths = [index.root / pattern for pattern in self.patterns]
+            return [path for path in paths if index.is_file(path)]
+        candidates = index.files(*(self._extensions or ()))
+        return [path for path in candidates
+                if self.matches(path.relative_to(index.root).as_posix())]
+
+    def evaluate(self, engine, targets):
+        """Return ``(path, failures)`` for each of ``targets``."""
+        return engine.check_files(self, targets)
+
+
+class CrossFileRule(Rule):
+    """A consistency check over the facts of every file it reads.
+
+    The rule matches the files its check takes facts from. Whatever
+    subset of them changed, the facts of all of them are compared, so
+    the verdict for one file can depend on the others.
+    """
+
+    checks = CONSISTENCY_CHECKS
+
+    def __init__(self, rule_id, check, severity='error'):
+        super().__init__(rule_id, check, CONSISTENCY_CHECKS[check].patterns,
+                         severity=severity)
+
+    def evaluate(self, engine, targets):
+        sources = self.select(engine.index)
+        index = FactsIndex.build(engine.root, engine.documents(sources),
+                                 sources, self.check.kinds)
+        failures = {path: [] for path in sources}
+        for path, message in [*index.errors, *self.check(index)]:
+            failures.setdefault(path, []).append(message)
+        return list(failures.items())
+
+
+RULES = [
+    # TestConfigurationFiles
+    Rule('json.valid', 'json_valid', ['**/*.json']),
+    Rule('json.not_empty', 'json_not_empty', ['**/*.json']),
+    Rule('renovate.structure', 'renovate_schema', ['renovate.json']),
+    Rule('idea.xml', 'xml_valid', ['.idea/**/*.xml', '.idea/**/*.iml']),
+    CrossFileRule('idea.modules_exist', 'idea_modules_exist'),
+    Rule('android.xml', 'xml_valid', ['android/**/*.xml']),
+    Rule('config.utf8', 'utf8_encoding', CONFIG_FILES),
+    Rule('secrets.none_hardcoded', 'no_secrets', ['**/*']),
+    Rule('config.size', 'reasonable_size', CONFIG_FILES),
+    Rule('whitesource.not_empty', 'not_empty', ['.whitesource']),
+    # TestPubspecYaml
+    Rule('pubspec.exists', 'exists', ['pubspec.yaml'], required=True,
+         missing="pubspec.yaml must exist for Flutter projects"),
+    Rule('pubspec.test_dependencies', 'pubspec_test_dependencies',
+         ['pubspec.yaml']),
+    Rule('pubspec.required_fields', 'pubspec_schema',
+         ['pubspec.yaml']),
+    CrossFileRule('pubspec.dependencies_resolved', 'dependencies_resolved'),
+    # TestShellScripts
+    Rule('scripts.run_tests_exists', 'exists', ['run_tests.sh'],
+         required=True, missing="run_tests.sh should exist"),
+    Rule('scripts.run_validation_tests_exists', 'exists',
+         ['run_validation_tests.sh'], required=True,
+         missing="run_validation_tests.sh should exist"),
+    Rule('scripts.shebang', 'shell_shebang', SHELL_SCRIPTS),
+    Rule('scripts.not_empty', 'shell_has_commands', SHELL_SCRIPTS),
+    # TestYAMLValidation
+    Rule('yaml.valid', 'yaml_valid', YAML_FILES),
+    Rule('yaml.not_empty', 'yaml_not_empty', YAML_FILES),
+    Rule('yaml.no_tabs', 'yaml_no_tabs', YAML_FILES),
+    Rule('yaml.no_trailing_whitespace', 'yaml_no_trailing_whitespace',
+         YAML_FILES),
+    Rule('yaml.line_endings', 'unix_line_endings', YAML_FILES),
+    Rule('yaml.utf8', 'utf8_encoding', YAML_FILES),
+    Rule('yaml.size', 'reasonable_size', YAML_FILES),
+    Rule('azure.structure', 'azure_pipelines_schema',
+         ['azure-pipelines.yml']),
+    Rule('azure.flutter_config', 'azure_pipelines_flutter_config',
+         ['azure-pipelines.yml']),
+    Rule('azure.parameters', 'azure_pipelines_parameters',
+         ['azure-pipelines.yml']),
+    Rule('pubspec.structure', 'pubspec_schema', ['pubspec.yaml']),
+    Rule('analysis_options.structure', 'analysis_options_structure',
+         ['analysis_options.yaml']),
+    # TestAzurePipelinesSpecific
+    Rule('azure.multi_platform', 'azure_pipelines_multi_platform',
+         ['azure-pipelines.yml']),
+    Rule('azure.flutter_install', 'azure_pipelines_flutter_install',
+         ['azure-pipelines.yml']),
+    Rule('azure.web_build', 'azure_pipelines_web_build',
+         ['azure-pipelines.yml']),
+    # TestCrossFileConsistency
+    # The CI files pin an older Flutter than .tool-versions; report the
+    # drift without failing until they are brought in line.
+    CrossFileRule('consistency.toolchain_versions', 'toolchain_versions_agree',
+                  severity='warning'),
+    CrossFileRule('consistency.sdk_constraints', 'sdk_constraints_agree'),
+    CrossFileRule('consistency.dependency_pins', 'dependency_pins_agree'),
+    CrossFileRule('consistency.workflow_job_names',
+                  'workflow_job_names_unique'),
+]
+
+RULES_BY_ID = {rule.id: rule for rule in RULES}
+
+
+class RuleResult:
+    """Outcome of one rule: per-file failures or the reason it was skipped."""
+
+    def __init__(self, rule, status, files=(), reason=None):
+        self.rule = rule
+        self.status = status
+        self.files = list(files)
+        self.reason = reason
+
+    @property
+    def findings(self):
+        return [(path, message) for path, failures in self.files
+                for message in failures]
+
+    def to_dict(self, root, checked=False):
+        """Return the JSON form; ``checked`` adds every checked path."""
+        def relative(path):
+            try:
+                return Path(path).relative_to(root).as_posix()
+            except ValueError:
+                return str(path)
+        data = {'rule': self.rule.id, 'check': self.rule.check.name,
+                'status': self.status, 'files': len(self.files),
+                'findings': [{'path': relative(path), 'message': message}
+                             for path, message in self.findings]}
+        if checked:
+            data['checked'] = [relative(path) for path, _ in self.files]
+        if self.reason:
+            data['reason'] = self.reason
+        return data
+
+
+class ValidationEngine:
+    """Runs rules over the repository or over an explicit list of files."""
+
+    def __init__(self, root=REPO_ROOT, files=None):
+        self.root = Path(root).resolve()
+        self.files = None
+        if files is not None:
+            paths = [(self.root / path).resolve() for path in files]
+            self.files = [path for path in paths if path.is_file()]
+
+    @property
+    def index(self):
+        """The files of the validated tree, shaped like a FileIndex."""
+        return get_file_index(self.root)
+
+    def documents(self, paths):
+        """Return a mapping with a ``get(path)`` Document for ``paths``."""
+        return get_document_cache()
+
+    def targets(self, rule):
+        if self.files is None:
+            return rule.select(self.index)
+        targets = []
+        for path in self.files:
+            try:
+                rel_path = path.relative_to(self.root).as_posix()
+            except ValueError:
+                continue
+            if rule.matches(rel_path):
+                targets.append(path)
+        return targets
+
+    def run_rule(self, rule):
+        if isinstance(rule, str):
+            rule = RULES_BY_ID[rule]
+        with span('rule', rule.id):
+            return self._run_rule(rule)
+
+    def _run_rule(self, rule):
+        requires = rule.check.requires
+        if requires and importlib.util.find_spec(requires) is None:
+            return RuleResult(rule, 'skipped',
+                              reason=f"{requires} is not installed")
+        targets = self.targets(rule)
+        if not targets:
+            if rule.required and self.files is None:
+                missing = self.root / rule.patterns[0]
+                return RuleResult(rule, 'failed', [(missing, [rule.missing])])
+            if self.files is not None:
+                return RuleResult(rule, 'skipped',
+                                  reason="no matching files")
+            if rule.literal:
+                return RuleResult(rule, 'skipped',
+                                  reason=f"{', '.join(rule.patterns)} "
+                                         f"not found")
+        files = rule.evaluate(self, targets)
+        if not any(failures for _, failures in files):
+            return RuleResult(rule, 'passed', files)
+        return RuleResult(rule, 'warned' if rule.severity == 'warning'
+                          else 'failed', files)
+
+    def check_files(self, rule, targets):
+        """Return ``(path, failures)`` for each of ``targets``."""
+        return run_check(rule.check.name, targets)
+
+    def run(self, rule_ids=None):
+        rules = RULES if rule_ids is None else \
+            [RULES_BY_ID[rule_id] for rule_id in rule_ids]
+        return [self.run_rule(rule) for rule in rules]
+
+
+_engine = None
+
+
+def get_engine():
+    """Return the repository-wide engine shared by the unittest wrappers.
+
+    With ``VALIDATION_SHARD=i/N`` only the rules and files of that shard
+    are checked; the rest are skipped.
+    """
+    global _engine
+    if _engine is None:
+        shard = os.environ.get('VALIDATION_SHARD', '').strip()
+        if shard:
+            from tests.sharding import ShardEngine, parse_shard
+            _engine = ShardEngine(REPO_ROOT, parse_shard(shard))
+        else:
+            _engine = ValidationEngine()
+    return _engine
+
+
+_store = None
+
+
+def get_result_store():
+    """Return the store collecting the results of the unittest wrappers."""
+    global _store
+    if _store is None:
+        _store = ResultStore(get_engine().root)
+    return _store
+
+
+class ValidationWarning(UserWarning):
+    """Findings of a rule with warning severity."""
+
+
+class RuleAssertionsMixin:
+    """unittest mixin that runs an engine rule, one subTest per file.
+
+    Every result is also kept in the shared result store, from which
+    ``conftest.py`` writes ``VALIDATION_JUNIT``/``VALIDATION_SARIF``.
+    """
+
+    def assertRulePasses(self, rule_id):
+        result = get_engine().run_rule(rule_id)
+        get_result_store().add_result(result)
+        if result.status == 'skipped':
+            self.skipTest(result.reason)
+        if result.status == 'warned':
+            for _, message in result.findings:
+                warnings.warn(message, ValidationWarning, stacklevel=2)
+            return
+        for path, failures in result.files:
+            with self.subTest(file=str(path)):
+                if failures:
+                    self.fail('\n'.join(failures))
+
+
+def _staged_files(root):
+    output = subprocess.run(
+        ['git', 'diff', '--cached', '--name-only', '-z',
+         '--diff-filter=ACMR'],
+        cwd=root, check=True, capture_output=True).stdout
+    return [name for name in output.decode('utf-8').split('\0') if name]
+
+
+def _read_file_list(source, null_separated):
+    stream = sys.stdin if source == '-' else open(source, encoding='utf-8')
+    with stream:
+        content = stream.read()
+    separator = '\0' if null_separated else '\n'
+    return [name.strip('\r') for name in content.split(separator) if name]
+
+
+def _print_text(results, out, verbose=False):
+    for result in results:
+        if result.status == 'skipped' and not verbose:
+            continue
+        label = result.status.upper()
+        suffix = f" ({result.reason})" if result.reason else ''
+        print(f"{label:<7} {result.rule.id}{suffix}", file=out)
+        for path, message in result.findings:
+            print(f"        {message}", file=out)
+    counts = {status: sum(1 for r in results if r.status == status)
+              for status in ('passed', 'warned', 'failed', 'skipped')}
+    print(f"{counts['passed']} passed, {counts['warned']} warned, "
+          f"{counts['failed']} failed, {counts['skipped']} skipped", file=out)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m tests.validate',
+        description='Validate repository configuration files.')
+    parser.add_argument('files', nargs='*',
+                        help='only validate these files (default: all)')
+    parser.add_argument('--files-from', metavar='FILE',
+                        help="read file names from FILE ('-' for stdin)")
+    parser.add_argument('-z', dest='null', action='store_true',
+                        help='file names in --files-from are NUL separated')
+    parser.add_argument('--staged', action='store_true',
+                        help='validate the staged content of the files '
+                             'staged in git')
+    parser.add_argument('--rev', action='append', dest='revisions',
+                        metavar='REV', help='validate commit REV from the '
+                        'git object store (repeatable)')
+    parser.add_argument('--range', dest='revision_range', metavar='A..B',
+                        help='validate every commit in the git range A..B')
+    parser.add_argument('--shard', metavar='I/N',
+                        help='validate only shard I of N (1-based)')
+    parser.add_argument('--merge', action='store_true',
+                        help='merge the JSON shard reports named as FILE '
+                             'arguments into one report')
+    parser.add_argument('--rule', action='append', dest='rules',
+                        metavar='ID', help='run only this rule (repeatable)')
+    parser.add_argument('--format', choices=('text', 'json', 'junit',
+                                             'sarif'),
+                        default='text')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='also list skipped rules in text output')
+    parser.add_argument('--list', action='store_true',
+                        help='list the available rules and exit')
+    parser.add_argument('--root', default=str(REPO_ROOT),
+                        help='repository root (default: %(default)s)')
+    return parser
+
+
+def main(argv=None, out=None):
+    out = out or sys.stdout
+    args = build_parser().parse_args(argv)
+    root = Path(args.root).resolve()
+    if args.list:
+        for rule in RULES:
+            print(f"{rule.id:<38} {', '.join(rule.patterns)}", file=out)
+        return 0
+
+    unknown = [r for r in args.rules or () if r not in RULES_BY_ID]
+    if unknown:
+        print(f"Unknown rule(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    if args.merge:
+        return _main_merge(args, out)
+    if args.revisions or args.revision_range:
+        if args.format in WRITERS:
+            print(f"--format {args.format} reports one tree; it cannot be "
+                  f"used with --rev or --range", file=sys.stderr)
+            return 2
+        return _main_revisions(args, root, out)
+    if args.shard:
+        return _main_shard(args, root, out)
+
+    files = None
+    if args.files or args.files_from or args.staged:
+        files = list(args.files)
+        if args.files_from:
+            files += _read_file_list(args.files_from, args.null)
+        if args.staged:
+            files += _staged_files(root)
+
+    if args.staged:
+        from tests.git_source import GitSource, validate_staged
+        with GitSource(root) as source:
+            results = validate_staged(source, files, args.rules)
+    else:
+        results = ValidationEngine(root, files).run(args.rules)
+    return _report(results, root, args, out)
+
+
+def _report(results, root, args, out, checked=False, **extra):
+    ok = not any(result.status == 'failed' for result in results)
+    if args.format == 'json':
+        json.dump({'ok': ok, 'root': str(root), **extra,
+                   'rules': [result.to_dict(root, checked)
+                             for result in results]},
+                  out, indent=2)
+        out.write('\n')
+    elif args.format in WRITERS:
+        write_report(ResultStore.from_results(results, root), args.format,
+                     out)
+    else:
+        _print_text(results, out, args.verbose)
+    return 0 if ok else 1
+
+
+def _main_shard(args, root, out):
+    from tests.sharding import ShardEngine, ShardError, parse_shard
+
+    if args.files or args.files_from or args.staged:
+        print("--shard validates the whole tree; it cannot be combined "
+              "with files or --staged", file=sys.stderr)
+        return 2
+    try:
+        shard = parse_shard(args.shard)
+    except ShardError as e:
+        print(f"shard: {e}", file=sys.stderr)
+        return 2
+    start = time.perf_counter()
+    engine = ShardEngine(root, shard)
+    results = engine.run(args.rules)
+    # The checked paths let --merge report passing files too.
+    return _report(results, root, args, out, checked=True,
+                   shard=engine.describe(time.perf_counter() - start))
+
+
+def _main_merge(args, out):
+    from tests.sharding import ShardError, merge_reports
+
+    try:
+        reports = []
+        for name in args.files:
+            with open(name, encoding='utf-8') as f:
+                reports.append(json.load(f))
+        merged = merge_reports(reports)
+    except (OSError, ValueError) as e:
+        print(f"merge: {e}", file=sys.stderr)
+        return 2
+    if args.format == 'json':
+        json.dump(merged, out, indent=2)
+        out.write('\n')
+    elif args.format in WRITERS:
+        store = ResultStore(merged['root'])
+        for rule in merged['rules']:
+            store.set_status(rule['rule'], rule['status'], rule.get('reason'))
+            severity = 'warning' if rule['status'] == 'warned' else 'error'
+            by_path = {path: [] for path in rule.get('checked', ())}
+            for finding in rule['findings']:
+                by_path.setdefault(finding['path'], []).append(
+                    finding['message'])
+            for path, messages in by_path.items():
+                store.add_file(rule['rule'], path, messages, severity)
+        write_report(store, args.format, out)
+    else:
+        for rule in merged['rules']:
+            if rule['status'] == 'skipped' and not args.verbose:
+                continue
+            suffix = f" ({rule['reason']})" if rule.get('reason') else ''
+            print(f"{rule['status'].upper():<7} {rule['rule']}{suffix}",
+                  file=out)
+            for finding in rule['findings']:
+                print(f"        {finding['message']}", file=out)
+        counts = {status: sum(1 for r in merged['rules']
+                              if r['status'] == status)
+                  for status in ('passed', 'warned', 'failed', 'skipped')}
+        print(f"{counts['passed']} passed, {counts['warned']} warned, "
+              f"{counts['failed']} failed, {counts['skipped']} skipped "
+              f"({merged['shards']['count']} shards)", file=out)
+    return 0 if merged['ok'] else 1
+
+
+def _main_revisions(args, root, out):
+    from tests.git_source import GitError, GitSource, validate_revisions
+
+    try:
+        with GitSource(root) as source:
+            revisions = list(args.revisions or ())
+            if args.revision_range:
+                revisions += source.revisions(args.revision_range)
+            commits = validate_revisions(source, revisions, args.rules)
+            root = source.root
+    except GitError as e:
+        print(f"git: {e}", file=sys.stderr)
+        return 2
+    ok = not any(result.status == 'failed'
+                 for _, results in commits for result in results)
+    if args.format == 'json':
+        json.dump({'ok': ok, 'root': str(root), 'commits': [
+            {'commit': commit,
+             'ok': not any(r.status == 'failed' for r in results),
+             'rules': [result.to_dict(root) for result in results]}
+            for commit, results in commits]}, out, indent=2)
+        out.write('\n')
+    else:
+        for commit, results in commits:
+            print(f"commit {commit}", file=out)
+            _print_text(results, out, args.verbose)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,476 @@
+"""
+Watch mode: keep the index and parsed documents hot, revalidate on save.
+Usage: python -m tests.watch [--poll] [--socket PATH]
+       python -m tests.watch --query status|ping|check [FILE ...]
+
+Changes are picked up through inotify where available and by polling
+file signatures otherwise. Only rules whose patterns match a changed
+file are re-run, and within those only files whose (mtime, size)
+changed are re-checked. Editors and hooks can ask the running process
+for results over a Unix socket: one JSON request per line, one JSON
+reply per line.
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+from tests.checks import run_check
+from tests.document_cache import get_document_cache
+from tests.file_index import (
+    DEFAULT_EXCLUDES, REPO_ROOT, get_file_index, reset_file_index)
+from tests.validate import RULES, ValidationEngine
+
+
+SOCKET_NAME = 'watch.sock'
+POLL_INTERVAL = 0.5
+# Events arriving this soon after the first one are handled together,
+# so an editor's write-rename-chmod sequence triggers one run.
+DEBOUNCE_SECONDS = 0.05
+# Changing these can change which files are indexed at all.
+INDEX_FILES = ('.gitignore',)
+
+# Returned by a watcher when it lost track and everything must be rechecked.
+RESCAN = object()
+
+
+class WatchError(RuntimeError):
+    """Raised when another watcher already serves the query socket."""
+
+
+def socket_path():
+    from tests.incremental import cache_dir
+    return cache_dir() / SOCKET_NAME
+
+
+class PollingWatcher:
+    """Detects changes by comparing stat signatures between polls."""
+
+    def __init__(self, index, interval=POLL_INTERVAL):
+        self.interval = interval
+        self.sync(index)
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def sync(self, index):
+        """Start tracking the files and directories of ``index``."""
+        self.directories = {path: self._signature(path)
+                            for path in index.directories()}
+        self.files = {path: self._signature(path) for path in index.files()}
+
+    def poll(self):
+        changed = set()
+        for path, signature in self.files.items():
+            if self._signature(path) != signature:
+                changed.add(path)
+        for directory, signature in self.directories.items():
+            if self._signature(directory) == signature:
+                continue
+            # Creating or deleting an entry changes the directory mtime.
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                return RESCAN
+            changed.update(path for path in map(Path(directory).joinpath,
+                                                names)
+                           if path not in self.files and path.is_file())
+        for path in changed:
+            signature = self._signature(path)
+            if signature is None:
+                self.files.pop(path, None)  # deleted; reported once
+            else:
+                self.files[path] = signature
+        for directory in self.directories:
+            self.directories[directory] = self._signature(directory)
+        return changed
+
+    def wait(self, timeout=None):
+        """Return the changed paths (or RESCAN) within ``timeout``."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = self.poll()
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify watches on every indexed directory."""
+
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_Q_OVERFLOW = 0x4000
+    IN_ISDIR = 0x40000000
+    MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+            IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, index):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                 use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watches = {}
+        self.sync(index)
+
+    @staticmethod
+    def available():
+        return sys.platform.startswith('linux') and \
+            ctypes.util.find_library('c') is not None
+
+    def _add(self, directory):
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), self.MASK)
+        if wd >= 0:
+            self.watches[wd] = Path(directory)
+
+    def sync(self, index):
+        watched = set(self.watches.values())
+        for directory in index.directories():
+            if Path(directory) not in watched:
+                self._add(directory)
+
+    def _read_events(self):
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                return RESCAN
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if not name:
+                changed.add(directory)
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO) and \
+                        path.name not in DEFAULT_EXCLUDES:
+                    self._add(path)
+                # Files moved in with a directory produce no events.
+                changed.add(path)
+                continue
+            changed.add(path)
+        return changed
+
+    def wait(self, timeout=None):
+        """Return the changed paths (or RESCAN) within ``timeout``."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        while ready:
+            events = self._read_events()
+            if events is RESCAN:
+                return RESCAN
+            changed |= events
+            ready, _, _ = select.select([self.fd], [], [], DEBOUNCE_SECONDS)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def make_watcher(index, poll=False):
+    if not poll and InotifyWatcher.available():
+        try:
+            return InotifyWatcher(index)
+        except OSError:
+            pass
+    return PollingWatcher(index)
+
+
+class WatchEngine(ValidationEngine):
+    """Engine that reuses verdicts for files whose signature is unchanged."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        # path -> {check: (signature, failures)}
+        self.verdicts = {}
+        self.evaluations = 0
+
+    def forget(self, path):
+        """Drop the verdicts of a deleted ``path``."""
+        self.verdicts.pop(Path(path), None)
+
+    def check_files(self, rule, targets):
+        documents = get_document_cache()
+        name = rule.check.name
+        results, pending = {}, []
+        for path in targets:
+            try:
+                signature = documents.get(path).signature
+            except OSError:
+                continue  # deleted since the index was built
+            cached = self.verdicts.get(path, {}).get(name)
+            if cached is not None and cached[0] == signature:
+                results[path] = cached[1]
+            else:
+                pending.append((path, signature))
+        self.evaluations += len(pending)
+        computed = run_check(name, [path for path, _ in pending])
+        for (path, signature), (_, failures) in zip(pending, computed):
+            self.verdicts.setdefault(path, {})[name] = (signature, failures)
+            results[path] = failures
+        return [(path, results[path]) for path in targets if path in results]
+
+
+class WatchSession:
+    """Current results for a repository, updated incrementally."""
+
+    def __init__(self, root=REPO_ROOT):
+        self.root = Path(root).resolve()
+        self.engine = WatchEngine(self.root)
+        self.lock = threading.RLock()
+        self.results = {}
+        self.runs = 0
+        self.refresh(None)
+
+    @property
+    def index(self):
+        return get_file_index(self.root)
+
+    def affected_rules(self, paths):
+        """Return the rules with a pattern matching any of ``paths``."""
+        rel_paths = []
+        for path in paths:
+            try:
+                rel_paths.append(Path(path).relative_to(self.root).as_posix())
+            except ValueError:
+                continue
+        return [rule for rule in RULES
+                if any(rule.matches(rel) for rel in rel_paths)]
+
+    def refresh(self, changed):
+        """Re-run the rules affected by ``changed`` paths.
+
+        ``None`` or ``RESCAN`` rebuilds the index and re-runs every
+        rule. Returns the fresh results of the rules that ran.
+        """
+        with self.lock:
+            if changed is None or changed is RESCAN:
+                reset_file_index()
+                rules = RULES
+            else:
+                changed = {Path(path) for path in changed}
+                known = set(self.index.files())
+                if any(path.name in INDEX_FILES or path not in known or
+                       not path.is_file() for path in changed):
+                    reset_file_index()
+                    known |= set(self.index.files())
+                    # Changes inside an added or removed directory.
+                    changed |= {path for path in known
+                                if any(parent in changed
+                                       for parent in path.parents)}
+                for path in changed:
+                    if not path.exists():
+                        self.engine.forget(path)
+                # Deleted files still match the rules that reported them.
+                rules = self.affected_rules(changed)
+            results = [self.engine.run_rule(rule) for rule in rules]
+            for result in results:
+                self.results[result.rule.id] = result
+            self.runs += 1
+            return results
+
+    @property
+    def ok(self):
+        return not any(result.status == 'failed'
+                       for result in self.results.values())
+
+    def query(self, request):
+        """Answer one socket API request (a dict) with a dict."""
+        command = request.get('cmd')
+        if command == 'ping':
+            return {'ok': True, 'pid': os.getpid(), 'runs': self.runs}
+        with self.lock:
+            if command == 'check':
+                paths = [self.root / name
+                         for name in request.get('files', ())]
+                self.refresh(paths)
+                results = [self.results[rule.id]
+                           for rule in self.affected_rules(paths)
+                           if rule.id in self.results]
+            elif command == 'status':
+                results = list(self.results.values())
+            else:
+                return {'ok': False,
+                        'error': f"unknown command {command!r}"}
+            return {'ok': not any(r.status == 'failed' for r in results),
+                    'rules': [r.to_dict(self.root) for r in results]}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.session.query(json.loads(line))
+            except ValueError as e:
+                reply = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class QueryServer(socketserver.ThreadingMixIn,
+                  socketserver.UnixStreamServer):
+    """Serves ``session.query`` on a Unix socket from a daemon thread."""
+
+    daemon_threads = True
+
+    def __init__(self, path, session):
+        self.path = Path(path)
+        self.session = session
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self._remove_stale_socket()
+        super().__init__(str(self.path), _RequestHandler)
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    def _remove_stale_socket(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(str(self.path))
+            except ConnectionRefusedError:
+                self.path.unlink()  # left behind by a process that died
+                return
+            except FileNotFoundError:
+                return
+        raise WatchError(f"another watcher is already serving {self.path}")
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+
+def query(request, path=None, timeout=10.0):
+    """Send ``request`` to a running watcher and return its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(str(path or socket_path()))
+        client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with client.makefile('rb') as reply:
+            return json.loads(reply.readline())
+
+
+def _report(results, elapsed, out):
+    for result in results:
+        print(f"{result.status.upper():<7} {result.rule.id}", file=out)
+        for _, message in result.findings:
+            print(f"        {message}", file=out)
+    print(f"-- {len(results)} rule(s) in {elapsed * 1000:.1f} ms", file=out)
+    out.flush()
+
+
+def watch(session, watcher, out, stop=None):
+    """Revalidate on every change until ``stop`` is set."""
+    while stop is None or not stop.is_set():
+        changed = watcher.wait(timeout=0.5)
+        if not changed:
+            continue
+        start = time.perf_counter()
+        results = session.refresh(changed)
+        watcher.sync(session.index)
+        if results:
+            _report(results, time.perf_counter() - start, out)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m tests.watch',
+        description='Revalidate configuration files as they change.')
+    parser.add_argument('--root', default=str(REPO_ROOT))
+    parser.add_argument('--poll', action='store_true',
+                        help='poll file signatures instead of using inotify')
+    parser.add_argument('--socket', type=Path,
+                        help=f'query socket (default: '
+                             f'$VALIDATION_CACHE_DIR/{SOCKET_NAME})')
+    parser.add_argument('--no-socket', action='store_true')
+    parser.add_argument('--query', choices=('ping', 'status', 'check'),
+                        help='ask a running watcher instead of starting one')
+    parser.add_argument('files', nargs='*',
+                        help='files for --query check, relative to the root')
+    return parser
+
+
+def main(argv=None, out=None):
+    out = out or sys.stdout
+    args = build_parser().parse_args(argv)
+    if args.query:
+        try:
+            reply = query({'cmd': args.query, 'files': args.files},
+                          args.socket)
+        except OSError as e:
+            print(f"No watcher is running: {e}", file=sys.stderr)
+            return 3
+        print(json.dumps(reply, indent=2), file=out)
+        return 0 if reply.get('ok') else 1
+
+    start = time.perf_counter()
+    session = WatchSession(args.root)
+    _report(list(session.results.values()), time.perf_counter() - start,
+            out)
+    try:
+        server = None if args.no_socket else \
+            QueryServer(args.socket or socket_path(), session)
+    except WatchError as e:
+        print(f"watch: {e}", file=sys.stderr)
+        return 2
+    watcher = make_watcher(session.index, args.poll)
+    print(f"Watching {session.root} with {type(watcher).__name__}"
+          + (f", queries on {server.path}" if server else ''), file=out)
+    try:
+        watch(session, watcher, out)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        if server is not None:
+            server.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
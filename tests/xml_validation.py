@@ -0,0 +1,185 @@
+"""
+Streaming XML validation for IDE project files and Android resources.
+
+Files are fed to a pull parser in chunks and every element is dropped
+as soon as its end tag has been seen, so memory is bounded by nesting
+depth rather than file size. Structural rules watch the same event
+stream, so well-formedness and structure are checked in one pass.
+"""
+
+import copy
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+from tests.file_index import glob_regex
+
+
+CHUNK_SIZE = 64 * 1024
+
+# Lines and columns are 1-based; 0 means the position is unknown.
+XmlIssue = namedtuple('XmlIssue', 'line column message')
+
+
+@lru_cache(maxsize=None)
+def _suffix_regex(pattern):
+    return glob_regex('**/' + pattern)
+
+
+def local_name(tag):
+    """Return ``tag`` without its ``{namespace}`` prefix."""
+    return tag.rsplit('}', 1)[-1]
+
+
+class XmlRule:
+    """Base class for a structural rule fed elements by ``scan_xml``.
+
+    ``patterns`` are globs matched against the trailing segments of the
+    file path, e.g. ``'.idea/modules.xml'``. ``element`` sees each start
+    tag with its attributes; children are not available.
+    """
+
+    patterns = ()
+
+    def applies_to(self, path):
+        posix = Path(path).as_posix().lstrip('/')
+        return any(_suffix_regex(pattern).match(posix)
+                   for pattern in self.patterns)
+
+    def start(self, path, emit):
+        self.path = Path(path)
+        self.emit = emit
+
+    def element(self, element, depth):
+        pass
+
+    def finish(self, root_tag):
+        pass
+
+
+class RootElementRule(XmlRule):
+    """Requires the document element of matching files to be ``tag``."""
+
+    def __init__(self, patterns, tag):
+        self.patterns = tuple(patterns)
+        self.tag = tag
+
+    def finish(self, root_tag):
+        if root_tag is not None and local_name(root_tag) != self.tag:
+            self.emit(0, 0, f"root element should be <{self.tag}>, "
+                            f"found <{local_name(root_tag)}>")
+
+
+class ModuleReferenceRule(XmlRule):
+    """Requires every module listed in ``.idea/modules.xml`` to name an
+    ``.iml`` file. Whether those files exist depends on the rest of the
+    tree, so that is the cross-file rule ``idea.modules_exist``.
+    """
+
+    patterns = ('.idea/modules.xml',)
+
+    def start(self, path, emit):
+        super().start(path, emit)
+        self.modules = []
+
+    def element(self, element, depth):
+        if element.tag == 'module':
+            self.modules.append(element.get('filepath'))
+
+    def finish(self, root_tag):
+        for filepath in self.modules:
+            if not filepath:
+                self.emit(0, 0, "module entry without a filepath")
+            elif not filepath.endswith('.iml'):
+                self.emit(0, 0, f"module {filepath} is not an .iml file")
+
+
+class _ModuleCollector(XmlRule):
+    patterns = ('**',)
+
+    def __init__(self, filepaths):
+        # Shared by the per-scan copy of the rule.
+        self.filepaths = filepaths
+
+    def element(self, element, depth):
+        if element.tag == 'module':
+            self.filepaths.append(element.get('filepath'))
+
+
+def module_filepaths(chunks):
+    """Return the ``filepath`` of each ``<module>`` in a modules.xml."""
+    filepaths = []
+    scan_xml(chunks, Path('modules.xml'), [_ModuleCollector(filepaths)])
+    return filepaths
+
+
+XML_RULES = [
+    RootElementRule(('AndroidManifest.xml',), 'manifest'),
+    RootElementRule(('res/values*/*.xml',), 'resources'),
+    RootElementRule(('.idea/*.iml',), 'module'),
+    ModuleReferenceRule(),
+]
+
+
+XmlReport = namedtuple('XmlReport', 'issues root_tag elements max_depth')
+
+
+def scan_xml(chunks, path, rules=None):
+    """Parse ``chunks`` of the XML file at ``path`` and return a report.
+
+    Parsing stops at the first well-formedness error; structural rules
+    only report on documents that parsed completely.
+    """
+    # Rules keep per-file state, so each scan works on its own copies.
+    rules = [copy.copy(rule) for rule in
+             (XML_RULES if rules is None else rules) if rule.applies_to(path)]
+    issues = []
+
+    def emit(line, column, message):
+        issues.append(XmlIssue(line, column, message))
+
+    for rule in rules:
+        rule.start(path, emit)
+    parser = XMLPullParser(events=('start', 'end'))
+    stack = []
+    root_tag = None
+    elements = max_depth = 0
+    try:
+        for chunk in chunks:
+            parser.feed(bytes(chunk))
+            for event, element in parser.read_events():
+                if event == 'start':
+                    if root_tag is None:
+                        root_tag = element.tag
+                    stack.append(element)
+                    elements += 1
+                    max_depth = max(max_depth, len(stack))
+                    for rule in rules:
+                        rule.element(element, len(stack))
+                    continue
+                stack.pop()
+                element.clear()
+                if stack:
+                    # The finished element is always its parent's last
+                    # child; dropping it keeps the tree from growing.
+                    del stack[-1][-1]
+        parser.close()
+    except ParseError as e:
+        line, column = e.position
+        message = str(e).split(':', 1)[0]
+        return XmlReport([XmlIssue(line, column + 1,
+                                   f"not well-formed: {message}")],
+                         root_tag, elements, max_depth)
+    for rule in rules:
+        rule.finish(root_tag)
+    return XmlReport(issues, root_tag, elements, max_depth)
+
+
+def scan_document(document):
+    """Return the memoized :class:`XmlReport` for a cached document."""
+    report = document.memo.get('xml')
+    if report is None:
+        report = scan_xml(document.chunks(CHUNK_SIZE), document.path)
+        document.memo['xml'] = report
+    return report
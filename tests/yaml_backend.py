@@ -0,0 +1,131 @@
+"""
+Fastest available safe YAML loader, with fallback to pure Python.
+Run ``python -m tests.yaml_backend`` to see which backend is in use.
+"""
+
+import os
+
+
+# Preferred first. 'libyaml' is PyYAML's C extension, 'ruamel' is the
+# optional ruamel.yaml safe loader and 'pyyaml' the pure Python parser.
+BACKEND_ORDER = ('libyaml', 'ruamel', 'pyyaml')
+
+
+class YamlBackend:
+    """A named safe loader and the exceptions it raises on bad input.
+
+    ``loader`` is the PyYAML loader class for backends that can stream
+    parse events (see ``tests.yaml_query``), or None.
+    """
+
+    def __init__(self, name, load, errors, loader=None):
+        self.name = name
+        self.load = load
+        self.errors = errors
+        self.loader = loader
+
+    def __repr__(self):
+        return f'YamlBackend({self.name!r})'
+
+
+def _pyyaml(name, loader_name):
+    try:
+        import yaml
+    except ImportError:
+        return None
+    loader = getattr(yaml, loader_name, None)
+    if loader is None:
+        return None
+    return YamlBackend(name, lambda text: yaml.load(text, Loader=loader),
+                       (yaml.YAMLError,), loader)
+
+
+def _ruamel():
+    try:
+        from ruamel.yaml import YAML, YAMLError
+    except ImportError:
+        return None
+    loader = YAML(typ='safe')
+    # PyYAML implements YAML 1.1 (yes/no/on/off booleans, 0o-less octals,
+    # sexagesimals); ruamel defaults to 1.2, which reads those as strings.
+    loader.version = (1, 1)
+    return YamlBackend('ruamel', loader.load, (YAMLError,))
+
+
+_FACTORIES = {
+    'libyaml': lambda: _pyyaml('libyaml', 'CSafeLoader'),
+    'ruamel': _ruamel,
+    'pyyaml': lambda: _pyyaml('pyyaml', 'SafeLoader'),
+}
+
+
+def make_backend(name):
+    """Return backend ``name`` or None if it is not installed."""
+    if name not in _FACTORIES:
+        raise ValueError(f"Unknown YAML backend {name!r}, "
+                         f"expected one of {', '.join(BACKEND_ORDER)}")
+    return _FACTORIES[name]()
+
+
+def available_backends():
+    """Return every installed backend, fastest first."""
+    backends = [make_backend(name) for name in BACKEND_ORDER]
+    return [backend for backend in backends if backend is not None]
+
+
+_backend = None
+
+
+def get_backend():
+    """Return the session backend.
+
+    ``VALIDATION_YAML_BACKEND`` forces a specific backend; otherwise the
+    first installed one in ``BACKEND_ORDER`` is used.
+    """
+    global _backend
+    if _backend is None:
+        forced = os.environ.get('VALIDATION_YAML_BACKEND')
+        if forced:
+            _backend = make_backend(forced)
+            if _backend is None:
+                raise ImportError(f"YAML backend {forced!r} is not installed")
+        else:
+            for name in BACKEND_ORDER:
+                _backend = make_backend(name)
+                if _backend is not None:
+                    break
+            else:
+                raise ImportError("No YAML backend installed")
+    return _backend
+
+
+def load(text):
+    """Parse ``text`` with the session backend."""
+    return get_backend().load(text)
+
+
+def backend_name():
+    return get_backend().name
+
+
+def compare_backends(texts, backends=None):
+    """Return ``(index, name)`` for every text a backend parses differently
+    from the reference (first) backend, including mismatched errors."""
+    backends = backends or available_backends()
+    mismatches = []
+    for index, text in enumerate(texts):
+        results = []
+        for backend in backends:
+            try:
+                results.append((True, backend.load(text)))
+            except backend.errors:
+                results.append((False, None))
+        for backend, result in zip(backends[1:], results[1:]):
+            if result != results[0]:
+                mismatches.append((index, backend.name))
+    return mismatches
+
+
+if __name__ == '__main__':
+    print(f"YAML backend: {backend_name()} "
+          f"(available: {', '.join(b.name for b in available_backends())})")
@@ -0,0 +1,306 @@
+"""
+Path queries over YAML answered from the parser's event stream.
+
+Checks that only look at a few keys do not need the whole object graph.
+``query_yaml`` walks PyYAML parse events, skips subtrees no path leads
+into without constructing them, builds Python values only for the
+answers, and stops reading as soon as every path is answered. The
+parser is the session YAML backend's; a backend that cannot stream
+events answers from its full parse tree instead.
+
+Paths are dotted keys with optional sequence steps::
+
+    variables.FLUTTER_VERSION
+    parameters[name=webBuilds].type
+    steps[0].task
+
+A path that does not exist yields ``MISSING``. Unlike a full load,
+duplicate keys resolve to their first occurrence and syntax errors
+after the answers are not seen; ``yaml.valid`` reports those.
+"""
+
+import re
+from collections import namedtuple
+
+from tests.instrumentation import count
+from tests.yaml_backend import get_backend
+
+
+class _Missing:
+    def __repr__(self):
+        return 'MISSING'
+
+    def __bool__(self):
+        return False
+
+
+MISSING = _Missing()
+
+Key = namedtuple('Key', 'name')
+Index = namedtuple('Index', 'position')
+Match = namedtuple('Match', 'field value')
+
+_STEP = re.compile(r'\.?([^.\[\]]+)|\[(\d+)\]|\[([^=\]]+)=([^\]]*)\]')
+
+
+class QueryError(ValueError):
+    """Raised for malformed query paths."""
+
+
+def parse_path(path):
+    """Return the steps of ``path`` as ``Key``/``Index``/``Match`` tuples."""
+    steps, position = [], 0
+    while position < len(path):
+        match = _STEP.match(path, position)
+        if match is None or (match.group(1) and position and
+                             path[position] != '.'):
+            raise QueryError(f"bad query path {path!r} at {position}")
+        key, index, field, value = match.groups()
+        if key is not None:
+            steps.append(Key(key))
+        elif index is not None:
+            steps.append(Index(int(index)))
+        else:
+            steps.append(Match(field, value))
+        position = match.end()
+    if not steps:
+        raise QueryError("empty query path")
+    return tuple(steps)
+
+
+def resolve(value, steps):
+    """Apply ``steps`` to an already constructed ``value``."""
+    for step in steps:
+        if isinstance(step, Key):
+            if not isinstance(value, dict) or step.name not in value:
+                return MISSING
+            value = value[step.name]
+        elif isinstance(step, Index):
+            if not isinstance(value, list) or step.position >= len(value):
+                return MISSING
+            value = value[step.position]
+        else:
+            if not isinstance(value, list):
+                return MISSING
+            value = next((item for item in value
+                          if isinstance(item, dict) and
+                          str(item.get(step.field)) == step.value), MISSING)
+            if value is MISSING:
+                return MISSING
+    return value
+
+
+class _Fallback(Exception):
+    """The stream uses a feature the walker does not handle."""
+
+
+class _Node:
+    """One position in the trie of queried paths."""
+
+    __slots__ = ('paths', 'build', 'children')
+
+    def __init__(self):
+        # Every (name, remaining steps) passing through this node.
+        self.paths = []
+        self.build = False
+        self.children = {}
+
+    def add(self, name, steps):
+        self.paths.append((name, steps))
+        if not steps or isinstance(steps[0], Match):
+            # Match predicates need whole items, so from here on values
+            # are built and the rest is resolved in Python.
+            self.build = True
+        else:
+            self.children.setdefault(steps[0], _Node()).add(name, steps[1:])
+
+
+class _Walker:
+    def __init__(self, events, yaml):
+        self.events = events
+        self.yaml = yaml
+        self.results = {}
+        self.pending = 0
+        self.resolver = yaml.resolver.Resolver()
+        self.constructor = yaml.constructor.SafeConstructor()
+
+    def next(self):
+        event = next(self.events)
+        count('yaml_query.events')
+        if isinstance(event, self.yaml.AliasEvent):
+            raise _Fallback()
+        return event
+
+    def answer(self, name, value):
+        self.results[name] = value
+        self.pending -= 1
+
+    def missing(self, node):
+        for name, _ in node.paths:
+            self.answer(name, MISSING)
+
+    def key(self, event):
+        if not isinstance(event, self.yaml.ScalarEvent):
+            raise _Fallback()  # complex keys
+        key = self.scalar(event)
+        if key == '<<':
+            raise _Fallback()  # merge keys
+        return key
+
+    def scalar(self, event):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = self.resolver.resolve(self.yaml.ScalarNode, event.value,
+                                        event.implicit)
+        construct = self.constructor.yaml_constructors.get(tag)
+        if construct is None:
+            raise _Fallback()
+        return construct(self.constructor, self.yaml.ScalarNode(
+            tag, event.value, style=event.style))
+
+    def build(self, event):
+        """Construct the value that starts with ``event``."""
+        count('yaml_query.built')
+        yaml = self.yaml
+        if isinstance(event, yaml.ScalarEvent):
+            return self.scalar(event)
+        if isinstance(event, yaml.SequenceStartEvent):
+            items = []
+            while True:
+                item = self.next()
+                if isinstance(item, yaml.SequenceEndEvent):
+                    return items
+                items.append(self.build(item))
+        if isinstance(event, yaml.MappingStartEvent):
+            mapping = {}
+            while True:
+                key = self.next()
+                if isinstance(key, yaml.MappingEndEvent):
+                    return mapping
+                mapping[self.key(key)] = self.build(self.next())
+        raise _Fallback()
+
+    def skip(self, event):
+        """Consume the node starting with ``event`` without building it."""
+        yaml = self.yaml
+        if isinstance(event, (yaml.ScalarEvent, yaml.AliasEvent)):
+            return
+        depth = 1
+        while depth:
+            event = next(self.events)
+            count('yaml_query.events')
+            if isinstance(event, (yaml.SequenceStartEvent,
+                                  yaml.MappingStartEvent)):
+                depth += 1
+            elif isinstance(event, (yaml.SequenceEndEvent,
+                                    yaml.MappingEndEvent)):
+                depth -= 1
+
+    def visit(self, node, event):
+        """Answer the paths under ``node`` from the node at ``event``."""
+        yaml = self.yaml
+        if node.build:
+            value = self.build(event)
+            for name, steps in node.paths:
+                self.answer(name, resolve(value, steps))
+            return
+        keys = {step.name: child for step, child in node.children.items()
+                if isinstance(step, Key)}
+        positions = {step.position: child
+                     for step, child in node.children.items()
+                     if isinstance(step, Index)}
+        if isinstance(event, yaml.MappingStartEvent) and keys:
+            while self.pending:
+                key_event = self.next()
+                if isinstance(key_event, yaml.MappingEndEvent):
+                    break
+                self.descend(keys.pop(self.key(key_event), None))
+        elif isinstance(event, yaml.SequenceStartEvent) and positions:
+            position = 0
+            while self.pending:
+                item = self.peek_end(yaml.SequenceEndEvent)
+                if item is None:
+                    break
+                self.descend(positions.pop(position, None), item)
+                position += 1
+        else:
+            self.missing(node)
+            self.skip(event)
+            return
+        if self.pending:
+            for child in (*keys.values(), *positions.values()):
+                self.missing(child)
+
+    def peek_end(self, end):
+        """Return the next event, or None if it is an ``end`` event."""
+        event = next(self.events)
+        count('yaml_query.events')
+        return None if isinstance(event, end) else event
+
+    def descend(self, child, event=None):
+        """Visit the next node for ``child``, or skip it if None."""
+        if event is None:
+            event = next(self.events)
+            count('yaml_query.events')
+        if child is None:
+            self.skip(event)
+        elif isinstance(event, self.yaml.AliasEvent):
+            raise _Fallback()
+        else:
+            self.visit(child, event)
+
+
+def _query_events(text, paths, yaml, loader):
+    root = _Node()
+    for name in paths:
+        root.add(name, parse_path(name))
+    events = yaml.parse(text, Loader=loader)
+    walker = _Walker(events, yaml)
+    walker.pending = len(paths)
+    try:
+        # StreamStart, then DocumentStart or an empty stream.
+        walker.next()
+        start = walker.next()
+        if isinstance(start, yaml.StreamEndEvent):
+            walker.missing(root)
+        else:
+            walker.visit(root, walker.next())
+    finally:
+        events.close()
+    return {name: walker.results[name] for name in paths}
+
+
+def query_yaml(text, paths):
+    """Return ``{path: value or MISSING}`` for ``paths`` in ``text``.
+
+    Raises the YAML backend's error if the document is malformed before
+    every path is answered.
+    """
+    paths = list(dict.fromkeys(paths))
+    backend = get_backend()
+    if backend.loader is not None:
+        import yaml
+        try:
+            return _query_events(text, paths, yaml, backend.loader)
+        except _Fallback:
+            pass
+    count('yaml_query.fallbacks')
+    value = backend.load(text)
+    return {name: resolve(value, parse_path(name)) for name in paths}
+
+
+def query_document(document, *paths):
+    """Answer ``paths`` for a cached YAML document.
+
+    If the document's full parse tree is already cached it is used
+    directly; otherwise the event stream is queried and the answers are
+    memoized on the document.
+    """
+    if document.has_parsed:
+        tree = document.parsed
+        return tuple(resolve(tree, parse_path(path)) for path in paths)
+    memo = document.memo.setdefault('yaml_query', {})
+    pending = [path for path in paths if path not in memo]
+    if pending:
+        memo.update(query_yaml(document.text, pending))
+    return tuple(memo[path] for path in paths)